@@ -73,12 +73,20 @@ def main() -> None:
     parser.add_argument("--question", "-q", help="Query text", default=None)
     parser.add_argument("--top-k", type=int, default=5, help="Retriever top-k (default: 5)")
     parser.add_argument("--use-llm", action="store_true", help="Use LLM for the final answer")
+    parser.add_argument(
+        "--context-tokens",
+        type=int,
+        default=None,
+        help="Compress contexts to this token budget (default: settings.CONTEXT_TOKENS, 0 = off)",
+    )
     args = parser.parse_args()
 
     question = args.question or input("Enter question: ")
 
     pipeline = RAGPipeline()
-    answer, contexts = pipeline.answer_query(question, top_k=args.top_k, use_llm=args.use_llm)
+    answer, contexts = pipeline.answer_query(
+        question, top_k=args.top_k, use_llm=args.use_llm, context_tokens=args.context_tokens
+    )
 
     print("\n=== Answer ===")
     print(answer)
@@ -87,6 +95,12 @@ def main() -> None:
         print(format_contexts(contexts))
     else:
         print("(no contexts)")
+    if pipeline.last_compression:
+        stats = pipeline.last_compression
+        print(
+            f"\n[compression] {stats['original_tokens']} -> {stats['compressed_tokens']} tokens "
+            f"({stats['kept_sentences']}/{stats['total_sentences']} sentences)"
+        )
 
 
 if __name__ == "__main__":
@@ -9,6 +9,8 @@ class Settings(BaseSettings):
     INDEX_NAME: str = Field(default="default")
     CHUNK_SIZE: int = Field(default=800)
     CHUNK_OVERLAP: int = Field(default=120)
+    # answer_query 가 컨텍스트를 문장 단위로 압축할 토큰 예산 (0 이면 압축 안 함)
+    CONTEXT_TOKENS: int = Field(default=0)
     OPENAI_API_KEY: str | None = None
     OPENAI_MODEL: str = Field(default="gpt-4o-mini")
 
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from typing import List, Dict, Any, Optional, Tuple
+import logging
 import os
 import re
 from collections import defaultdict
@@ -11,6 +12,11 @@ from .vectorstore import VectorStore
 from .retriever import Retriever
 from .chunks import chunk_text
 
+try:
+    from ai.context_compress import compress_contexts
+except ImportError:  # pragma: no cover - RAG_zzin used without the ai package on sys.path
+    compress_contexts = None
+
 
 def _call_openai(system_prompt: str, user_prompt: str, model: str, api_key: str) -> str:
     try:
@@ -42,6 +48,7 @@ class RAGPipeline:
         self._wise_by_code: Dict[str, List[int]] = defaultdict(list)
         self._wise_by_name: Dict[str, List[int]] = defaultdict(list)
         self._naver_by_name: Dict[str, List[int]] = defaultdict(list)
+        self.last_compression: Optional[Dict[str, Any]] = None
         self._build_meta_indexes()
 
     def add_texts(
@@ -87,13 +94,18 @@ class RAGPipeline:
         return added
 
     def answer_query(
-        self, query: str, top_k: int = 5, use_llm: bool = True
+        self,
+        query: str,
+        top_k: int = 5,
+        use_llm: bool = True,
+        context_tokens: Optional[int] = None,
     ) -> Tuple[str, List[Dict[str, Any]]]:
         contexts = self.retriever.retrieve(query, top_k=top_k)
         contexts = self._augment_contexts(query, contexts, top_k=top_k)
         contexts = self._deduplicate_contexts(contexts, top_k=top_k)
         if not contexts:
             return ("Index is empty. Ingest data first.", [])
+        contexts = self._compress_contexts(query, contexts, context_tokens)
 
         if not use_llm or not settings.OPENAI_API_KEY:
             joined = "\n\n".join(
@@ -114,6 +126,21 @@ class RAGPipeline:
         answer = _call_openai(system, user, model=settings.OPENAI_MODEL, api_key=settings.OPENAI_API_KEY)
         return (answer, contexts)
 
+    def _compress_contexts(
+        self, query: str, contexts: List[Dict[str, Any]], context_tokens: Optional[int]
+    ) -> List[Dict[str, Any]]:
+        """질의와 비슷한 문장만 토큰 예산 안에서 남긴다. 결과 통계는 last_compression 에 둔다."""
+        budget = settings.CONTEXT_TOKENS if context_tokens is None else context_tokens
+        self.last_compression = None
+        if budget <= 0:
+            return contexts
+        if compress_contexts is None:
+            logging.getLogger(__name__).warning("ai.context_compress 를 찾을 수 없어 컨텍스트 압축을 건너뜁니다.")
+            return contexts
+        packed = compress_contexts(query, contexts, self.embedder.encode, token_budget=budget)
+        self.last_compression = packed.stats()
+        return packed.contexts
+
     @staticmethod
     def _normalize_key(value: str) -> str:
         return "".join(ch for ch in value.lower() if ch.isalnum())
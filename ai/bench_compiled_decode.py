@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""Eager (dynamic cache) vs compiled (static cache + torch.compile) decode on CPU.
+
+Both modes decode the prompts one at a time, greedily, so the comparison is
+the per-token cost of a single sequence. Reported per mode: warmup (compile)
+time, TTFT, decode tokens/s (tokens after the first / time after the first),
+and token agreement with the eager run (see bench_precision.divergence).
+
+    python bench_compiled_decode.py --model Qwen/Qwen3-0.6B --max-new-tokens 128
+    python bench_compiled_decode.py --backend tiny --model Qwen3-0.6B --buckets 256,512
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_cpu_plan import percentile  # noqa: E402
+from bench_precision import DEFAULT_PROMPTS, divergence, load_prompts  # noqa: E402
+
+MODES = ("eager", "compiled")
+
+
+def build_scheduler(loaded: Any, mode: str, args: argparse.Namespace) -> tuple:
+  from compiled_decode import CompiledDecodeScheduler, parse_buckets
+  from scheduler import BatchScheduler
+
+  if mode == "eager":
+    return BatchScheduler(loaded.model, loaded.device, max_batch_size=1), 0.0
+  scheduler = CompiledDecodeScheduler(
+    loaded.model,
+    loaded.device,
+    buckets=parse_buckets(args.buckets),
+    compile_backend=args.compile_backend,
+  )
+  return scheduler, scheduler.warmup()
+
+
+def run_mode(loaded: Any, mode: str, inputs: List[Any], args: argparse.Namespace) -> Dict[str, Any]:
+  from scheduler import GenerationJob
+
+  tok = loaded.tokenizer
+  scheduler, warmup_s = build_scheduler(loaded, mode, args)
+  eos = {tok.eos_token_id} if tok.eos_token_id is not None else set()
+  outputs: List[List[int]] = []
+  ttft: List[float] = []
+  decode_tokens = 0
+  decode_s = 0.0
+  for ids in inputs:
+    job = scheduler.submit(GenerationJob(input_ids=ids, max_new_tokens=args.max_new_tokens, temperature=0.0, eos_token_ids=eos))
+    job.wait()
+    if job.error is not None:
+      raise job.error
+    outputs.append(job.output_ids)
+    ttft.append(job.first_token_at - job.submitted_at)
+    decode_tokens += max(len(job.output_ids) - 1, 0)
+    decode_s += job.finished_at - job.first_token_at
+  return {
+    "mode": mode,
+    "warmup_s": warmup_s,
+    "ttft_p50_s": percentile(ttft, 50),
+    "decode_tokens": decode_tokens,
+    "decode_tokens_per_s": decode_tokens / decode_s if decode_s else 0.0,
+    "outputs": outputs,
+  }
+
+
+def build_markdown(results: List[Dict[str, Any]], target: str, args: argparse.Namespace, n_prompts: int) -> str:
+  base = results[0]["decode_tokens_per_s"] or 1.0
+  lines = [
+    f"# Compiled decode benchmark ({target})",
+    "",
+    f"{n_prompts} prompts, one at a time, greedy, max_new_tokens={args.max_new_tokens}, "
+    f"buckets {args.buckets or 'default'}, compile backend {args.compile_backend}",
+    "",
+    "| mode | warmup (s) | TTFT p50 (s) | decode tokens/s | speedup | token agreement | exact match |",
+    "| --- | ---: | ---: | ---: | ---: | ---: | ---: |",
+  ]
+  for r in results:
+    d = r["divergence"]
+    lines.append(
+      f"| {r['mode']} | {r['warmup_s']:.1f} | {r['ttft_p50_s']:.3f} | {r['decode_tokens_per_s']:.1f} "
+      f"| {r['decode_tokens_per_s'] / base:.2f}x | {d['token_agreement']:.3f} | {d['exact_match']:.2f} |"
+    )
+  return "\n".join(lines) + "\n"
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--model", default="Qwen/Qwen3-0.6B")
+  parser.add_argument("--backend", default="torch", help="torch, or tiny for a wiring check")
+  parser.add_argument("--precision", default=None, help="model precision (default: AI_PRECISION or fp32)")
+  parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+  parser.add_argument("--buckets", default=None, help="static cache lengths, e.g. 512,1024 (default: 512..4096)")
+  parser.add_argument("--compile-backend", default="inductor")
+  parser.add_argument("--prompts", type=Path, default=DEFAULT_PROMPTS, help="JSON list or {'queries': [...]}")
+  parser.add_argument("--limit", type=int, default=8)
+  parser.add_argument("--max-new-tokens", type=int, default=128)
+  parser.add_argument("--out", type=Path, help="write JSON results here (markdown goes next to it)")
+  return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+  import torch
+  from server_base import load_model
+
+  args = parse_args(argv)
+  prompts = load_prompts(args.prompts)[: args.limit]
+  modes = ["eager"] + [m for m in args.modes if m != "eager"]
+
+  torch.manual_seed(0)
+  loaded = load_model(args.model, args.backend, precision=args.precision, max_batch_size=1)
+  tok = loaded.tokenizer
+  inputs = []
+  for prompt in prompts:
+    text = tok.apply_chat_template([{"role": "user", "content": prompt}], tokenize=False, add_generation_prompt=True)
+    inputs.append(tok(text, return_tensors="pt")["input_ids"])
+
+  results: List[Dict[str, Any]] = []
+  for mode in modes:
+    t0 = time.perf_counter()
+    result = run_mode(loaded, mode, inputs, args)
+    print(f"[bench] {mode}: {result['decode_tokens_per_s']:.1f} tok/s ({time.perf_counter() - t0:.1f}s)")
+    results.append(result)
+
+  reference = results[0]["outputs"]
+  for r in results:
+    r["divergence"] = divergence(reference, r["outputs"])
+
+  target = f"{args.backend}:{args.model}"
+  markdown = build_markdown(results, target, args, len(prompts))
+  print(markdown)
+  if args.out:
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    args.out.with_suffix(".md").write_text(markdown, encoding="utf-8")
+
+
+if __name__ == "__main__":
+  main()
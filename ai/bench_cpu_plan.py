@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+"""Throughput of concurrent role workers with and without the CPU plan.
+
+Starts one spawned process per role (x replicas), like main.py does, and has
+all of them decode at the same time. In "shared" mode every worker keeps the
+torch default of using all cores; in "partitioned" mode each applies its slot
+from cpu_planner.plan_cpus first. Reports aggregate tokens/s and per-request
+latency percentiles as JSON and markdown.
+
+    python bench_cpu_plan.py --model Qwen/Qwen3-0.6B --requests 8 --max-new-tokens 64
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import queue as queue_mod
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+ROLES = ("eco", "firm", "house")
+PROMPT = "금리가 오르면 가계 소비는 어떻게 변하나요?"
+
+
+def percentile(values: List[float], q: float) -> float:
+  if not values:
+    return 0.0
+  ordered = sorted(values)
+  k = min(len(ordered) - 1, max(0, round(q / 100.0 * (len(ordered) - 1))))
+  return ordered[k]
+
+
+def run_worker(model_id: str, slot: Any, requests: int, max_new_tokens: int, barrier: Any, queue: Any) -> None:
+  import torch
+  from cpu_planner import apply_slot
+  from server_base import load_model
+
+  if slot is not None:
+    apply_slot(slot)
+  loaded = load_model(model_id, "torch", max_batch_size=1)
+  tok, model = loaded.tokenizer, loaded.model
+  text = tok.apply_chat_template([{"role": "user", "content": PROMPT}], tokenize=False, add_generation_prompt=True)
+  inputs = tok(text, return_tensors="pt")
+
+  barrier.wait()
+  latencies: List[float] = []
+  tokens = 0
+  start = time.perf_counter()
+  for _ in range(requests):
+    t0 = time.perf_counter()
+    with torch.no_grad():
+      out = model.generate(
+        **inputs,
+        max_new_tokens=max_new_tokens,
+        min_new_tokens=max_new_tokens,
+        do_sample=False,
+        pad_token_id=tok.eos_token_id,
+      )
+    latencies.append(time.perf_counter() - t0)
+    tokens += int(out.shape[-1] - inputs["input_ids"].shape[-1])
+  queue.put({"tokens": tokens, "elapsed_s": time.perf_counter() - start, "latencies_s": latencies})
+
+
+def run_mode(mode: str, args: argparse.Namespace) -> Dict[str, Any]:
+  from cpu_planner import parse_weights, plan_cpus
+
+  ctx = mp.get_context("spawn")
+  workers = [(role, args.replicas) for role in ROLES]
+  if mode == "partitioned":
+    slots = plan_cpus(workers, parse_weights(args.cpu_weights))
+  else:
+    slots = [None] * (len(ROLES) * args.replicas)
+
+  barrier = ctx.Barrier(len(slots))
+  queue = ctx.Queue()
+  procs = [
+    ctx.Process(target=run_worker, args=(args.model, slot, args.requests, args.max_new_tokens, barrier, queue))
+    for slot in slots
+  ]
+  for proc in procs:
+    proc.start()
+  results: List[Dict[str, Any]] = []
+  while len(results) < len(procs):
+    try:
+      results.append(queue.get(timeout=5))
+    except queue_mod.Empty:
+      failed = [proc for proc in procs if proc.exitcode not in (None, 0)]
+      if failed:
+        for proc in procs:
+          proc.terminate()
+        raise SystemExit(f"[bench] {len(failed)} worker(s) failed in {mode} mode")
+  for proc in procs:
+    proc.join()
+
+  latencies = [lat for r in results for lat in r["latencies_s"]]
+  wall = max(r["elapsed_s"] for r in results)
+  tokens = sum(r["tokens"] for r in results)
+  return {
+    "mode": mode,
+    "workers": len(procs),
+    "tokens": tokens,
+    "wall_s": wall,
+    "tokens_per_s": tokens / wall if wall else 0.0,
+    "latency_p50_s": statistics.median(latencies) if latencies else 0.0,
+    "latency_p99_s": percentile(latencies, 99),
+    "plan": [slot.to_dict() for slot in slots if slot is not None],
+  }
+
+
+def build_markdown(results: List[Dict[str, Any]], args: argparse.Namespace) -> str:
+  lines = [
+    f"# CPU plan benchmark ({args.model})",
+    "",
+    f"{len(ROLES)} roles x {args.replicas} replicas, {args.requests} requests each, {args.max_new_tokens} new tokens",
+    "",
+    "| mode | workers | tokens/s | p50 latency (s) | p99 latency (s) |",
+    "| --- | ---: | ---: | ---: | ---: |",
+  ]
+  for r in results:
+    lines.append(
+      f"| {r['mode']} | {r['workers']} | {r['tokens_per_s']:.1f} | {r['latency_p50_s']:.2f} | {r['latency_p99_s']:.2f} |"
+    )
+  return "\n".join(lines) + "\n"
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--model", default="Qwen/Qwen3-0.6B")
+  parser.add_argument("--replicas", type=int, default=1)
+  parser.add_argument("--requests", type=int, default=8, help="sequential requests per worker")
+  parser.add_argument("--max-new-tokens", type=int, default=64)
+  parser.add_argument("--cpu-weights", default="", help="same format as main.py --cpu-weights")
+  parser.add_argument("--out", type=Path, help="write JSON results here (markdown goes next to it)")
+  return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+  args = parse_args(argv)
+  results = []
+  for mode in ("shared", "partitioned"):
+    result = run_mode(mode, args)
+    print(f"[bench] {mode}: {result['tokens_per_s']:.1f} tok/s, p99 {result['latency_p99_s']:.2f}s")
+    results.append(result)
+
+  markdown = build_markdown(results, args)
+  print(markdown)
+  if args.out:
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    args.out.with_suffix(".md").write_text(markdown, encoding="utf-8")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""Compare the scheduler's KV cache modes (fp / int8 / int4) on a prompt set.
+
+All prompts are submitted to one `BatchScheduler` at once and decoded
+greedily, so the KV cache holds the whole batch as it would under load. For
+each mode the peak KV bytes, KV bytes per token and tokens/s are reported,
+and the output token ids are compared with the fp run (token agreement,
+exact match, first divergence; see bench_precision.divergence).
+`--context-repeat` repeats each prompt to imitate long RAG contexts.
+
+    python bench_kv_quant.py --model Qwen/Qwen3-0.6B --max-new-tokens 128 --context-repeat 8
+    python bench_kv_quant.py --backend tiny --model Qwen3-0.6B   # 배선 확인용 (랜덤 가중치)
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_precision import DEFAULT_PROMPTS, divergence, load_prompts  # noqa: E402
+
+MODES = ("fp", "int8", "int4")
+
+
+def run_mode(loaded: Any, mode: str, inputs: List[Any], max_new_tokens: int) -> Dict[str, Any]:
+  from scheduler import BatchScheduler, GenerationJob
+
+  tok = loaded.tokenizer
+  scheduler = BatchScheduler(
+    loaded.model,
+    loaded.device,
+    max_batch_size=len(inputs),
+    kv_quant=None if mode == "fp" else mode,
+  )
+  eos = {tok.eos_token_id} if tok.eos_token_id is not None else set()
+  start = time.perf_counter()
+  jobs = [
+    scheduler.submit(GenerationJob(input_ids=ids, max_new_tokens=max_new_tokens, temperature=0.0, eos_token_ids=eos))
+    for ids in inputs
+  ]
+  for job in jobs:
+    job.wait()
+    if job.error is not None:
+      raise job.error
+  elapsed = time.perf_counter() - start
+  stats = scheduler.stats()
+  tokens = sum(len(job.output_ids) for job in jobs)
+  return {
+    "mode": mode,
+    "tokens": tokens,
+    "tokens_per_s": tokens / elapsed if elapsed else 0.0,
+    "kv_peak_mb": stats["kv_peak_bytes"] / (1024 * 1024),
+    "kv_bytes_per_token": stats["kv_token_bytes"],
+    "outputs": [job.output_ids for job in jobs],
+  }
+
+
+def build_markdown(results: List[Dict[str, Any]], target: str, args: argparse.Namespace, prompt_tokens: int) -> str:
+  base = results[0]["kv_peak_mb"] or 1.0
+  lines = [
+    f"# KV cache quantization ({target})",
+    "",
+    f"{args.n_prompts} prompts in one batch (~{prompt_tokens} prompt tokens each, context x{args.context_repeat}), "
+    f"greedy, max_new_tokens={args.max_new_tokens}",
+    "",
+    "| KV | peak KV (MB) | vs fp | bytes/token | tokens/s | token agreement | exact match | first divergence |",
+    "| --- | ---: | ---: | ---: | ---: | ---: | ---: | ---: |",
+  ]
+  for r in results:
+    d = r["divergence"]
+    lines.append(
+      f"| {r['mode']} | {r['kv_peak_mb']:.1f} | {r['kv_peak_mb'] / base:.2f}x | {r['kv_bytes_per_token']:.0f} "
+      f"| {r['tokens_per_s']:.1f} | {d['token_agreement']:.3f} | {d['exact_match']:.2f} "
+      f"| {d['mean_first_divergence']:.1f} |"
+    )
+  return "\n".join(lines) + "\n"
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--model", default="Qwen/Qwen3-0.6B")
+  parser.add_argument("--backend", default="torch", help="torch, or tiny for a wiring check")
+  parser.add_argument("--precision", default=None, help="model precision (default: AI_PRECISION or fp32)")
+  parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+  parser.add_argument("--prompts", type=Path, default=DEFAULT_PROMPTS, help="JSON list or {'queries': [...]}")
+  parser.add_argument("--limit", type=int, default=8, help="number of prompts (one batch)")
+  parser.add_argument("--context-repeat", type=int, default=1, help="repeat each prompt to lengthen the context")
+  parser.add_argument("--max-new-tokens", type=int, default=128)
+  parser.add_argument("--out", type=Path, help="write JSON results here (markdown goes next to it)")
+  return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+  import torch
+  from server_base import load_model
+
+  args = parse_args(argv)
+  prompts = load_prompts(args.prompts)[: args.limit]
+  args.n_prompts = len(prompts)
+  modes = ["fp"] + [m for m in args.modes if m != "fp"]
+
+  torch.manual_seed(0)
+  loaded = load_model(args.model, args.backend, precision=args.precision, max_batch_size=len(prompts))
+  tok = loaded.tokenizer
+  inputs = []
+  for prompt in prompts:
+    content = "\n".join([prompt] * max(1, args.context_repeat))
+    text = tok.apply_chat_template([{"role": "user", "content": content}], tokenize=False, add_generation_prompt=True)
+    inputs.append(tok(text, return_tensors="pt")["input_ids"])
+  prompt_tokens = sum(int(ids.shape[-1]) for ids in inputs) // max(1, len(inputs))
+
+  results: List[Dict[str, Any]] = []
+  for mode in modes:
+    result = run_mode(loaded, mode, inputs, args.max_new_tokens)
+    print(f"[bench] {mode}: peak KV {result['kv_peak_mb']:.1f} MB, {result['tokens_per_s']:.1f} tok/s")
+    results.append(result)
+
+  reference = results[0]["outputs"]
+  for r in results:
+    r["divergence"] = divergence(reference, r["outputs"])
+
+  target = f"{args.backend}:{args.model}"
+  markdown = build_markdown(results, target, args, prompt_tokens)
+  print(markdown)
+  if args.out:
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    args.out.with_suffix(".md").write_text(markdown, encoding="utf-8")
+
+
+if __name__ == "__main__":
+  main()
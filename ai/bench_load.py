@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+"""Load generator for the role /chat servers.
+
+Sends /chat requests either closed-loop (a fixed number of clients, each
+sending its next request as soon as the previous one returns) or open-loop
+(Poisson arrivals at a fixed rate, regardless of how fast the server answers).
+Prompt lengths are drawn from a configurable distribution. The server-returned
+`metrics` of every response are collected, and p50/p90/p99 TTFT, total latency
+and aggregate tokens/s are written as JSON and a markdown summary.
+
+Without --url a local server is started first (tiny random model by default,
+so the numbers can be tracked per commit on any machine):
+
+    python bench_load.py --mode closed --concurrency 8 --requests 64 --out bench/load.json
+    python bench_load.py --mode open --rate 4 --duration 30 --prompt-dist uniform:16:256
+    python bench_load.py --url http://127.0.0.1:8001 --mode closed --concurrency 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import random
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_cpu_plan import percentile  # noqa: E402
+
+WORDS = (
+  "금리 물가 환율 소비 투자 수출 고용 성장 가계 기업 정부 재정 통화 정책 시장 가격 임금 부채 저축 경기"
+).split()
+PERCENTILES = (50, 90, 99)
+
+
+def parse_dist(spec: str) -> tuple:
+  """'fixed:N', 'uniform:LO:HI', 'normal:MEAN:STD' (단어 수 기준)."""
+  kind, *nums = spec.split(":")
+  values = [float(n) for n in nums]
+  expected = {"fixed": 1, "uniform": 2, "normal": 2}
+  if kind not in expected or len(values) != expected[kind]:
+    raise argparse.ArgumentTypeError(f"bad prompt distribution: {spec!r}")
+  return (kind, *values)
+
+
+def sample_prompt(dist: tuple, rng: random.Random, index: int) -> str:
+  kind, *p = dist
+  if kind == "fixed":
+    n = p[0]
+  elif kind == "uniform":
+    n = rng.uniform(p[0], p[1])
+  else:
+    n = rng.gauss(p[0], p[1])
+  n = max(1, int(round(n)))
+  # 요청마다 머리를 달리해 response/prefix cache 가 결과를 왜곡하지 않게 한다.
+  return f"[{index}] " + " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+async def send_one(client: Any, url: str, prompt: str, args: argparse.Namespace) -> Dict[str, Any]:
+  payload = {
+    "messages": [{"role": "user", "content": prompt}],
+    "max_tokens": args.max_tokens,
+    "temperature": args.temperature,
+  }
+  t0 = time.perf_counter()
+  record: Dict[str, Any] = {"sent_at": t0}
+  try:
+    resp = await client.post(url, json=payload)
+    record["status"] = resp.status_code
+    if resp.status_code == 200:
+      record["metrics"] = resp.json().get("metrics", {})
+  except Exception as err:  # noqa: BLE001 - 실패도 결과의 일부로 센다
+    record["status"] = 0
+    record["error"] = repr(err)
+  record["latency_s"] = time.perf_counter() - t0
+  return record
+
+
+async def run_closed(client: Any, url: str, args: argparse.Namespace, rng: random.Random) -> List[Dict[str, Any]]:
+  records: List[Dict[str, Any]] = []
+  counter = iter(range(args.requests))
+
+  async def _client() -> None:
+    for index in counter:
+      records.append(await send_one(client, url, sample_prompt(args.prompt_dist, rng, index), args))
+
+  await asyncio.gather(*(_client() for _ in range(args.concurrency)))
+  return records
+
+
+async def run_open(client: Any, url: str, args: argparse.Namespace, rng: random.Random) -> List[Dict[str, Any]]:
+  tasks: List[asyncio.Task] = []
+  start = time.perf_counter()
+  index = 0
+  next_at = start
+  while next_at - start < args.duration and (not args.requests or index < args.requests):
+    await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+    tasks.append(asyncio.create_task(send_one(client, url, sample_prompt(args.prompt_dist, rng, index), args)))
+    index += 1
+    next_at += rng.expovariate(args.rate)
+  return list(await asyncio.gather(*tasks))
+
+
+async def run_load(base_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+  import httpx
+
+  rng = random.Random(args.seed)
+  url = base_url.rstrip("/") + "/chat"
+  limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+  async with httpx.AsyncClient(timeout=httpx.Timeout(None, connect=5.0), limits=limits) as client:
+    if args.warmup:
+      await asyncio.gather(*(send_one(client, url, f"warmup {i}", args) for i in range(args.warmup)))
+    t0 = time.perf_counter()
+    runner = run_closed if args.mode == "closed" else run_open
+    records = await runner(client, url, args, rng)
+    wall = time.perf_counter() - t0
+  return summarize(records, wall, args)
+
+
+def summarize(records: List[Dict[str, Any]], wall: float, args: argparse.Namespace) -> Dict[str, Any]:
+  ok = [r for r in records if r["status"] == 200]
+  metrics = [r["metrics"] for r in ok]
+  ttft = [m["ttft_ms"] / 1000.0 for m in metrics if "ttft_ms" in m]
+  server_total = [m["total_ms"] / 1000.0 for m in metrics if "total_ms" in m]
+  latency = [r["latency_s"] for r in ok]
+  tokens = sum(int(m.get("tokens", 0)) for m in metrics)
+  prompt_tokens = [int(m["prompt_tokens"]) for m in metrics if "prompt_tokens" in m]
+
+  def _pcts(values: List[float]) -> Dict[str, float]:
+    return {f"p{q}": percentile(values, q) for q in PERCENTILES}
+
+  return {
+    "mode": args.mode,
+    "concurrency": args.concurrency if args.mode == "closed" else None,
+    "rate": args.rate if args.mode == "open" else None,
+    "prompt_dist": ":".join(f"{v:g}" if isinstance(v, float) else v for v in args.prompt_dist),
+    "max_tokens": args.max_tokens,
+    "requests": len(records),
+    "ok": len(ok),
+    "errors": len(records) - len(ok),
+    "wall_s": wall,
+    "requests_per_s": len(ok) / wall if wall else 0.0,
+    "tokens": tokens,
+    "tokens_per_s": tokens / wall if wall else 0.0,
+    "mean_prompt_tokens": sum(prompt_tokens) / len(prompt_tokens) if prompt_tokens else 0.0,
+    "ttft_s": _pcts(ttft),
+    "server_total_s": _pcts(server_total),
+    "latency_s": _pcts(latency),
+  }
+
+
+def build_markdown(result: Dict[str, Any], target: str) -> str:
+  load = f"concurrency {result['concurrency']}" if result["mode"] == "closed" else f"rate {result['rate']} req/s"
+  lines = [
+    f"# /chat load test ({target})",
+    "",
+    f"{result['mode']}-loop, {load}, prompt {result['prompt_dist']} words "
+    f"(~{result['mean_prompt_tokens']:.0f} tokens), max_tokens={result['max_tokens']}",
+    "",
+    f"{result['ok']}/{result['requests']} ok in {result['wall_s']:.1f}s: "
+    f"{result['requests_per_s']:.2f} req/s, {result['tokens_per_s']:.1f} tokens/s",
+    "",
+    "| metric | p50 | p90 | p99 |",
+    "| --- | ---: | ---: | ---: |",
+  ]
+  for key, label in (("ttft_s", "TTFT (s)"), ("server_total_s", "server total (s)"), ("latency_s", "client latency (s)")):
+    row = result[key]
+    lines.append(f"| {label} | {row['p50']:.3f} | {row['p90']:.3f} | {row['p99']:.3f} |")
+  return "\n".join(lines) + "\n"
+
+
+# ------------------------------------------------------------ local server
+def _free_port() -> int:
+  with socket.socket() as sock:
+    sock.bind(("127.0.0.1", 0))
+    return sock.getsockname()[1]
+
+
+def start_local_server(args: argparse.Namespace) -> tuple:
+  import os
+
+  from server_base import run_server
+
+  os.environ.setdefault("AI_RESPONSE_CACHE_SIZE", "0")  # 캐시 적중이 측정을 흐리지 않게
+  port = _free_port()
+  proc = mp.get_context("spawn").Process(
+    target=run_server,
+    args=("bench", port, args.model),
+    kwargs={
+      "temperature": args.temperature,
+      "max_tokens": args.max_tokens,
+      "backend": args.backend,
+      "max_batch_size": args.max_batch_size,
+      "host": "127.0.0.1",
+    },
+    daemon=True,
+  )
+  proc.start()
+  return proc, f"http://127.0.0.1:{port}"
+
+
+async def wait_ready(base_url: str, proc: Any, timeout_s: float) -> None:
+  import httpx
+
+  deadline = time.monotonic() + timeout_s
+  async with httpx.AsyncClient(timeout=2.0) as client:
+    while time.monotonic() < deadline:
+      if proc is not None and not proc.is_alive():
+        raise SystemExit("[bench] local server exited while loading")
+      try:
+        if (await client.get(base_url + "/health")).status_code == 200:
+          return
+      except httpx.HTTPError:
+        pass
+      await asyncio.sleep(0.5)
+  raise SystemExit(f"[bench] {base_url} did not become ready")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--url", help="existing server base URL; without it a local server is started")
+  parser.add_argument("--model", default="tiny-model", help="model for the local server")
+  parser.add_argument("--backend", default="tiny", help="backend for the local server (tiny, mock, torch)")
+  parser.add_argument("--max-batch-size", type=int, default=None)
+  parser.add_argument("--mode", choices=("closed", "open"), default="closed")
+  parser.add_argument("--concurrency", type=int, default=4, help="closed loop: concurrent clients")
+  parser.add_argument("--requests", type=int, default=32, help="closed loop: total requests; open loop: cap (0 = none)")
+  parser.add_argument("--rate", type=float, default=2.0, help="open loop: mean arrivals per second")
+  parser.add_argument("--duration", type=float, default=20.0, help="open loop: seconds of arrivals")
+  parser.add_argument("--prompt-dist", type=parse_dist, default=parse_dist("uniform:8:64"))
+  parser.add_argument("--max-tokens", type=int, default=32)
+  parser.add_argument("--temperature", type=float, default=0.0)
+  parser.add_argument("--warmup", type=int, default=2, help="requests sent before measuring")
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument("--ready-timeout", type=float, default=600.0)
+  parser.add_argument("--out", type=Path, help="write JSON results here (markdown goes next to it)")
+  return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+  args = parse_args(argv)
+  proc: Optional[Any] = None
+  base_url = args.url
+  if base_url is None:
+    proc, base_url = start_local_server(args)
+  try:
+    asyncio.run(wait_ready(base_url, proc, args.ready_timeout))
+    result = asyncio.run(run_load(base_url, args))
+  finally:
+    if proc is not None:
+      proc.terminate()
+      proc.join(timeout=30)
+
+  target = args.url or f"local {args.backend}:{args.model}"
+  result["target"] = target
+  markdown = build_markdown(result, target)
+  print(markdown)
+  if args.out:
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    args.out.with_suffix(".md").write_text(markdown, encoding="utf-8")
+
+
+if __name__ == "__main__":
+  main()
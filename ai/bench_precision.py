@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""Compare torch CPU precision modes on a fixed prompt set.
+
+Each mode runs in its own spawned process so peak RSS is measured per mode.
+Every prompt is decoded greedily and the output token ids are compared with
+the fp32 run, giving tokens/s, peak RSS and divergence in one table.
+
+    python bench_precision.py --model Qwen/Qwen3-0.6B --max-new-tokens 128
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+DEFAULT_PROMPTS = Path(__file__).resolve().parents[1] / "RAG_zzin" / "tests" / "queries.json"
+
+
+def load_prompts(path: Path) -> List[str]:
+  raw = json.loads(path.read_text(encoding="utf-8"))
+  seq = raw["queries"] if isinstance(raw, dict) else raw
+  return [item if isinstance(item, str) else item.get("question") or item.get("query") for item in seq]
+
+
+def run_mode(model_id: str, precision: str, prompts: List[str], max_new_tokens: int, queue: Any) -> None:
+  import torch
+  from server_base import load_model
+
+  torch.manual_seed(0)
+  t0 = time.perf_counter()
+  loaded = load_model(model_id, "torch", precision=precision, max_batch_size=1)
+  load_s = time.perf_counter() - t0
+  tok, model = loaded.tokenizer, loaded.model
+
+  outputs: List[List[int]] = []
+  gen_tokens = 0
+  gen_s = 0.0
+  for prompt in prompts:
+    text = tok.apply_chat_template([{"role": "user", "content": prompt}], tokenize=False, add_generation_prompt=True)
+    inputs = tok(text, return_tensors="pt")
+    start = time.perf_counter()
+    with torch.no_grad():
+      out = model.generate(
+        **inputs,
+        max_new_tokens=max_new_tokens,
+        do_sample=False,
+        eos_token_id=tok.eos_token_id,
+        pad_token_id=tok.eos_token_id,
+      )
+    gen_s += time.perf_counter() - start
+    ids = out[0, inputs["input_ids"].shape[-1]:].tolist()
+    gen_tokens += len(ids)
+    outputs.append(ids)
+
+  queue.put(
+    {
+      "precision": precision,
+      "load_s": load_s,
+      "tokens": gen_tokens,
+      "tokens_per_s": gen_tokens / gen_s if gen_s else 0.0,
+      "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+      "outputs": outputs,
+    }
+  )
+
+
+def divergence(reference: List[List[int]], candidate: List[List[int]]) -> Dict[str, float]:
+  """fp32 대비 토큰 일치율, 완전 일치 비율, 평균 첫 불일치 위치."""
+  matched = total = exact = 0
+  first_diffs: List[int] = []
+  for ref, cand in zip(reference, candidate):
+    length = max(len(ref), len(cand))
+    same = 0
+    while same < min(len(ref), len(cand)) and ref[same] == cand[same]:
+      same += 1
+    matched += sum(1 for a, b in zip(ref, cand) if a == b)
+    total += length
+    exact += int(ref == cand)
+    first_diffs.append(same)
+  return {
+    "token_agreement": matched / total if total else 1.0,
+    "exact_match": exact / len(reference) if reference else 1.0,
+    "mean_first_divergence": sum(first_diffs) / len(first_diffs) if first_diffs else 0.0,
+  }
+
+
+def build_markdown(results: List[Dict[str, Any]], model_id: str, max_new_tokens: int, n_prompts: int) -> str:
+  lines = [
+    f"# Precision benchmark ({model_id})",
+    "",
+    f"{n_prompts} prompts, greedy, max_new_tokens={max_new_tokens}",
+    "",
+    "| precision | tokens/s | peak RSS (MB) | load (s) | token agreement | exact match | first divergence |",
+    "| --- | ---: | ---: | ---: | ---: | ---: | ---: |",
+  ]
+  for r in results:
+    d = r["divergence"]
+    lines.append(
+      f"| {r['precision']} | {r['tokens_per_s']:.1f} | {r['peak_rss_mb']:.0f} | {r['load_s']:.1f} "
+      f"| {d['token_agreement']:.3f} | {d['exact_match']:.2f} | {d['mean_first_divergence']:.1f} |"
+    )
+  return "\n".join(lines) + "\n"
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+  from server_base import PRECISIONS
+
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--model", default="Qwen/Qwen3-0.6B")
+  parser.add_argument("--modes", nargs="+", choices=PRECISIONS, default=list(PRECISIONS))
+  parser.add_argument("--prompts", type=Path, default=DEFAULT_PROMPTS, help="JSON list or {'queries': [...]}")
+  parser.add_argument("--max-new-tokens", type=int, default=128)
+  parser.add_argument("--out", type=Path, help="write JSON results here (markdown goes next to it)")
+  return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+  args = parse_args(argv)
+  prompts = load_prompts(args.prompts)
+  modes = ["fp32"] + [m for m in args.modes if m != "fp32"]
+  ctx = mp.get_context("spawn")
+
+  results: List[Dict[str, Any]] = []
+  for mode in modes:
+    queue = ctx.Queue()
+    proc = ctx.Process(target=run_mode, args=(args.model, mode, prompts, args.max_new_tokens, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    print(f"[bench] {mode}: {result['tokens_per_s']:.1f} tok/s, peak RSS {result['peak_rss_mb']:.0f} MB")
+    results.append(result)
+
+  reference = results[0]["outputs"]
+  for r in results:
+    r["divergence"] = divergence(reference, r["outputs"])
+
+  markdown = build_markdown(results, args.model, args.max_new_tokens, len(prompts))
+  print(markdown)
+  if args.out:
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    args.out.with_suffix(".md").write_text(markdown, encoding="utf-8")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,168 @@
+"""Static KV cache + torch.compile decode path for CPU serving.
+
+For a 0.6B model the per-token kernels are tiny, so eager decoding with a
+dynamic cache is dominated by Python and dispatch overhead. This scheduler
+keeps a pre-allocated `StaticCache` and runs each decode step through a
+`torch.compile`d single-token forward. Cache lengths are rounded up to a
+fixed set of buckets so there is one compiled graph per bucket, and
+`warmup()` compiles them all at startup instead of on the first request.
+
+Requests are decoded one at a time (a static cache has one shared position
+per batch), so this mode suits low-concurrency CPU deployments. Requests that
+do not fit the largest bucket, or that use prompt-lookup decoding, fall back
+to the continuous-batching path of `BatchScheduler`. The static path does not
+use the prefix cache or KV quantization.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any
+
+import torch
+from transformers import StaticCache
+
+try:
+    from .scheduler import BatchScheduler, GenerationJob, _memory_mb, _prefill_peak_mb, _Slot
+except ImportError:  # pragma: no cover - fallback when executed as script
+    from scheduler import BatchScheduler, GenerationJob, _memory_mb, _prefill_peak_mb, _Slot
+
+DEFAULT_BUCKETS = (512, 1024, 2048, 4096)
+
+
+def parse_buckets(spec: str | None) -> tuple[int, ...]:
+    """'512,1024,2048' -> (512, 1024, 2048). 비어 있으면 기본값."""
+    if not spec:
+        return DEFAULT_BUCKETS
+    return tuple(sorted({int(part) for part in spec.split(",") if part.strip()}))
+
+
+class CompiledDecodeScheduler(BatchScheduler):
+    """BatchScheduler 와 같은 submit/stats API. 버킷에 맞는 요청은 static cache + 컴파일된 디코드로 돈다."""
+
+    def __init__(
+        self,
+        model: Any,
+        device: torch.device,
+        *,
+        buckets: tuple[int, ...] = DEFAULT_BUCKETS,
+        compile_backend: str = "inductor",
+        **kwargs: Any,
+    ):
+        kwargs["max_batch_size"] = 1
+        super().__init__(model, device, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self.compile_backend = compile_backend
+        # 버킷마다 캐시 텐서 모양이 달라 한 번씩 다시 컴파일된다.
+        torch._dynamo.config.cache_size_limit = max(torch._dynamo.config.cache_size_limit, 2 * len(self.buckets))
+        self._step_fn = torch.compile(self._decode_forward, dynamic=False, backend=compile_backend)
+        self._cache: StaticCache | None = None
+        self._running: GenerationJob | None = None
+
+    def stats(self) -> dict[str, int]:
+        stats = super().stats()
+        with self._cond:
+            stats["active"] += int(self._running is not None)
+        return stats
+
+    def _bucket(self, job: GenerationJob) -> int | None:
+        need = job.prompt_len + job.max_new_tokens
+        return next((bucket for bucket in self.buckets if bucket >= need), None)
+
+    def _static_cache(self, bucket: int) -> StaticCache:
+        # 한 번에 한 버킷의 캐시만 들고 있는다 (버킷이 바뀌면 새로 잡는다).
+        if self._cache is None or self._cache.max_cache_len != bucket:
+            self._cache = StaticCache(config=self.model.config, max_cache_len=bucket)
+        else:
+            self._cache.reset()
+        return self._cache
+
+    def _decode_forward(self, input_ids: torch.Tensor, cache_position: torch.Tensor, cache: StaticCache) -> torch.Tensor:
+        out = self.model(input_ids=input_ids, cache_position=cache_position, past_key_values=cache, use_cache=True)
+        return out.logits[:, -1]
+
+    def _prefill_static(self, input_ids: torch.Tensor, cache: StaticCache) -> tuple[torch.Tensor, int]:
+        """프롬프트를 prefill_chunk 단위로 static cache 에 채우고 (마지막 logits, 청크 수) 를 돌려준다."""
+        length = int(input_ids.shape[-1])
+        chunk = self.prefill_chunk or length
+        chunks = 0
+        for start in range(0, length, chunk):
+            part = input_ids[:, start : start + chunk]
+            positions = torch.arange(start, start + part.shape[-1], device=self.device)
+            out = self.model(
+                input_ids=part, cache_position=positions, past_key_values=cache, use_cache=True, logits_to_keep=1
+            )
+            chunks += 1
+        return out.logits[0, -1], chunks
+
+    def warmup(self, prompt_tokens: int = 8, steps: int = 2) -> float:
+        """모든 버킷의 디코드 그래프를 미리 컴파일한다. 걸린 초를 돌려준다."""
+        t0 = time.perf_counter()
+        with torch.no_grad():
+            for bucket in self.buckets:
+                cache = self._static_cache(bucket)
+                ids = torch.zeros(1, prompt_tokens, dtype=torch.long, device=self.device)
+                self._prefill_static(ids, cache)
+                for pos in range(prompt_tokens, prompt_tokens + steps):
+                    token = torch.zeros(1, 1, dtype=torch.long, device=self.device)
+                    self._step_fn(token, torch.tensor([pos], device=self.device), cache)
+        return time.perf_counter() - t0
+
+    # ----------------------------------------------------------------- loop
+    def _iterate(self) -> None:
+        with self._cond:
+            while not self._pending and not self._active_jobs():
+                self._cond.wait()
+            job = None
+            if not self._active_jobs():
+                head = self._pending[0]
+                if head.prompt_lookup_tokens <= 0 and self._bucket(head) is not None:
+                    job = self._running = self._pending.pop(0)
+        if job is None:
+            # 버킷보다 긴 요청, prompt-lookup 요청은 동적 캐시 경로로 처리한다.
+            super()._iterate()
+            return
+        try:
+            if self.set_adapter is not None:
+                self.set_adapter(job.adapter)
+            with torch.no_grad():
+                self._run_static(job)
+        except Exception as err:  # pragma: no cover - surfaced to handlers
+            print(f"[AI-WARN] Compiled decode failed ({err}).")
+            self._finish(job, "error", err)
+        finally:
+            with self._cond:
+                self._running = None
+
+    def _run_static(self, job: GenerationJob) -> None:
+        job.admitted_at = time.perf_counter()
+        if job.max_new_tokens <= 0:
+            self._finish(job, "length")
+            return
+        reason = self._stop_reason(job, None)
+        if reason is not None:
+            self._finish(job, reason)
+            return
+        bucket = self._bucket(job)
+        cache = self._static_cache(bucket)
+        if self.device.type == "cuda":
+            torch.cuda.reset_peak_memory_stats(self.device)
+        start_mb = _memory_mb(self.device)
+        logits, chunks = self._prefill_static(job.input_ids.to(self.device), cache)
+        job.metrics.update(
+            {
+                "cached_prompt_tokens": 0,
+                "prefill_chunks": chunks,
+                "prefill_peak_mb": _prefill_peak_mb(start_mb, _memory_mb(self.device, peak=True)),
+                "decode_mode": "compiled",
+                "cache_bucket": bucket,
+            }
+        )
+        slot = _Slot(job=job, processors=self._processors(job), next_token=-1, position=job.prompt_len)
+        if job.seed is not None:
+            slot.generator = torch.Generator(device=self.device).manual_seed(job.seed)
+        while not self._emit(slot, self._sample(slot, logits), logits.unsqueeze(0)):
+            token = torch.tensor([[slot.next_token]], device=self.device)
+            position = torch.tensor([slot.position], device=self.device)
+            logits = self._step_fn(token, position, cache)[0]
+            slot.position += 1
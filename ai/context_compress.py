@@ -0,0 +1,127 @@
+"""Similarity-ranked compression of retrieved contexts before prefill.
+
+On CPU, prefill time grows with every prompt token, and RAG contexts are
+usually pasted in whole. `compress_contexts` splits the contexts into
+sentences, scores all of them against the query in one batched call to the
+embedding model that is already loaded (cosine similarity of normalised
+vectors), and keeps the best sentences until a token budget is reached.
+Kept sentences stay in their original order and each context keeps its
+other fields (source, date, tags...), so citations still line up.
+
+Used by the role servers' in-process RAG (`rag_local.py`) and by
+`RAG_zzin.pipeline.RAGPipeline.answer_query`. Depends on numpy only.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Sequence
+
+import numpy as np
+
+# 문장 부호(+닫는 따옴표·괄호) 뒤 공백이나 줄바꿈에서 자른다. "2.5%" 같은 소수점은 공백이 없어 안 잘린다.
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s+|(?<=[.!?][\"'”’)\]])\s+|\n+")
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+Encoder = Callable[[list[str]], Any]  # 문장 목록 -> [N, D] 벡터
+
+
+def approx_tokens(text: str) -> int:
+    """LLM 토크나이저가 없을 때의 근사치 (단어/기호 조각 수)."""
+    return len(_TOKEN.findall(text))
+
+
+def split_sentences(text: str) -> list[str]:
+    return [part.strip() for part in _SENTENCE_END.split(text) if part and part.strip()]
+
+
+@dataclass
+class CompressionResult:
+    contexts: list[dict[str, Any]]
+    original_tokens: int
+    compressed_tokens: int
+    total_sentences: int
+    kept_sentences: int
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "original_tokens": self.original_tokens,
+            "compressed_tokens": self.compressed_tokens,
+            "ratio": round(self.compressed_tokens / self.original_tokens, 3) if self.original_tokens else 1.0,
+            "total_sentences": self.total_sentences,
+            "kept_sentences": self.kept_sentences,
+        }
+
+
+def _normalize(vectors: Any) -> np.ndarray:
+    arr = np.asarray(vectors, dtype=np.float32)
+    if arr.ndim == 1:
+        arr = arr.reshape(1, -1)
+    return arr / (np.linalg.norm(arr, axis=1, keepdims=True) + 1e-12)
+
+
+def compress_contexts(
+    query: str,
+    contexts: Sequence[dict[str, Any]],
+    encode: Encoder,
+    *,
+    token_budget: int,
+    count_tokens: Callable[[str], int] = approx_tokens,
+    text_key: str = "text",
+) -> CompressionResult:
+    """질의와 가장 비슷한 문장부터 token_budget 안에서 고르고, 원래 순서대로 다시 잇는다.
+
+    예산 안에 이미 들어오면 임베딩 없이 그대로 돌려준다. 문장 하나가 예산보다 커도
+    가장 점수가 높은 문장 하나는 남겨 근거가 비지 않게 한다.
+    """
+    sentences: list[tuple[int, str, int]] = []  # (context index, sentence, tokens)
+    original_tokens = 0
+    for ci, ctx in enumerate(contexts):
+        text = str(ctx.get(text_key) or "")
+        original_tokens += count_tokens(text)
+        sentences.extend((ci, sent, count_tokens(sent)) for sent in split_sentences(text))
+
+    if token_budget <= 0 or original_tokens <= token_budget or not sentences:
+        return CompressionResult(
+            contexts=[dict(ctx) for ctx in contexts],
+            original_tokens=original_tokens,
+            compressed_tokens=original_tokens,
+            total_sentences=len(sentences),
+            kept_sentences=len(sentences),
+        )
+
+    # 질의와 모든 문장을 한 번에 인코딩한다.
+    vectors = _normalize(encode([query] + [sent for _, sent, _ in sentences]))
+    scores = vectors[1:] @ vectors[0]
+
+    keep = np.zeros(len(sentences), dtype=bool)
+    used = 0
+    for idx in np.argsort(-scores, kind="stable"):
+        cost = sentences[idx][2]
+        if used + cost <= token_budget or not keep.any():
+            keep[idx] = True
+            used += cost
+        if used >= token_budget:
+            break
+
+    kept_by_ctx: dict[int, list[str]] = {}
+    for (ci, sent, _), kept in zip(sentences, keep):
+        if kept:
+            kept_by_ctx.setdefault(ci, []).append(sent)
+
+    out: list[dict[str, Any]] = []
+    compressed_tokens = 0
+    for ci, ctx in enumerate(contexts):
+        if ci not in kept_by_ctx:
+            continue
+        text = " ".join(kept_by_ctx[ci])
+        compressed_tokens += count_tokens(text)
+        out.append({**ctx, text_key: text})
+    return CompressionResult(
+        contexts=out,
+        original_tokens=original_tokens,
+        compressed_tokens=compressed_tokens,
+        total_sentences=len(sentences),
+        kept_sentences=int(keep.sum()),
+    )
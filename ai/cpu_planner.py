@@ -0,0 +1,153 @@
+"""Partition CPU cores across role workers and replicas.
+
+Without a plan every torch process sizes its intra-op pool to all cores, so
+eco/firm/house (and their replicas) oversubscribe the box. The planner reads
+the core topology from sysfs, keeps SMT siblings of a physical core together,
+fills one package before the next, and hands each worker a contiguous slice
+sized by its role weight. A worker applies its slot with `apply_slot` (CPU
+affinity + `torch.set_num_threads` + interop threads) before it loads or runs
+the model.
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Iterable
+
+_SYSFS_CPU = Path("/sys/devices/system/cpu")
+
+_ACTIVE: "CpuSlot | None" = None
+
+
+@dataclass(frozen=True)
+class CpuSlot:
+    role: str
+    replica: int
+    cpus: tuple[int, ...]
+    intra_threads: int
+    interop_threads: int = 1
+    shared: bool = False  # 코어가 워커 수보다 적어 다른 워커와 겹친다
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def parse_weights(spec: str | None) -> dict[str, float]:
+    """"eco=2,firm=1,house=1" -> {"eco": 2.0, ...}. 빈 값이면 {}."""
+    weights: dict[str, float] = {}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        role, _, value = item.partition("=")
+        try:
+            weights[role.strip()] = float(value)
+        except ValueError:
+            raise ValueError(f"bad CPU weight {item!r}; expected role=number") from None
+    return weights
+
+
+def _read_int(path: Path, default: int) -> int:
+    try:
+        return int(path.read_text().strip())
+    except (OSError, ValueError):
+        return default
+
+
+def physical_cores(cpus: Iterable[int] | None = None) -> list[tuple[int, ...]]:
+    """사용 가능한 논리 CPU 를 물리 코어 단위로 묶어 (package, core) 순으로 돌려준다."""
+    cpus = sorted(os.sched_getaffinity(0) if cpus is None else cpus)
+    cores: dict[tuple[int, int], list[int]] = {}
+    for cpu in cpus:
+        topo = _SYSFS_CPU / f"cpu{cpu}" / "topology"
+        package = _read_int(topo / "physical_package_id", 0)
+        core = _read_int(topo / "core_id", cpu)
+        cores.setdefault((package, core), []).append(cpu)
+    return [tuple(cores[key]) for key in sorted(cores)]
+
+
+def _apportion(total: int, weights: list[float]) -> list[int]:
+    """최대 나머지 방식으로 total 을 weights 비율로 나누되 각자 최소 1."""
+    n = len(weights)
+    if total <= n:
+        return [1] * n
+    if sum(weights) <= 0:
+        weights = [1.0] * n
+    scale = sum(weights)
+    raw = [total * w / scale for w in weights]
+    counts = [max(1, int(r)) for r in raw]
+    while sum(counts) > total:
+        counts[counts.index(max(counts))] -= 1
+    order = sorted(range(n), key=lambda i: raw[i] - counts[i], reverse=True)
+    for i in order[: total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def plan_cpus(
+    workers: list[tuple[str, int]],
+    weights: dict[str, float] | None = None,
+    *,
+    cpus: Iterable[int] | None = None,
+) -> list[CpuSlot]:
+    """workers 는 [(role, replicas), ...]. 워커(역할×replica) 마다 CpuSlot 하나."""
+    weights = weights or {}
+    cores = physical_cores(cpus)
+    flat = [(role, replica) for role, replicas in workers for replica in range(max(1, replicas))]
+    if not flat or not cores:
+        return []
+    counts = _apportion(len(cores), [weights.get(role, 1.0) for role, _ in flat])
+    shared = len(cores) < len(flat)
+
+    slots: list[CpuSlot] = []
+    start = 0
+    for (role, replica), count in zip(flat, counts):
+        picked = [cores[(start + i) % len(cores)] for i in range(count)]
+        start += count
+        slots.append(
+            CpuSlot(
+                role=role,
+                replica=replica,
+                cpus=tuple(cpu for core in picked for cpu in core),
+                # GEMM 은 SMT 형제 스레드로 빨라지지 않으므로 물리 코어 수만큼만 돌린다.
+                intra_threads=len(picked),
+                shared=shared,
+            )
+        )
+    return slots
+
+
+def format_plan(slots: list[CpuSlot]) -> str:
+    lines = []
+    for slot in slots:
+        cpus = ",".join(str(c) for c in slot.cpus)
+        note = " (shared)" if slot.shared else ""
+        lines.append(
+            f"  {slot.role:<6} replica {slot.replica}: cpus [{cpus}] "
+            f"threads={slot.intra_threads} interop={slot.interop_threads}{note}"
+        )
+    return "\n".join(lines)
+
+
+def apply_slot(slot: CpuSlot) -> None:
+    """현재 프로세스를 slot 에 고정한다. 모델 로드/추론 전에 호출해야 interop 설정이 먹는다."""
+    import torch
+
+    global _ACTIVE
+    try:
+        os.sched_setaffinity(0, slot.cpus)
+    except (AttributeError, OSError) as err:
+        print(f"[AI-WARN] Could not pin {slot.role}#{slot.replica} to cpus {slot.cpus}: {err}")
+    os.environ["OMP_NUM_THREADS"] = str(slot.intra_threads)
+    torch.set_num_threads(slot.intra_threads)
+    try:
+        torch.set_num_interop_threads(slot.interop_threads)
+    except RuntimeError:
+        # 이미 inter-op 병렬 작업이 돌았다 (fork 된 replica). 부모 설정을 그대로 쓴다.
+        pass
+    _ACTIVE = slot
+
+
+def active_slot() -> CpuSlot | None:
+    return _ACTIVE
@@ -0,0 +1,191 @@
+"""Pluggable inference engines for `server_base.load_model`.
+
+Besides the real `torch` and `rbln` backends, two engines need no downloaded
+weights and run on any Linux box:
+
+- ``mock``: a deterministic stand-in model that sleeps to emulate a given
+  prefill rate (prompt tokens/s) and decode rate (batched steps/s) and emits a
+  fixed token pattern. It speaks the same forward/KV-cache interface as a HF
+  causal LM, so the HTTP layer, batch scheduler, prefix cache, response cache
+  and streaming all run unchanged on top of it.
+- ``tiny``: a randomly initialised two-layer Qwen3 model, small enough for CPU
+  regression tests of the real torch code paths.
+
+Both use the tokenizer in ``model_id`` when it is a local directory and fall
+back to a byte-level tokenizer otherwise. Rates are read from
+``AI_MOCK_PREFILL_TPS`` / ``AI_MOCK_DECODE_TPS``.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import torch
+from transformers import AutoTokenizer, BatchEncoding, DynamicCache
+from transformers.modeling_outputs import CausalLMOutputWithPast
+
+# engine 이름 -> (model_id, precision) -> (tokenizer, model, device)
+EngineLoader = Callable[[str, str], tuple[Any, Any, torch.device]]
+ENGINES: dict[str, EngineLoader] = {}
+
+_MOCK_TEXT = (
+    " the market rate rose while households cut spending and firms held prices"
+    " so inflation cooled as growth slowed and the central bank paused"
+)
+
+
+def register_engine(name: str) -> Callable[[EngineLoader], EngineLoader]:
+    def _register(loader: EngineLoader) -> EngineLoader:
+        ENGINES[name] = loader
+        return loader
+
+    return _register
+
+
+class ByteTokenizer:
+    """UTF-8 바이트 단위 토크나이저. 로컬 토크나이저가 없을 때 mock/tiny 엔진이 쓴다."""
+
+    SPECIALS = ("<|endoftext|>", "<|im_start|>", "<|im_end|>")
+
+    def __init__(self):
+        self.special_ids = {tok: 256 + i for i, tok in enumerate(self.SPECIALS)}
+        self.eos_token_id = self.special_ids["<|im_end|>"]
+        self.pad_token_id = self.special_ids["<|endoftext|>"]
+
+    def __len__(self) -> int:
+        return 256 + len(self.SPECIALS)
+
+    def apply_chat_template(self, messages: list[dict], tokenize: bool = False, add_generation_prompt: bool = False, **_):
+        text = "".join(f"<|im_start|>{m['role']}\n{m['content']}<|im_end|>\n" for m in messages)
+        if add_generation_prompt:
+            text += "<|im_start|>assistant\n"
+        return self.encode(text) if tokenize else text
+
+    def encode(self, text: str, add_special_tokens: bool = False, **_) -> list[int]:
+        ids: list[int] = []
+        rest = text
+        while rest:
+            cut = min(
+                ((rest.find(tok), tok) for tok in self.SPECIALS if tok in rest),
+                default=(len(rest), None),
+            )
+            ids.extend(rest[: cut[0]].encode("utf-8"))
+            if cut[1] is None:
+                break
+            ids.append(self.special_ids[cut[1]])
+            rest = rest[cut[0] + len(cut[1]):]
+        return ids
+
+    def __call__(self, text: str, return_tensors: str | None = None, add_special_tokens: bool = True, **_):
+        ids = self.encode(text)
+        return BatchEncoding({"input_ids": [ids], "attention_mask": [[1] * len(ids)]}, tensor_type=return_tensors)
+
+    def decode(self, ids: Any, skip_special_tokens: bool = False, **_) -> str:
+        if isinstance(ids, torch.Tensor):
+            ids = ids.tolist()
+        out = bytearray()
+        specials = {v: k for k, v in self.special_ids.items()}
+        for i in ids:
+            if i < 256:
+                out.append(i)
+            elif not skip_special_tokens and i in specials:
+                out.extend(specials[i].encode("utf-8"))
+        return out.decode("utf-8", errors="replace")
+
+
+def _load_tokenizer(model_id: str) -> Any:
+    if (Path(model_id) / "tokenizer_config.json").exists():
+        return AutoTokenizer.from_pretrained(model_id, trust_remote_code=True)
+    return ByteTokenizer()
+
+
+class MockCausalLM(torch.nn.Module):
+    """HF causal LM 과 같은 forward/KV 인터페이스를 가진 결정적 모델.
+
+    KV 캐시에는 토큰 id 를 담아 두고, 다음 토큰은 (지금까지 토큰 id 의 합, 위치) 로 정해진다.
+    left padding 은 0 이라 합에 영향이 없으므로 배칭/prefix cache/speculative 경로와 무관하게
+    같은 프롬프트는 같은 출력을, 다른 프롬프트는 (대개) 다른 출력을 낸다.
+    forward 한 번의 비용은 max(입력 토큰 / prefill_tps, 1 / decode_tps) 초로 흉내 낸다.
+    """
+
+    def __init__(self, vocab_size: int, pattern: list[int], *, prefill_tps: float, decode_tps: float):
+        super().__init__()
+        self.vocab_size = vocab_size
+        self.register_buffer("pattern", torch.tensor(pattern, dtype=torch.long), persistent=False)
+        self.prefill_tps = prefill_tps
+        self.decode_tps = decode_tps
+        self.forward_calls = 0
+
+    def forward(
+        self,
+        input_ids: torch.Tensor,
+        attention_mask: torch.Tensor | None = None,
+        position_ids: torch.Tensor | None = None,
+        past_key_values: DynamicCache | None = None,
+        use_cache: bool = True,
+        **_: Any,
+    ) -> CausalLMOutputWithPast:
+        batch, length = input_ids.shape
+        self.forward_calls += 1
+        delay = max(
+            length / self.prefill_tps if self.prefill_tps > 0 else 0.0,
+            1.0 / self.decode_tps if self.decode_tps > 0 else 0.0,
+        )
+        if delay:
+            time.sleep(delay)
+
+        cache = past_key_values if past_key_values is not None else DynamicCache()
+        past_len = cache.get_seq_length()
+        if position_ids is None:
+            position_ids = torch.arange(past_len, past_len + length, device=input_ids.device).expand(batch, length)
+        # float64 라 토큰 id 합이 커져도 정확하다.
+        state = input_ids.to(torch.float64).view(batch, 1, length, 1)
+        keys, _ = cache.update(state, state, 0)
+        prefix_sums = keys.view(batch, -1).cumsum(-1)[:, -length:].to(torch.long)
+
+        nxt = self.pattern[(prefix_sums * 7 + position_ids) % self.pattern.numel()]
+        logits = torch.full((batch, length, self.vocab_size), -30.0, device=input_ids.device)
+        logits.scatter_(-1, nxt.unsqueeze(-1), 30.0)
+        return CausalLMOutputWithPast(logits=logits, past_key_values=cache)
+
+
+@register_engine("mock")
+def load_mock(model_id: str, precision: str) -> tuple[Any, Any, torch.device]:
+    tokenizer = _load_tokenizer(model_id)
+    pattern = [i for i in tokenizer.encode(_MOCK_TEXT, add_special_tokens=False) if i != tokenizer.eos_token_id]
+    model = MockCausalLM(
+        len(tokenizer),
+        pattern,
+        prefill_tps=float(os.environ.get("AI_MOCK_PREFILL_TPS", "2000")),
+        decode_tps=float(os.environ.get("AI_MOCK_DECODE_TPS", "50")),
+    ).eval()
+    print(f"[AI] Mock engine (prefill {model.prefill_tps:.0f} tok/s, decode {model.decode_tps:.0f} steps/s)")
+    return tokenizer, model, torch.device("cpu")
+
+
+@register_engine("tiny")
+def load_tiny(model_id: str, precision: str) -> tuple[Any, Any, torch.device]:
+    from transformers import Qwen3Config, Qwen3ForCausalLM
+
+    tokenizer = _load_tokenizer(model_id)
+    config = Qwen3Config(
+        vocab_size=len(tokenizer),
+        hidden_size=64,
+        intermediate_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        head_dim=16,
+        max_position_embeddings=4096,
+        eos_token_id=tokenizer.eos_token_id,
+        tie_word_embeddings=True,
+    )
+    torch.manual_seed(0)  # 같은 설정이면 항상 같은 가중치
+    model = Qwen3ForCausalLM(config).eval()
+    if precision == "bf16":
+        model = model.to(torch.bfloat16)
+    print(f"[AI] Tiny random Qwen3 engine (vocab {len(tokenizer)})")
+    return tokenizer, model, torch.device("cpu")
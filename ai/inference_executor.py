@@ -0,0 +1,87 @@
+"""Keep blocking inference work off the asyncio event loop.
+
+`InferenceExecutor` is a small dedicated thread pool for the CPU-bound pieces
+of a request (tokenization, joining a generation, the blocking `generate`
+fallback), so the event loop only awaits futures. `AsyncTextStreamer` is the
+asyncio-facing side of token streaming: the generating thread pushes decoded
+text into an `asyncio.Queue` and handlers consume it with `async for`, so no
+worker thread is parked per in-flight request.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from transformers import TextStreamer
+
+T = TypeVar("T")
+
+_END = object()
+
+
+class InferenceExecutor:
+    def __init__(self, *, max_workers: int = 4, name: str = "ai-infer"):
+        self.max_workers = max(1, max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class AsyncTextStreamer(TextStreamer):
+    """`TextIteratorStreamer` 와 같은 put/end 인터페이스, 소비는 `async for` 로 한다.
+
+    생성된 토큰 id/수와 토큰별 도착 시각(`token_times`), 증분 detokenize 에 쓴 시간을
+    함께 기록하므로 metrics 를 위해 결과 텍스트를 다시 토크나이즈할 필요가 없다.
+    """
+
+    def __init__(self, tokenizer: Any, *, loop: asyncio.AbstractEventLoop, skip_prompt: bool = False, **decode_kwargs):
+        super().__init__(tokenizer, skip_prompt, **decode_kwargs)
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.token_count = 0
+        self.token_ids: list[int] = []
+        self.token_times: list[float] = []  # time.perf_counter()
+        self.detokenize_s = 0.0
+
+    def put(self, value: Any) -> None:
+        if self.skip_prompt and self.next_tokens_are_prompt:
+            super().put(value)
+            return
+        now = time.perf_counter()
+        n = int(value.numel())
+        self.token_count += n
+        self.token_ids.extend(value.reshape(-1).tolist())
+        self.token_times.extend([now] * n)
+        super().put(value)
+        self.detokenize_s += time.perf_counter() - now
+
+    def _push(self, item: Any) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+        except RuntimeError:
+            # 이벤트 루프가 이미 닫혔다 (서버 종료 중). 생성 스레드는 그대로 끝나게 둔다.
+            pass
+
+    def on_finalized_text(self, text: str, stream_end: bool = False) -> None:
+        if text:
+            self._push(text)
+        if stream_end:
+            self._push(_END)
+
+    def __aiter__(self) -> "AsyncTextStreamer":
+        return self
+
+    async def __anext__(self) -> str:
+        item = await self.queue.get()
+        if item is _END:
+            raise StopAsyncIteration
+        return item
@@ -0,0 +1,195 @@
+"""Quantized KV cache for the batch scheduler (int8 / int4).
+
+Keys are quantized per channel (one scale per sequence, head and channel,
+calibrated on the prompt and widened when a decoded token exceeds it), values
+per token, both symmetric. int4 codes are packed two per byte along the head
+dimension. `QuantizedKVCache` is a transformers `Cache`: each layer
+dequantizes its stored KV only while that layer's attention runs, so at most
+one layer is held in full precision at a time, and new tokens are quantized
+as they are appended. It also implements the batch surgery the scheduler
+needs (left padding, batch concat, row selection, cropping).
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import torch
+from transformers.cache_utils import Cache, CacheLayerMixin
+
+KV_QUANT_MODES = ("int8", "int4")
+_QMAX = {8: 127, 4: 7}
+
+
+def _pack4(q: torch.Tensor) -> torch.Tensor:
+    """[-7, 7] int8 코드 두 개를 uint8 하나에 담는다 (마지막 축 길이가 짝수여야 한다)."""
+    u = (q + 8).to(torch.uint8)
+    return u[..., 0::2] | (u[..., 1::2] << 4)
+
+
+def _unpack4(p: torch.Tensor) -> torch.Tensor:
+    lo = (p & 0x0F).to(torch.int8) - 8
+    hi = (p >> 4).to(torch.int8) - 8
+    return torch.stack([lo, hi], dim=-1).flatten(-2)
+
+
+class _QuantizedLayer(CacheLayerMixin):
+    """한 레이어의 양자화된 K/V. 모양은 [B, H, T, D] (int4 는 D/2 바이트)."""
+
+    def __init__(self, bits: int):
+        super().__init__()
+        self.bits = bits
+        self.qmax = _QMAX[bits]
+        self.kq: torch.Tensor | None = None
+        self.kscale: torch.Tensor | None = None  # [B, H, 1, D]
+        self.vq: torch.Tensor | None = None
+        self.vscale: torch.Tensor | None = None  # [B, H, T, 1]
+        self.dtype = torch.float32
+
+    # ---------------------------------------------------------- codes
+    def _encode(self, q: torch.Tensor) -> torch.Tensor:
+        return _pack4(q) if self.bits == 4 else q
+
+    def _decode(self, stored: torch.Tensor) -> torch.Tensor:
+        return _unpack4(stored) if self.bits == 4 else stored
+
+    def _quantize(self, x: torch.Tensor, scale: torch.Tensor) -> torch.Tensor:
+        return self._encode(torch.clamp(torch.round(x / scale), -self.qmax, self.qmax).to(torch.int8))
+
+    def _value_scale(self, v: torch.Tensor) -> torch.Tensor:
+        return v.abs().amax(dim=-1, keepdim=True).float().clamp_min(1e-8) / self.qmax
+
+    # ---------------------------------------------------------- storage
+    def store(self, keys: torch.Tensor, values: torch.Tensor) -> None:
+        self.dtype, self.device = keys.dtype, keys.device
+        self.kscale = keys.abs().amax(dim=-2, keepdim=True).float().clamp_min(1e-8) / self.qmax
+        self.kq = self._quantize(keys.float(), self.kscale)
+        self.vscale = self._value_scale(values)
+        self.vq = self._quantize(values.float(), self.vscale)
+        self.is_initialized = True
+
+    def append(self, keys: torch.Tensor, values: torch.Tensor) -> None:
+        if not self.is_initialized:
+            self.store(keys, values)
+            return
+        need = keys.abs().amax(dim=-2, keepdim=True).float() / self.qmax
+        if bool((need > self.kscale).any()):
+            # 범위를 넘는 채널은 scale 을 넓히고 기존 코드를 그 비율로 다시 양자화한다.
+            wider = torch.maximum(self.kscale, need)
+            old = self._decode(self.kq).float() * (self.kscale / wider)
+            self.kq = self._encode(torch.clamp(torch.round(old), -self.qmax, self.qmax).to(torch.int8))
+            self.kscale = wider
+        vscale = self._value_scale(values)
+        self.kq = torch.cat([self.kq, self._quantize(keys.float(), self.kscale)], dim=-2)
+        self.vq = torch.cat([self.vq, self._quantize(values.float(), vscale)], dim=-2)
+        self.vscale = torch.cat([self.vscale, vscale], dim=-2)
+
+    def dequantize(self) -> tuple[torch.Tensor, torch.Tensor]:
+        keys = (self._decode(self.kq).float() * self.kscale).to(self.dtype)
+        values = (self._decode(self.vq).float() * self.vscale).to(self.dtype)
+        return keys, values
+
+    @property
+    def nbytes(self) -> int:
+        if not self.is_initialized:
+            return 0
+        return sum(t.numel() * t.element_size() for t in (self.kq, self.kscale, self.vq, self.vscale))
+
+    # ---------------------------------------------------------- Cache API
+    def lazy_initialization(self, key_states: torch.Tensor) -> None:
+        self.dtype, self.device = key_states.dtype, key_states.device
+
+    def update(
+        self, key_states: torch.Tensor, value_states: torch.Tensor, cache_kwargs: dict[str, Any] | None = None
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        if not self.is_initialized:
+            self.store(key_states, value_states)
+            return key_states, value_states
+        keys, values = self.dequantize()
+        self.append(key_states, value_states)
+        return torch.cat([keys, key_states], dim=-2), torch.cat([values, value_states], dim=-2)
+
+    def get_seq_length(self) -> int:
+        return 0 if self.vq is None else int(self.vq.shape[-2])
+
+    def get_mask_sizes(self, cache_position: torch.Tensor) -> tuple[int, int]:
+        return self.get_seq_length() + cache_position.shape[0], 0
+
+    def get_max_cache_shape(self) -> int:
+        return -1
+
+
+class QuantizedKVCache(Cache):
+    def __init__(self, bits: int, num_layers: int = 0):
+        super().__init__(layers=[_QuantizedLayer(bits) for _ in range(num_layers)])
+        self.bits = bits
+
+    @classmethod
+    def from_legacy(cls, kv: list[tuple[torch.Tensor, torch.Tensor]], bits: int) -> "QuantizedKVCache":
+        cache = cls(bits, len(kv))
+        for layer, (k, v) in zip(cache.layers, kv):
+            layer.store(k, v)
+        return cache
+
+    @property
+    def nbytes(self) -> int:
+        return sum(layer.nbytes for layer in self.layers)
+
+    def to_legacy(self) -> list[tuple[torch.Tensor, torch.Tensor]]:
+        return [layer.dequantize() for layer in self.layers]
+
+    # ------------------------------------------------ scheduler batch surgery
+    def left_pad(self, pad: int) -> "QuantizedKVCache":
+        if pad <= 0:
+            return self
+        for layer in self.layers:
+            layer.kq = torch.cat([layer.kq.new_zeros(*layer.kq.shape[:2], pad, layer.kq.shape[3]), layer.kq], dim=2)
+            layer.vq = torch.cat([layer.vq.new_zeros(*layer.vq.shape[:2], pad, layer.vq.shape[3]), layer.vq], dim=2)
+            layer.vscale = torch.cat([layer.vscale.new_zeros(*layer.vscale.shape[:2], pad, 1), layer.vscale], dim=2)
+        return self
+
+    def cat_batch(self, other: "QuantizedKVCache") -> "QuantizedKVCache":
+        for mine, theirs in zip(self.layers, other.layers):
+            for name in ("kq", "kscale", "vq", "vscale"):
+                setattr(mine, name, torch.cat([getattr(mine, name), getattr(theirs, name)], dim=0))
+        return self
+
+    def select(self, idx: torch.Tensor, start: int = 0) -> "QuantizedKVCache":
+        for layer in self.layers:
+            layer.kq = layer.kq.index_select(0, idx)[:, :, start:]
+            layer.kscale = layer.kscale.index_select(0, idx)
+            layer.vq = layer.vq.index_select(0, idx)[:, :, start:]
+            layer.vscale = layer.vscale.index_select(0, idx)[:, :, start:]
+        return self
+
+    def crop(self, keep: int) -> "QuantizedKVCache":
+        for layer in self.layers:
+            layer.kq, layer.vq, layer.vscale = layer.kq[:, :, :keep], layer.vq[:, :, :keep], layer.vscale[:, :, :keep]
+        return self
+
+
+def kv_nbytes(kv: Any) -> int:
+    if kv is None:
+        return 0
+    if isinstance(kv, QuantizedKVCache):
+        return kv.nbytes
+    if isinstance(kv, Cache):
+        kv = kv.to_legacy_cache()
+    return sum(k.numel() * k.element_size() + v.numel() * v.element_size() for k, v in kv)
+
+
+def kv_token_bytes(config: Any, dtype: torch.dtype, bits: int | None = None) -> int:
+    """모델 config 로 계산한 토큰 하나의 KV 바이트 (config 가 없으면 0).
+
+    레이어마다 K/V 각각 kv_heads * head_dim 개다. 양자화하면 코드 bits/8 바이트에
+    value 의 토큰별 scale (head 당 fp32 하나) 이 붙는다. key scale 은 시퀀스당 하나라 뺀다.
+    """
+    layers = getattr(config, "num_hidden_layers", None)
+    heads = getattr(config, "num_attention_heads", None)
+    if not layers or not heads:
+        return 0
+    kv_heads = getattr(config, "num_key_value_heads", None) or heads
+    head_dim = getattr(config, "head_dim", None) or config.hidden_size // heads
+    if bits is None:
+        return layers * 2 * kv_heads * head_dim * dtype.itemsize
+    return layers * (2 * kv_heads * head_dim * bits // 8 + kv_heads * 4)
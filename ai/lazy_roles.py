@@ -0,0 +1,265 @@
+"""Lazy role activation: load a role's model on first request, unload when idle.
+
+`main.py --lazy` runs one light front process that listens on every role port
+without loading any model. The first request for a role starts that role's
+regular worker (`run_server`) on a loopback port, waits for its /health, and
+proxies the request. A sweeper stops workers that have been idle longer than
+`idle_s` while more than `warm_min` roles are loaded, least recently used
+first. `/metrics` and `/trace` never load a role or count as use: they are
+forwarded only while the worker is loaded. Stopping the worker process (instead of dropping the model inside a
+live process) gives the memory back to the OS.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing as mp
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+
+# 프록시가 그대로 넘기면 안 되는 hop-by-hop 헤더
+_HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-length", "host"}
+
+
+@dataclass
+class _RoleWorker:
+    role: str
+    port: int
+    target: Callable[..., Any]
+    args: tuple
+    kwargs: dict[str, Any]
+    process: Any = None
+    last_used: float = 0.0
+    inflight: int = 0
+    loads: int = 0
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    @property
+    def loaded(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+
+class LazyRolePool:
+    def __init__(self, *, idle_s: float = 600.0, warm_min: int = 1, load_timeout_s: float = 900.0):
+        self.idle_s = idle_s
+        self.warm_min = max(0, warm_min)
+        self.load_timeout_s = load_timeout_s
+        self.workers: dict[str, _RoleWorker] = {}
+        self._client: httpx.AsyncClient | None = None
+
+    def add(self, role: str, port: int, target: Callable[..., Any], args: tuple, kwargs: dict[str, Any]) -> None:
+        self.workers[role] = _RoleWorker(role=role, port=port, target=target, args=args, kwargs=kwargs)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # 생성은 오래 걸릴 수 있으므로 read timeout 은 두지 않는다 (deadline_ms 가 대신한다).
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=5.0))
+        return self._client
+
+    # ------------------------------------------------------------ lifecycle
+    async def acquire(self, role: str) -> _RoleWorker:
+        """worker 를 (필요하면 띄워서) 돌려주고 inflight 를 올린다. release 와 짝을 맞춘다."""
+        worker = self.workers[role]
+        worker.inflight += 1
+        try:
+            async with worker.lock:
+                if not worker.loaded:
+                    await self._start(worker)
+        except BaseException:
+            worker.inflight -= 1
+            raise
+        worker.last_used = time.monotonic()
+        return worker
+
+    def release(self, worker: _RoleWorker) -> None:
+        worker.inflight -= 1
+        worker.last_used = time.monotonic()
+
+    async def _start(self, worker: _RoleWorker) -> None:
+        t0 = time.perf_counter()
+        print(f"[AI] Activating {worker.role} (worker port {worker.port})")
+        # daemon 으로 띄워 앞단이 어떻게 끝나든 worker 가 남지 않게 한다 (replica 는 os.fork 라 무관).
+        proc = mp.get_context("spawn").Process(
+            target=worker.target, args=worker.args, kwargs=worker.kwargs, daemon=True
+        )
+        proc.start()
+        worker.process = proc
+        url = f"http://127.0.0.1:{worker.port}/health"
+        deadline = time.monotonic() + self.load_timeout_s
+        while time.monotonic() < deadline:
+            if not proc.is_alive():
+                worker.process = None
+                raise HTTPException(status_code=503, detail=f"{worker.role} worker exited while loading")
+            try:
+                if (await self.client.get(url)).status_code == 200:
+                    worker.loads += 1
+                    print(f"[AI] {worker.role} ready in {time.perf_counter() - t0:.1f}s")
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+        self._stop(worker)
+        raise HTTPException(status_code=503, detail=f"{worker.role} worker did not become ready")
+
+    def _stop(self, worker: _RoleWorker) -> None:
+        proc, worker.process = worker.process, None
+        if proc is None:
+            return
+        proc.terminate()
+        proc.join(timeout=30)
+        if proc.is_alive():
+            proc.kill()
+            proc.join()
+
+    async def sweep(self) -> None:
+        """idle_s 넘게 쉬고 있는 worker 를 LRU 순으로 내리되 warm_min 개는 남긴다."""
+        now = time.monotonic()
+        loaded = sorted((w for w in self.workers.values() if w.loaded), key=lambda w: w.last_used)
+        for worker in loaded:
+            if len([w for w in self.workers.values() if w.loaded]) <= self.warm_min:
+                return
+            if worker.inflight or worker.lock.locked() or now - worker.last_used < self.idle_s:
+                continue
+            print(f"[AI] Unloading {worker.role} after {now - worker.last_used:.0f}s idle")
+            async with worker.lock:
+                await asyncio.to_thread(self._stop, worker)
+
+    async def run_sweeper(self) -> None:
+        interval = max(1.0, min(self.idle_s / 4.0, 30.0))
+        while True:
+            await asyncio.sleep(interval)
+            await self.sweep()
+
+    def stop_all(self) -> None:
+        for worker in self.workers.values():
+            self._stop(worker)
+
+    def status(self, role: str) -> dict[str, Any]:
+        worker = self.workers[role]
+        return {
+            "loaded": worker.loaded,
+            "inflight": worker.inflight,
+            "loads": worker.loads,
+            "idle_s": round(time.monotonic() - worker.last_used, 1) if worker.last_used else None,
+        }
+
+
+def build_front_app(pool: LazyRolePool, role: str) -> FastAPI:
+    app = FastAPI(title=f"Eco-Mentos AI ({role}, lazy front)")
+
+    @app.get("/health")
+    async def health():
+        """모델을 띄우지 않는다. 로드돼 있으면 worker 의 /health 도 같이 돌려준다."""
+        payload: dict[str, Any] = {"status": "ok", "role": role, "lazy": pool.status(role)}
+        worker = pool.workers[role]
+        if worker.loaded and not worker.lock.locked():
+            try:
+                resp = await pool.client.get(f"http://127.0.0.1:{worker.port}/health", timeout=2.0)
+                payload["worker"] = resp.json()
+            except (httpx.HTTPError, ValueError):
+                pass
+        return payload
+
+    async def _peek(path: str, req: Request) -> Response | None:
+        """로드된 worker 에만 GET 을 넘긴다 (acquire 하지 않아 모델을 띄우지도, last_used 를 바꾸지도 않는다)."""
+        worker = pool.workers[role]
+        if not worker.loaded or worker.lock.locked():
+            return None
+        try:
+            url = f"http://127.0.0.1:{worker.port}/{path}"
+            resp = await pool.client.get(url, params=req.query_params, timeout=5.0)
+        except httpx.HTTPError:
+            return None
+        headers = {k: v for k, v in resp.headers.items() if k.lower() not in _HOP_HEADERS}
+        return Response(content=resp.content, status_code=resp.status_code, headers=headers)
+
+    @app.get("/metrics")
+    async def metrics(req: Request):
+        """Prometheus scrape 가 role 을 깨우거나 idle unload 를 막지 않도록 앞단이 직접 답한다."""
+        status = pool.status(role)
+        labels = f'role="{role}"'
+        lines = [
+            "# HELP ai_role_loaded Whether the role worker is loaded (lazy front).",
+            "# TYPE ai_role_loaded gauge",
+            f"ai_role_loaded{{{labels}}} {int(status['loaded'])}",
+            "# HELP ai_role_loads_total Number of times the role worker was started.",
+            "# TYPE ai_role_loads_total counter",
+            f"ai_role_loads_total{{{labels}}} {status['loads']}",
+        ]
+        upstream = await _peek("metrics", req)
+        body = upstream.body.decode("utf-8") if upstream is not None and upstream.status_code == 200 else ""
+        if body and not body.endswith("\n"):
+            body += "\n"
+        return PlainTextResponse(body + "\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+    @app.get("/trace")
+    async def trace(req: Request):
+        upstream = await _peek("trace", req)
+        if upstream is None:
+            raise HTTPException(status_code=404, detail=f"{role} worker is not loaded")
+        return upstream
+
+    @app.api_route("/{path:path}", methods=["GET", "POST"])
+    async def proxy(path: str, req: Request):
+        worker = await pool.acquire(role)
+        try:
+            upstream = pool.client.build_request(
+                req.method,
+                f"http://127.0.0.1:{worker.port}/{path}",
+                params=req.query_params,
+                headers={k: v for k, v in req.headers.items() if k.lower() not in _HOP_HEADERS},
+                content=await req.body(),
+            )
+            resp = await pool.client.send(upstream, stream=True)
+        except BaseException:
+            pool.release(worker)
+            raise
+
+        async def _body():
+            # 클라이언트가 끊으면 여기서 upstream 을 닫고, worker 가 연결 종료를 보고 생성을 멈춘다.
+            try:
+                async for chunk in resp.aiter_raw():
+                    yield chunk
+            finally:
+                await resp.aclose()
+                pool.release(worker)
+
+        headers = {k: v for k, v in resp.headers.items() if k.lower() not in _HOP_HEADERS}
+        if resp.headers.get("content-type", "").startswith("text/event-stream"):
+            return StreamingResponse(_body(), status_code=resp.status_code, headers=headers)
+        try:
+            content = await resp.aread()
+        finally:
+            await resp.aclose()
+            pool.release(worker)
+        return Response(content=content, status_code=resp.status_code, headers=headers)
+
+    return app
+
+
+def run_lazy_front(role_ports: dict[str, int], pool: LazyRolePool) -> None:
+    servers = [
+        uvicorn.Server(uvicorn.Config(build_front_app(pool, role), host="0.0.0.0", port=port))
+        for role, port in role_ports.items()
+    ]
+
+    async def _serve_all():
+        sweeper = asyncio.create_task(pool.run_sweeper())
+        try:
+            await asyncio.gather(*(server.serve() for server in servers))
+        finally:
+            sweeper.cancel()
+
+    try:
+        asyncio.run(_serve_all())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop_all()
@@ -1,8 +1,11 @@
 from __future__ import annotations
-import os, signal, sys
+import argparse, os, signal, sys
 from multiprocessing import Process
+from pathlib import Path
 from typing import Dict
-from server_base import run_server, register_rbln_loras
+from cpu_planner import format_plan, parse_weights, plan_cpus
+from lazy_roles import LazyRolePool, run_lazy_front
+from server_base import PRECISIONS, run_multi_role_server, run_server, register_rbln_loras
 
 ROLE_PORTS = {
     "eco": 8001,
@@ -10,6 +13,14 @@ ROLE_PORTS = {
     "house": 8003,
 }
 
+AI_DIR = Path(__file__).resolve().parent
+
+# GPU/CPU 경로에서 요청별 lora_name 으로 고르는 PEFT adapter
+ROLE_LORA_DIRS = {
+    role: os.environ.get(f"{role.upper()}_LORA_PATH", str(AI_DIR / role / "lora" / f"qwen3_0p6b_lora_{role}" / "final"))
+    for role in ROLE_PORTS
+}
+
 def detect_device_backend():
     """
     NPU (RBLN Atom) > GPU (CUDA) > CPU 순으로 자동 감지
@@ -43,6 +54,7 @@ def resolve_model_paths():
     """
     NPU: compiled RBLN 모델 사용
     GPU/CPU: HuggingFace 모델 + LoRA 사용
+    MODEL_BACKEND=mock|tiny: 가중치 없이 서빙 계층만 돌리는 엔진 (ai/engines.py)
     """
     backend = os.environ.get("MODEL_BACKEND", detect_device_backend())
     default_model = os.environ.get("MODEL_ID", "Qwen/Qwen3-0.6B")
@@ -71,7 +83,76 @@ def resolve_model_paths():
         "house": house_model,
     }, backend
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="AI Economic Interpreter - Multi-Role Server")
+    parser.add_argument(
+        "--single-process",
+        action="store_true",
+        default=os.environ.get("AI_SINGLE_PROCESS", "0") == "1",
+        help="torch backend: load the base model once with all role LoRA adapters and serve every role port from one process",
+    )
+    parser.add_argument(
+        "--precision",
+        choices=PRECISIONS,
+        default=os.environ.get("AI_PRECISION", "fp32"),
+        help="torch CPU weight precision (see bench_precision.py to compare modes)",
+    )
+    parser.add_argument(
+        "--replicas",
+        type=int,
+        default=int(os.environ.get("AI_REPLICAS", "1")),
+        help="torch CPU: load the model once per role, then fork N uvicorn workers sharing its weights copy-on-write on the same port",
+    )
+    parser.add_argument(
+        "--cpu-weights",
+        default=os.environ.get("AI_CPU_WEIGHTS", ""),
+        help="torch CPU: relative core share per role for the CPU plan, e.g. eco=2,firm=1,house=1 (default: equal)",
+    )
+    parser.add_argument(
+        "--no-cpu-plan",
+        action="store_true",
+        default=os.environ.get("AI_CPU_PLAN", "1") == "0",
+        help="let every worker use all cores instead of partitioning them (see bench_cpu_plan.py)",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        default=os.environ.get("AI_TRACE", "0") == "1",
+        help="record per-request stage spans; each role serves them as Chrome trace JSON on GET /trace",
+    )
+    parser.add_argument(
+        "--lazy",
+        action="store_true",
+        default=os.environ.get("AI_LAZY", "0") == "1",
+        help="start a light front on each role port; load a role's worker on its first request and unload it when idle",
+    )
+    parser.add_argument(
+        "--idle-unload-s",
+        type=float,
+        default=float(os.environ.get("AI_LAZY_IDLE_S", "600")),
+        help="--lazy: stop a role worker after this many idle seconds",
+    )
+    parser.add_argument(
+        "--warm-min",
+        type=int,
+        default=int(os.environ.get("AI_LAZY_WARM_MIN", "1")),
+        help="--lazy: never unload below this many loaded roles (least recently used goes first)",
+    )
+    return parser.parse_args(argv)
+
+def build_cpu_plan(args, backend, roles):
+    """torch CPU 백엔드에서 역할×replica 워커마다 코어를 나눠 준다. 그 외에는 None."""
+    if args.no_cpu_plan or backend == "rbln":
+        return None
+    import torch
+    if torch.cuda.is_available():
+        return None
+    slots = plan_cpus([(role, args.replicas) for role in roles], parse_weights(args.cpu_weights))
+    print("[AI-Main] CPU plan:\n" + format_plan(slots))
+    return slots
+
+def main(argv=None):
+    args = parse_args(argv)
     models, backend = resolve_model_paths()
 
     print(f"""
@@ -94,6 +175,53 @@ def main():
                 p.terminate()
         sys.exit(0)
 
+    if args.lazy and args.single_process:
+        print("[AI-Main] ⚠️  --lazy activates roles one by one; ignoring it with --single-process")
+
+    if args.single_process:
+        if backend == "rbln" or len(set(models.values())) != 1:
+            print("[AI-Main] ⚠️  --single-process needs the torch backend and one shared base model; using per-role processes")
+        else:
+            print("[AI-Main] ✅ Single process: one base model, LoRA adapters " + ", ".join(ROLE_LORA_DIRS))
+            plan = build_cpu_plan(args, backend, ["+".join(ROLE_PORTS)])
+            run_multi_role_server(
+                ROLE_PORTS,
+                models["eco"],
+                temperature=0.2,
+                max_tokens=4096,
+                backend=backend,
+                lora_map=ROLE_LORA_DIRS,
+                precision=args.precision,
+                replicas=args.replicas,
+                cpu_slots=plan,
+                enable_trace=args.trace,
+            )
+            return
+
+    plan = build_cpu_plan(args, backend, list(ROLE_PORTS))
+
+    def role_kwargs(role):
+        return {
+            "temperature": 0.2,
+            "max_tokens": 4096,
+            "backend": backend,
+            "lora_map": {role: ROLE_LORA_DIRS[role]} if backend != "rbln" else None,
+            "precision": args.precision,
+            "replicas": args.replicas,
+            "cpu_slots": [s for s in plan if s.role == role] if plan else None,
+            "enable_trace": args.trace,
+        }
+
+    if args.lazy:
+        # 역할 worker 는 loopback 의 (포트 + offset) 에서 돌고, 앞단이 역할 포트를 받는다.
+        offset = int(os.environ.get("AI_LAZY_PORT_OFFSET", "100"))
+        pool = LazyRolePool(idle_s=args.idle_unload_s, warm_min=args.warm_min)
+        for role, port in ROLE_PORTS.items():
+            pool.add(role, port + offset, run_server, (role, port + offset, models[role]), {**role_kwargs(role), "host": "127.0.0.1"})
+        print(f"[AI-Main] ✅ Lazy front on ports {', '.join(map(str, ROLE_PORTS.values()))} (idle unload {args.idle_unload_s:.0f}s, warm min {args.warm_min})")
+        run_lazy_front(ROLE_PORTS, pool)
+        return
+
     signal.signal(signal.SIGINT, shutdown)
     signal.signal(signal.SIGTERM, shutdown)
 
@@ -102,7 +230,7 @@ def main():
         p = Process(
             target=run_server,
             args=(role, port, model_id),
-            kwargs={"temperature": 0.2, "max_tokens": 4096, "backend": backend},
+            kwargs=role_kwargs(role),
         )
         p.start()
         procs[role] = p
@@ -85,42 +85,107 @@ def load_embedding_model():
         print(f"[FAISS] Error loading model: {e}")
         sys.exit(1)
 
+def read_role_index(role: str) -> Optional[tuple]:
+    """Read (faiss index, metadata list) for one role, or None if its files are missing"""
+    index_path = DATA_DIR / f"index_{role}.bin"
+    meta_path = DATA_DIR / f"metadata_{role}.json"
+
+    if not index_path.exists():
+        print(f"[FAISS] Warning: Index not found for {role}: {index_path}")
+        print(f"[FAISS] Run 'python scripts/build_faiss_index.py' to create indices")
+        return None
+
+    if not meta_path.exists():
+        print(f"[FAISS] Warning: Metadata not found for {role}: {meta_path}")
+        return None
+
+    index = faiss.read_index(str(index_path))
+    print(f"[FAISS] Loaded index for {role}: {index.ntotal} vectors")
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    print(f"[FAISS] Loaded metadata for {role}: {len(meta)} documents")
+    return index, meta
+
 def load_indices():
     """Load FAISS indices and metadata for all roles"""
     global indices, metadata
 
     for role in ROLES:
-        index_path = DATA_DIR / f"index_{role}.bin"
-        meta_path = DATA_DIR / f"metadata_{role}.json"
-
-        if not index_path.exists():
-            print(f"[FAISS] Warning: Index not found for {role}: {index_path}")
-            print(f"[FAISS] Run 'python scripts/build_faiss_index.py' to create indices")
-            continue
-
-        if not meta_path.exists():
-            print(f"[FAISS] Warning: Metadata not found for {role}: {meta_path}")
-            continue
-
         try:
-            # Load FAISS index
-            indices[role] = faiss.read_index(str(index_path))
-            print(f"[FAISS] Loaded index for {role}: {indices[role].ntotal} vectors")
-
-            # Load metadata
-            with open(meta_path, 'r', encoding='utf-8') as f:
-                metadata[role] = json.load(f)
-            print(f"[FAISS] Loaded metadata for {role}: {len(metadata[role])} documents")
-
+            loaded = read_role_index(role)
         except Exception as e:
             print(f"[FAISS] Error loading {role}: {e}")
             continue
+        if loaded is not None:
+            indices[role], metadata[role] = loaded
 
     if not indices:
         print("[FAISS] ERROR: No indices loaded!")
         print("[FAISS] Please run: python scripts/build_faiss_index.py")
         sys.exit(1)
 
+def search_hits(
+    model: SentenceTransformer,
+    role_indices: Dict[str, faiss.Index],
+    role_metadata: Dict[str, List[Dict[str, Any]]],
+    query: str,
+    roles: List[str],
+    k: int,
+) -> List[Dict[str, Any]]:
+    """Embed the query and search each role's index; hits sorted by similarity (highest first).
+
+    Shared by the /search endpoint and the in-process retriever of the role servers (ai/rag_local.py).
+    """
+    # 1. Generate query embedding
+    query_embedding = model.encode(query, convert_to_numpy=True)
+    query_embedding = query_embedding.reshape(1, -1).astype('float32')
+    faiss.normalize_L2(query_embedding)
+
+    # 2. Search each role's index
+    all_hits: List[Dict[str, Any]] = []
+
+    for role in roles:
+        index = role_indices[role]
+        meta = role_metadata[role]
+
+        # FAISS search (returns distances and indices)
+        # For normalized vectors with Inner Product, distance = 1 - cosine_sim
+        distances, idx_results = index.search(query_embedding, min(k, index.ntotal))
+
+        # Convert to hits
+        for dist, idx in zip(distances[0], idx_results[0]):
+            if idx == -1:  # FAISS returns -1 for empty results
+                continue
+
+            if idx >= len(meta):
+                print(f"[FAISS] Warning: Index {idx} out of range for {role} metadata")
+                continue
+
+            doc_meta = meta[idx]
+
+            # Calculate similarity (cosine similarity from inner product)
+            # For normalized vectors: similarity = 1 - distance/2
+            # But since we use IndexFlatIP, distance is already inner product
+            similarity = float(dist)  # Already inner product (cosine sim for normalized vectors)
+
+            all_hits.append({
+                "role": role,
+                "text": doc_meta.get("summary", ""),
+                "meta": {
+                    "id": doc_meta.get("id"),
+                    "title": doc_meta.get("title"),
+                    "source": doc_meta.get("source"),
+                    "date": doc_meta.get("date"),
+                    "tags": doc_meta.get("tags", []),
+                    "score": similarity,
+                },
+                "sim": similarity,
+            })
+
+    # 3. Sort by similarity (highest first) and limit
+    all_hits.sort(key=lambda h: h["sim"], reverse=True)
+    return all_hits[:k * len(roles)]
+
 @app.on_event("startup")
 async def startup():
     """Initialize on server start"""
@@ -180,60 +245,11 @@ async def search(req: SearchRequest):
         )
 
     try:
-        # 1. Generate query embedding
-        query_embedding = embedding_model.encode(req.query, convert_to_numpy=True)
-        query_embedding = query_embedding.reshape(1, -1).astype('float32')
-        faiss.normalize_L2(query_embedding)
-
-        # 2. Search each role's index
-        all_hits: List[SearchHit] = []
-
-        for role in valid_roles:
-            index = indices[role]
-            meta = metadata[role]
-
-            # FAISS search (returns distances and indices)
-            # For normalized vectors with Inner Product, distance = 1 - cosine_sim
-            distances, idx_results = index.search(query_embedding, min(req.k, index.ntotal))
-
-            # Convert to hits
-            for dist, idx in zip(distances[0], idx_results[0]):
-                if idx == -1:  # FAISS returns -1 for empty results
-                    continue
-
-                if idx >= len(meta):
-                    print(f"[FAISS] Warning: Index {idx} out of range for {role} metadata")
-                    continue
-
-                doc_meta = meta[idx]
-
-                # Calculate similarity (cosine similarity from inner product)
-                # For normalized vectors: similarity = 1 - distance/2
-                # But since we use IndexFlatIP, distance is already inner product
-                similarity = float(dist)  # Already inner product (cosine sim for normalized vectors)
-
-                all_hits.append(SearchHit(
-                    role=role,
-                    text=doc_meta.get("summary", ""),
-                    meta={
-                        "id": doc_meta.get("id"),
-                        "title": doc_meta.get("title"),
-                        "source": doc_meta.get("source"),
-                        "date": doc_meta.get("date"),
-                        "tags": doc_meta.get("tags", []),
-                        "score": similarity,
-                    },
-                    sim=similarity
-                ))
-
-        # 3. Sort by similarity (highest first) and limit
-        all_hits.sort(key=lambda h: h.sim, reverse=True)
-        top_hits = all_hits[:req.k * len(valid_roles)]
-
+        hits = search_hits(embedding_model, indices, metadata, req.query, valid_roles, req.k)
         query_time = (time.time() - start_time) * 1000
 
         return SearchResponse(
-            hits=top_hits,
+            hits=[SearchHit(**hit) for hit in hits],
             query_time_ms=round(query_time, 2)
         )
 
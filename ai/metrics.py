@@ -0,0 +1,90 @@
+"""Prometheus text-format histograms for the role servers.
+
+Kept dependency-free on purpose: a few fixed-bucket histograms rendered in
+the exposition format that Prometheus scrapes from `GET /metrics`.
+"""
+
+from __future__ import annotations
+
+import bisect
+from threading import Lock
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0)
+RATE_BUCKETS = (1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0, 200.0, 500.0)
+
+
+def _fmt(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # 마지막 칸은 +Inf
+        self._sum = 0.0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+
+    def render(self, labels: str) -> list[str]:
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{{labels},le="{_fmt(bound)}"}} {cumulative}')
+        lines.append(f"{self.name}_sum{{{labels}}} {total}")
+        lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class ServerMetrics:
+    """역할 서버 하나의 요청 단위 histogram 모음."""
+
+    def __init__(self, role: str):
+        self.labels = f'role="{role}"'
+        self.ttft = Histogram("ai_ttft_seconds", "Time from request arrival to first generated token.", LATENCY_BUCKETS)
+        self.inter_token = Histogram(
+            "ai_inter_token_latency_seconds", "Gap between consecutive generated tokens.", TOKEN_LATENCY_BUCKETS
+        )
+        self.queue_wait = Histogram(
+            "ai_queue_wait_seconds", "Time a request waited before the scheduler admitted it.", LATENCY_BUCKETS
+        )
+        self.tokens_per_second = Histogram(
+            "ai_tokens_per_second", "Decode throughput per request (generated tokens / decode time).", RATE_BUCKETS
+        )
+        self.request_duration = Histogram(
+            "ai_request_duration_seconds", "End-to-end generation time per request.", LATENCY_BUCKETS
+        )
+
+    def observe_request(
+        self,
+        *,
+        ttft_s: float | None,
+        total_s: float,
+        token_times: list[float],
+        queue_wait_s: float | None = None,
+        tps: float | None = None,
+    ) -> None:
+        if ttft_s is not None:
+            self.ttft.observe(ttft_s)
+        for prev, cur in zip(token_times, token_times[1:]):
+            self.inter_token.observe(cur - prev)
+        if queue_wait_s is not None:
+            self.queue_wait.observe(queue_wait_s)
+        if tps is not None:
+            self.tokens_per_second.observe(tps)
+        self.request_duration.observe(total_s)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for hist in (self.ttft, self.inter_token, self.queue_wait, self.tokens_per_second, self.request_duration):
+            lines.extend(hist.render(self.labels))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,103 @@
+"""Mixed-adapter LoRA forward: each row of a batch uses its own adapter.
+
+PEFT applies one active adapter to the whole batch, so eco/firm/house
+requests cannot share a decode step. `attach_multi_lora` replaces every PEFT
+LoRA Linear with a `MultiLoraLinear` that holds all adapters' A/B matrices
+stacked along a leading adapter axis (index 0 is an all-zero "base" adapter,
+ranks are zero-padded to the largest one, the LoRA scaling is folded into B).
+Before a forward the caller sets one adapter name per batch row on the
+shared `LoraRouter`; each layer then gathers the per-row A/B and applies the
+low-rank delta with two batched matmuls on top of the shared base output:
+
+    y = base(x) + bmm(bmm(x, A[ids]^T), B[ids]^T)
+
+The result is a plain transformers model, so `BatchScheduler` can run rows
+with different adapters in one forward pass. DoRA and other LoRA variants
+are not supported.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import torch
+from torch import nn
+
+
+class LoraRouter:
+    """배치 행마다 쓸 adapter 인덱스. 모든 MultiLoraLinear 가 같은 라우터를 본다."""
+
+    def __init__(self, names: tuple[str, ...], device: torch.device | str = "cpu"):
+        self.names = names
+        self.index = {name: i + 1 for i, name in enumerate(names)}  # 0 은 베이스 (delta 없음)
+        self.device = torch.device(device)
+        self.ids: torch.Tensor | None = None  # [B] (None 이면 모든 행이 베이스)
+
+    def set_names(self, adapters: list[str | None]) -> None:
+        """행 순서대로 adapter 이름을 받는다. None 이나 모르는 이름은 베이스 모델."""
+        ids = [self.index.get(name, 0) if name is not None else 0 for name in adapters]
+        self.ids = torch.tensor(ids, device=self.device) if any(ids) else None
+
+
+class MultiLoraLinear(nn.Module):
+    """베이스 Linear + adapter 축으로 쌓은 LoRA A [N+1, r, in], B [N+1, out, r]."""
+
+    def __init__(self, base_layer: nn.Module, lora_A: torch.Tensor, lora_B: torch.Tensor, router: LoraRouter):
+        super().__init__()
+        self.base_layer = base_layer
+        self.register_buffer("lora_A", lora_A, persistent=False)
+        self.register_buffer("lora_B", lora_B, persistent=False)
+        self.router = router
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        out = self.base_layer(x)
+        ids = self.router.ids
+        if ids is None:
+            return out
+        rows = x.reshape(x.shape[0], -1, x.shape[-1])  # [B, T, in]
+        if ids.shape[0] != rows.shape[0]:
+            ids = ids.expand(rows.shape[0])  # 한 이름으로 배치 전체를 라우팅한 경우
+        a = self.lora_A.index_select(0, ids)  # [B, r, in]
+        b = self.lora_B.index_select(0, ids)  # [B, out, r]
+        delta = torch.bmm(torch.bmm(rows.to(a.dtype), a.transpose(1, 2)), b.transpose(1, 2))
+        return out + delta.reshape(out.shape).to(out.dtype)
+
+
+def _stack(module: Any, names: tuple[str, ...]) -> tuple[torch.Tensor, torch.Tensor]:
+    """PEFT LoRA Linear 하나의 adapter 별 A/B 를 [N+1, ...] 로 쌓는다 (scaling 은 B 에 곱해 둔다)."""
+    base = module.get_base_layer()
+    in_features, out_features = module.in_features, module.out_features
+    present = [name for name in names if name in module.lora_A]
+    rank = max((module.r[name] for name in present), default=1)
+    ref = module.lora_A[present[0]].weight if present else base.weight
+    dtype = ref.dtype if ref.dtype.is_floating_point else torch.float32
+    lora_A = torch.zeros(len(names) + 1, rank, in_features, dtype=dtype, device=ref.device)
+    lora_B = torch.zeros(len(names) + 1, out_features, rank, dtype=dtype, device=ref.device)
+    for i, name in enumerate(names, start=1):
+        if name not in module.lora_A:
+            continue  # 이 모듈을 타깃으로 하지 않는 adapter
+        if getattr(module, "use_dora", {}).get(name) or name in getattr(module, "lora_variant", {}):
+            raise ValueError(f"LoRA adapter '{name}' uses a LoRA variant (e.g. DoRA); mixed batching needs plain LoRA")
+        r = module.r[name]
+        lora_A[i, :r] = module.lora_A[name].weight.detach().to(dtype)
+        lora_B[i, :, :r] = module.lora_B[name].weight.detach().to(dtype) * module.scaling[name]
+    return lora_A, lora_B
+
+
+def attach_multi_lora(peft_model: Any, names: tuple[str, ...]) -> tuple[nn.Module, LoraRouter]:
+    """PeftModel 의 LoRA Linear 를 MultiLoraLinear 로 바꾸고 (베이스 transformers 모델, 라우터) 를 돌려준다."""
+    from peft.tuners.lora import LoraLayer
+
+    model = peft_model.base_model.model
+    router = LoraRouter(names, device=next(model.parameters()).device)
+    for module_name, module in list(model.named_modules()):
+        if not isinstance(module, LoraLayer):
+            continue
+        if not isinstance(module.get_base_layer(), nn.Linear):
+            raise ValueError(f"{module_name}: mixed LoRA batching supports Linear layers only")
+        lora_A, lora_B = _stack(module, names)
+        parent_name, _, child = module_name.rpartition(".")
+        parent = model.get_submodule(parent_name) if parent_name else model
+        setattr(parent, child, MultiLoraLinear(module.get_base_layer(), lora_A, lora_B, router))
+    model.eval()
+    return model, router
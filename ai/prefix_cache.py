@@ -0,0 +1,105 @@
+"""Prefix KV-cache reuse across requests (hash-of-token-blocks).
+
+Prompts are split into fixed-size token blocks and every block boundary gets a
+chained hash, so a system prompt or earlier conversation turns shared by two
+requests map to the same keys. The cache stores `past_key_values` (legacy
+tuple layout) for block-aligned prompt prefixes and evicts least-recently-used
+entries once the memory budget is exceeded.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import torch
+
+KVCache = list[tuple[torch.Tensor, torch.Tensor]]
+
+
+@dataclass
+class _Entry:
+    kv: KVCache
+    length: int
+    nbytes: int
+    hashes: list[int] = field(default_factory=list)
+
+
+def _kv_bytes(kv: KVCache) -> int:
+    return sum(k.numel() * k.element_size() + v.numel() * v.element_size() for k, v in kv)
+
+
+class PrefixCache:
+    def __init__(self, *, block_size: int = 32, budget_bytes: int = 512 * 1024 * 1024):
+        self.block_size = max(1, block_size)
+        self.budget_bytes = budget_bytes
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()  # 마지막 블록 해시 -> entry (LRU 순)
+        self._index: dict[int, int] = {}  # 블록 해시 -> entry 키
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _block_hashes(self, ids: list[int], namespace: object = None) -> list[int]:
+        hashes: list[int] = []
+        h = hash(("prefix", namespace))
+        bs = self.block_size
+        for start in range(0, len(ids) - bs + 1, bs):
+            h = hash((h, tuple(ids[start:start + bs])))
+            hashes.append(h)
+        return hashes
+
+    def lookup(self, ids: list[int], *, max_tokens: int | None = None, namespace: object = None) -> tuple[int, KVCache | None]:
+        """가장 긴 캐시된 접두사의 (토큰 수, KV) 를 돌려준다. 없으면 (0, None)."""
+        limit = len(ids) if max_tokens is None else min(len(ids), max_tokens)
+        hashes = self._block_hashes(ids[:limit], namespace)
+        for n_blocks in range(len(hashes), 0, -1):
+            key = self._index.get(hashes[n_blocks - 1])
+            if key is None:
+                continue
+            entry = self._entries[key]
+            self._entries.move_to_end(key)
+            length = n_blocks * self.block_size
+            self.hits += 1
+            return length, [(k[:, :, :length], v[:, :, :length]) for k, v in entry.kv]
+        self.misses += 1
+        return 0, None
+
+    def insert(self, ids: list[int], kv: KVCache, *, namespace: object = None) -> None:
+        """prompt 의 블록 정렬된 접두사 KV 를 저장한다 (batch 1, legacy layout)."""
+        hashes = self._block_hashes(ids, namespace)
+        if not hashes:
+            return
+        key = hashes[-1]
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        length = len(hashes) * self.block_size
+        stored = [(k[:, :, :length].clone(), v[:, :, :length].clone()) for k, v in kv]
+        entry = _Entry(kv=stored, length=length, nbytes=_kv_bytes(stored), hashes=hashes)
+        if entry.nbytes > self.budget_bytes:
+            return
+        self._entries[key] = entry
+        self.nbytes += entry.nbytes
+        for h in hashes:
+            self._index[h] = key
+        self._evict()
+
+    def _evict(self) -> None:
+        while self.nbytes > self.budget_bytes and self._entries:
+            key, entry = self._entries.popitem(last=False)
+            self.nbytes -= entry.nbytes
+            for h in entry.hashes:
+                if self._index.get(h) == key:
+                    del self._index[h]
+            # 더 짧은 접두사를 공유하는 다른 entry 가 남아 있으면 인덱스를 되살린다.
+            for other_key, other in self._entries.items():
+                for h in other.hashes:
+                    self._index.setdefault(h, other_key)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,134 @@
+"""In-process vector search for the optional `rag` block of /chat.
+
+Uses the same index files, metadata and embedding model as `main_faiss.py`
+(its `read_role_index` / `search_hits`), so a /chat request can retrieve and
+splice contexts itself instead of the backend calling the FAISS server's
+/search first and sending the contexts back over HTTP.
+
+The embedding model and indices load on first use (or at startup with
+AI_RAG_PRELOAD=1) and are shared by every role app in the process.
+"""
+
+from __future__ import annotations
+
+import time
+from threading import Lock
+from typing import Any
+
+# prompts.ts(draftPrompt) 의 근거 블록과 같은 모양
+MAX_SNIPPET_CHARS = 500
+
+
+def _main_faiss() -> Any:
+    try:
+        from . import main_faiss
+    except ImportError:  # pragma: no cover - fallback when executed as script
+        import main_faiss
+    return main_faiss
+
+
+class RetrieverUnavailable(RuntimeError):
+    """faiss/sentence-transformers 가 없거나 인덱스 파일이 하나도 없다."""
+
+
+class LocalRetriever:
+    def __init__(self):
+        self._lock = Lock()
+        self._loaded = False
+        self._error: str | None = None
+        self.model: Any = None
+        self._search_hits: Any = None
+        self.indices: dict[str, Any] = {}
+        self.metadata: dict[str, list[dict[str, Any]]] = {}
+
+    def load(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                main_faiss = _main_faiss()
+                from sentence_transformers import SentenceTransformer
+            except ImportError as err:
+                self._fail(f"in-process RAG needs faiss-cpu and sentence-transformers ({err})")
+
+            for role in main_faiss.ROLES:
+                try:
+                    loaded = main_faiss.read_role_index(role)
+                except Exception as err:
+                    print(f"[AI-WARN] RAG index for {role} failed to load: {err}")
+                    continue
+                if loaded is not None:
+                    self.indices[role], self.metadata[role] = loaded
+            if not self.indices:
+                # 인덱스는 나중에 만들어질 수 있으므로 다음 요청에서 다시 찾는다.
+                raise RetrieverUnavailable(
+                    f"no FAISS indices under {main_faiss.DATA_DIR} (run scripts/build_faiss_index.py)"
+                )
+
+            print(f"[AI] Loading RAG embedding model: {main_faiss.EMBEDDING_MODEL}")
+            self.model = SentenceTransformer(main_faiss.EMBEDDING_MODEL)
+            self._search_hits = main_faiss.search_hits
+            self._loaded = True
+
+    def encode(self, texts: list[str]) -> Any:
+        """문장 압축(context_compress)용. 검색과 같은 임베딩 모델을 쓴다."""
+        return self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False)
+
+    def _fail(self, message: str) -> None:
+        self._error = message  # 의존성이 없으면 재시도해도 소용없다
+        raise RetrieverUnavailable(message)
+
+    def search(self, query: str, roles: list[str], k: int) -> dict[str, Any]:
+        """main_faiss `/search` 와 같은 응답 모양: {"hits": [...], "query_time_ms": ...}."""
+        if self._error is not None:
+            raise RetrieverUnavailable(self._error)
+        self.load()
+        valid = [role for role in roles if role in self.indices]
+        if not valid:
+            raise ValueError(f"No valid roles found. Available: {list(self.indices)}")
+        t0 = time.perf_counter()
+        hits = self._search_hits(self.model, self.indices, self.metadata, query, valid, k)
+        return {"hits": hits, "query_time_ms": round((time.perf_counter() - t0) * 1000.0, 2)}
+
+
+_shared: LocalRetriever | None = None
+_shared_lock = Lock()
+
+
+def shared_retriever() -> LocalRetriever:
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = LocalRetriever()
+        return _shared
+
+
+def format_contexts(hits: list[dict[str, Any]]) -> str:
+    blocks = []
+    for i, hit in enumerate(hits, start=1):
+        text = " ".join(str(hit.get("text", "")).split())
+        if len(text) > MAX_SNIPPET_CHARS:
+            text = text[: MAX_SNIPPET_CHARS - 3] + "…"
+        meta = hit.get("meta") or {}
+        source = " | ".join(str(meta[key]).strip() for key in ("source", "date") if meta.get(key))
+        blocks.append(f"[{i}] {text}" + (f"\n출처: {source}" if source else ""))
+    return "\n\n".join(blocks) if blocks else "(근거 없음)"
+
+
+def splice_contexts(messages: list[dict], hits: list[dict[str, Any]]) -> list[dict]:
+    """마지막 user 메시지 뒤에 '참고 근거' 블록을 붙인 새 메시지 목록을 돌려준다."""
+    out = [dict(m) for m in messages]
+    block = f"참고 근거:\n{format_contexts(hits)}"
+    for msg in reversed(out):
+        if msg.get("role") == "user":
+            msg["content"] = f"{msg.get('content', '')}\n\n{block}"
+            return out
+    out.append({"role": "user", "content": block})
+    return out
+
+
+def last_user_text(messages: list[dict]) -> str:
+    for msg in reversed(messages):
+        if msg.get("role") == "user":
+            return str(msg.get("content", ""))
+    return ""
@@ -0,0 +1,188 @@
+"""Exact-match response cache for deterministic /chat calls.
+
+Only requests whose output is a pure function of the payload (greedy decoding
+or an explicit seed) are cached. Entries live in an LRU with a TTL and can be
+persisted to a JSON file so they survive restarts (written off the event loop
+at most every `save_interval_s`, and once more by `flush()` at shutdown).
+Concurrent identical
+requests are coalesced (single-flight): the first one generates, the others
+await the same future.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+
+class _NotShared(Exception):
+    """store 가 거절한 결과 (예: 잘린 응답). 기다리던 요청은 각자 다시 생성한다."""
+
+
+def request_key(payload: dict[str, Any]) -> str:
+    """payload 의 정규화된 JSON 에 대한 sha256."""
+    canon = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canon.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        *,
+        max_entries: int = 256,
+        ttl_s: float = 600.0,
+        path: str | Path | None = None,
+        save_interval_s: float = 5.0,
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.path = Path(path) if path else None
+        self.save_interval_s = save_interval_s
+        self._version = 0  # put 할 때마다 올라간다
+        self._saved_version = 0
+        self._save_lock = threading.Lock()
+        self._save_task: asyncio.Task | None = None
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        if self.path is not None:
+            self._load()
+
+    # ----------------------------------------------------------- storage
+    def get(self, key: str) -> dict[str, Any] | None:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: dict[str, Any]) -> None:
+        self._entries[key] = (time.time() + self.ttl_s, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        if self.path is not None:
+            self._version += 1
+            self._schedule_save()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as err:
+            print(f"[AI-WARN] Ignoring unreadable response cache {self.path}: {err}")
+            return
+        now = time.time()
+        for key, (expires_at, value) in raw.items():
+            if expires_at >= now:
+                self._entries[key] = (expires_at, value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        print(f"[AI] Loaded {len(self._entries)} cached responses from {self.path}")
+
+    def _schedule_save(self) -> None:
+        """miss 마다 파일 전체를 다시 쓰지 않도록 save_interval_s 동안 모아서 executor 에서 한 번 쓴다."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()  # 이벤트 루프 밖에서는 바로 쓴다
+            return
+        if self._save_task is None or self._save_task.done():
+            self._save_task = loop.create_task(self._save_later())
+
+    async def _save_later(self) -> None:
+        await asyncio.sleep(self.save_interval_s)
+        # 스냅샷(얕은 복사)은 루프에서 뜨고, 직렬화와 쓰기는 스레드에서 한다.
+        snapshot = dict(self._entries)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._save, snapshot, self._version)
+        except OSError as err:
+            print(f"[AI-WARN] Could not save response cache {self.path}: {err}")
+
+    def flush(self) -> None:
+        """아직 쓰지 않은 항목을 바로 파일에 쓴다 (종료 시)."""
+        if self._save_task is not None and not self._save_task.done():
+            self._save_task.cancel()
+        if self.path is not None:
+            self._save(dict(self._entries), self._version)
+
+    def _save(self, entries: dict[str, tuple[float, dict[str, Any]]], version: int) -> None:
+        with self._save_lock:
+            # 늦게 끝난 오래된 스냅샷이 새 파일을 덮어쓰지 않게 한다.
+            if version <= self._saved_version:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f"{self.path.suffix}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.path)
+            self._saved_version = version
+
+    # ------------------------------------------------------- single-flight
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[dict[str, Any]]],
+        store: Callable[[dict[str, Any]], bool] | None = None,
+    ) -> tuple[dict[str, Any], str]:
+        """(value, status) 를 돌려준다. status 는 "hit" | "miss" | "coalesced".
+
+        store 가 주어지면 True 를 돌려준 결과만 캐시에 남기고 합류한 요청에도 넘긴다.
+        거절된 결과를 기다리던 요청은 스스로 다시 생성한다.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached, "hit"
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending), "coalesced"
+            except _NotShared:
+                self.coalesced -= 1
+                return await self.get_or_compute(key, compute, store)
+
+        self.misses += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as err:
+            fut.set_exception(err)
+            # 아무도 기다리지 않으면 "exception was never retrieved" 경고를 막는다.
+            fut.exception()
+            raise
+        else:
+            if store is None or store(value):
+                self.put(key, value)
+                fut.set_result(value)
+            else:
+                fut.set_exception(_NotShared())
+                fut.exception()
+            return value, "miss"
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_coalesced": self.coalesced,
+        }
@@ -0,0 +1,642 @@
+"""Iteration-level (continuous) batching for the torch backend.
+
+`BatchScheduler` owns the model on a single worker thread. New requests are
+prefilled and merged into the running decode batch between steps, finished
+sequences are evicted as soon as they hit EOS, and every request keeps its own
+streamer so `/chat` can still measure TTFT/TPS per request. With a
+`PrefixCache` attached, admission only prefills the uncached prompt suffix.
+Prompts are prefilled in chunks of at most `prefill_chunk` tokens per
+iteration, so a 10k-token prompt does not stall the running decode batch:
+each iteration advances the waiting prefills by one chunk budget and then
+runs one decode step. With `kv_quant` set, the running KV is kept int8/int4
+(`kv_quant.py`), and `kv_budget_bytes` holds new requests in the queue while
+the projected KV of the batch would exceed the budget.
+
+Jobs that opt into prompt-lookup decoding run as "solo" slots with their own
+KV cache: each scheduler iteration verifies an n-gram draft for them in one
+forward pass, interleaved with the batched decode step.
+
+Jobs that carry the same `SharedPrefix` (one conversation fanned out to
+several roles) prefill that prefix once per adapter: the first job's prefill
+stops at the prefix boundary to snapshot its KV, and later jobs start from
+the snapshot and only prefill their own suffix.
+
+By default one batch uses one LoRA adapter and requests for another adapter
+wait until the batch drains. With `set_batch_adapters` (see `multi_lora.py`)
+the scheduler instead routes every forward with one adapter name per row, so
+requests for different adapters share the decode batch.
+"""
+
+from __future__ import annotations
+
+import os
+import resource
+import time
+from dataclasses import dataclass, field
+from threading import Condition, Event, Thread
+from typing import Any, Callable
+
+import torch
+from transformers import (
+    DynamicCache,
+    LogitsProcessorList,
+    TemperatureLogitsWarper,
+    TopKLogitsWarper,
+    TopPLogitsWarper,
+)
+
+try:
+    from .kv_quant import KV_QUANT_MODES, QuantizedKVCache, kv_nbytes, kv_token_bytes
+    from .prefix_cache import PrefixCache
+    from .speculative import propose_prompt_lookup
+except ImportError:  # pragma: no cover - fallback when executed as script
+    from kv_quant import KV_QUANT_MODES, QuantizedKVCache, kv_nbytes, kv_token_bytes
+    from prefix_cache import PrefixCache
+    from speculative import propose_prompt_lookup
+
+# legacy 형식 [(k, v)] 또는 kv_quant 가 켜졌을 때의 QuantizedKVCache
+KVCache = list[tuple[torch.Tensor, torch.Tensor]] | QuantizedKVCache
+
+
+@dataclass(eq=False)
+class SharedPrefix:
+    """여러 job 의 input_ids 가 공유하는 앞부분 length 토큰. KV 는 adapter 별로 한 번만 계산한다."""
+
+    length: int
+    kv: dict[str | None, tuple] = field(default_factory=dict)  # adapter -> legacy KV
+
+
+@dataclass
+class GenerationJob:
+    """한 요청의 생성 상태. 스케줄러 스레드만 갱신한다."""
+
+    input_ids: torch.Tensor  # [1, prompt_len]
+    max_new_tokens: int
+    temperature: float
+    eos_token_ids: set[int]
+    streamer: Any = None
+    seed: int | None = None
+    adapter: str | None = None  # LoRA adapter 이름 (None 이면 베이스 모델)
+    stopping_criteria: list[Any] = field(default_factory=list)  # HF StoppingCriteria 호환, `reason` 속성
+    prompt_lookup_tokens: int = 0  # >0 이면 prompt-lookup 초안 길이 (solo slot 으로 실행)
+    logits_processors: list[Any] = field(default_factory=list)  # 샘플링 warper 보다 먼저 적용 (예: think budget)
+    shared_prefix: SharedPrefix | None = None
+    output_ids: list[int] = field(default_factory=list)
+    metrics: dict[str, Any] = field(default_factory=dict)  # 엔진 측 metrics (/chat 응답에 병합)
+    finish_reason: str | None = None
+    error: BaseException | None = None
+    submitted_at: float = field(default_factory=time.perf_counter)
+    admitted_at: float | None = None  # prefill 시작 시각 (대기열 대기 = admitted_at - submitted_at)
+    first_token_at: float | None = None
+    finished_at: float | None = None
+    done: Event = field(default_factory=Event)
+
+    @property
+    def prompt_len(self) -> int:
+        return int(self.input_ids.shape[-1])
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self.done.wait(timeout)
+
+
+@dataclass(eq=False)
+class _Slot:
+    job: GenerationJob
+    processors: LogitsProcessorList
+    next_token: int
+    position: int
+    generator: torch.Generator | None = None
+    kv: KVCache | None = None  # solo(speculative) slot 전용 KV
+
+
+@dataclass(eq=False)
+class _Prefill:
+    job: GenerationJob
+    input_ids: torch.Tensor  # [1, prompt_len] (device)
+    cache: Any  # DynamicCache, 프롬프트 앞쪽 done 토큰의 KV
+    done: int  # KV 에 들어간 프롬프트 토큰 수 (prefix cache 적중분 포함)
+    chunks: int = 0
+    mem_start_mb: float = 0.0  # prefill 시작 시점의 메모리 (_memory_mb)
+    mem_peak_mb: float = 0.0  # 청크마다 잰 값 중 최대
+
+
+def _memory_mb(device: torch.device, *, peak: bool = False) -> float:
+    """지금 쓰고 있는 메모리 (MB). CUDA 는 할당량 (peak 면 마지막 reset 이후 최대), CPU 는 현재 RSS.
+
+    CPU 에는 구간 최대를 주는 할당기 통계가 없으므로 peak 를 무시하고 호출 시점의 RSS 를 돌려준다.
+    """
+    if device.type == "cuda":
+        stat = torch.cuda.max_memory_allocated if peak else torch.cuda.memory_allocated
+        return stat(device) / (1024 * 1024)
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # /proc 가 없는 OS 는 프로세스 최대 RSS (Linux 는 KB 단위) 로 대신한다.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _prefill_peak_mb(start_mb: float, peak_mb: float) -> float:
+    """prefill 동안 메모리가 시작 시점보다 가장 많이 늘었던 양 (MB)."""
+    return round(max(peak_mb - start_mb, 0.0), 1)
+
+
+def _past(kv: KVCache) -> Any:
+    """forward 에 넘길 Cache. QuantizedKVCache 는 그 자리에서 갱신된다."""
+    if isinstance(kv, QuantizedKVCache):
+        return kv
+    return DynamicCache.from_legacy_cache(tuple(kv))
+
+
+def _kept(cache: Any) -> KVCache:
+    if isinstance(cache, QuantizedKVCache):
+        return cache
+    return list(cache.to_legacy_cache())
+
+
+def _left_pad(kv: KVCache, mask: torch.Tensor, width: int) -> tuple[KVCache, torch.Tensor]:
+    pad = width - mask.shape[-1]
+    if pad <= 0:
+        return kv, mask
+    mask = torch.cat([mask.new_zeros(mask.shape[0], pad), mask], dim=1)
+    if isinstance(kv, QuantizedKVCache):
+        return kv.left_pad(pad), mask
+    padded = []
+    for k, v in kv:
+        zk = k.new_zeros(k.shape[0], k.shape[1], pad, k.shape[3])
+        zv = v.new_zeros(v.shape[0], v.shape[1], pad, v.shape[3])
+        padded.append((torch.cat([zk, k], dim=2), torch.cat([zv, v], dim=2)))
+    return padded, mask
+
+
+def _cat_batch(a: KVCache, b: KVCache) -> KVCache:
+    if isinstance(a, QuantizedKVCache):
+        return a.cat_batch(b)
+    return [(torch.cat([ak, bk], dim=0), torch.cat([av, bv], dim=0)) for (ak, av), (bk, bv) in zip(a, b)]
+
+
+def _select(kv: KVCache, idx: torch.Tensor, start: int) -> KVCache:
+    if isinstance(kv, QuantizedKVCache):
+        return kv.select(idx, start)
+    return [(k.index_select(0, idx)[:, :, start:], v.index_select(0, idx)[:, :, start:]) for k, v in kv]
+
+
+def _crop(kv: KVCache, keep: int) -> KVCache:
+    if isinstance(kv, QuantizedKVCache):
+        return kv.crop(keep)
+    return [(k[:, :, :keep], v[:, :, :keep]) for k, v in kv]
+
+
+class BatchScheduler:
+    """Continuous batching over a HF causal LM (torch backend only)."""
+
+    def __init__(
+        self,
+        model: Any,
+        device: torch.device,
+        *,
+        max_batch_size: int = 8,
+        top_k: int | None = None,
+        top_p: float | None = None,
+        prefix_cache: PrefixCache | None = None,
+        set_adapter: Callable[[str | None], None] | None = None,
+        set_batch_adapters: Callable[[list[str | None]], None] | None = None,
+        kv_quant: str | None = None,
+        kv_budget_bytes: int = 0,
+        prefill_chunk: int = 0,
+    ):
+        if kv_quant and kv_quant not in KV_QUANT_MODES:
+            raise ValueError(f"Unknown kv_quant '{kv_quant}' (expected one of {', '.join(KV_QUANT_MODES)})")
+        self.model = model
+        self.device = device
+        self.max_batch_size = max(1, max_batch_size)
+        gen_cfg = getattr(model, "generation_config", None)
+        self.top_k = top_k if top_k is not None else getattr(gen_cfg, "top_k", None)
+        self.top_p = top_p if top_p is not None else getattr(gen_cfg, "top_p", None)
+        self.prefix_cache = prefix_cache
+        self.set_adapter = set_adapter
+        self.set_batch_adapters = set_batch_adapters  # 있으면 행마다 다른 adapter 를 한 배치에 태운다
+        self.kv_bits = {"int8": 8, "int4": 4}.get(kv_quant or "")
+        self.kv_budget_bytes = max(0, kv_budget_bytes)
+        self.prefill_chunk = max(0, prefill_chunk)  # 반복당 prefill 토큰 수 (0 이면 한 번에 전부)
+
+        self._cond = Condition()
+        self._pending: list[GenerationJob] = []
+        self._slots: list[_Slot] = []  # 배치 디코드 (self._kv 의 행과 같은 순서)
+        self._solo: list[_Slot] = []  # prompt-lookup 디코드
+        self._prefilling: list[_Prefill] = []  # admission 후 prefill 이 끝나지 않은 요청 (FIFO)
+        self._kv: KVCache | None = None
+        self._mask: torch.Tensor | None = None
+        self._thread: Thread | None = None
+        # 토큰 하나의 KV 바이트. 콜드 스타트 burst 도 예산을 지키도록 config 로 미리 계산한다
+        # (config 가 없는 모델은 첫 prefill 에서 잰다).
+        self._token_bytes = float(
+            kv_token_bytes(getattr(model, "config", None), getattr(model, "dtype", torch.float32), self.kv_bits)
+        )
+        self._kv_bytes = 0
+        self._kv_peak_bytes = 0
+        self._kv_deferred = 0
+
+    # ------------------------------------------------------------------ API
+    def submit(self, job: GenerationJob) -> GenerationJob:
+        with self._cond:
+            self._ensure_started()
+            self._pending.append(job)
+            self._cond.notify()
+        return job
+
+    def stats(self) -> dict[str, int]:
+        with self._cond:
+            return {
+                "active": len(self._slots) + len(self._solo),
+                "pending": len(self._pending),
+                "prefilling": len(self._prefilling),
+                "kv_bytes": self._kv_bytes,
+                "kv_peak_bytes": self._kv_peak_bytes,
+                "kv_token_bytes": round(self._token_bytes),
+                "kv_deferred": self._kv_deferred,
+            }
+
+    def _ensure_started(self) -> None:
+        # fork 이후에도 안전하도록 첫 요청 시점에 워커 스레드를 띄운다.
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = Thread(target=self._loop, name="ai-batch-scheduler", daemon=True)
+            self._thread.start()
+
+    # ----------------------------------------------------------------- loop
+    def _loop(self) -> None:
+        while True:
+            try:
+                self._iterate()
+            except Exception as err:  # pragma: no cover - keeps the worker alive
+                print(f"[AI-WARN] Scheduler iteration failed ({err}); resetting batch.")
+                with self._cond:
+                    for job in self._active_jobs():
+                        self._finish(job, "error", err)
+                    self._slots, self._solo, self._prefilling = [], [], []
+                self._kv, self._mask = None, None
+
+    def _iterate(self) -> None:
+        """한 반복: 대기 요청 admission(prefill) 후 디코드 한 스텝."""
+        with self._cond:
+            while not self._pending and not self._active_jobs():
+                self._cond.wait()
+            active = bool(self._active_jobs())
+            admitted = self._take_admissible()
+        if admitted and not active and self.set_adapter is not None:
+            self.set_adapter(admitted[0].adapter)
+        with torch.no_grad():
+            for job in admitted:
+                try:
+                    self._start_prefill(job)
+                except Exception as err:  # pragma: no cover - surfaced to handlers
+                    print(f"[AI-WARN] Prefill failed ({err}).")
+                    self._finish(job, "error", err)
+            self._prefill()
+            self._run_step()
+        self._track_kv()
+
+    def _active_jobs(self) -> list[GenerationJob]:
+        return [s.job for s in self._slots + self._solo] + [p.job for p in self._prefilling]
+
+    def _track_kv(self) -> None:
+        used = kv_nbytes(self._kv) + sum(kv_nbytes(slot.kv) for slot in self._solo)
+        used += sum(kv_nbytes(p.cache) for p in self._prefilling)
+        self._kv_bytes = used
+        self._kv_peak_bytes = max(self._kv_peak_bytes, used)
+
+    def _fits_budget(self, jobs: list[GenerationJob]) -> bool:
+        """jobs 가 모두 max_new_tokens 까지 생성했을 때의 KV 가 예산 안인지 (배치는 왼쪽 패딩 포함)."""
+        if not self.kv_budget_bytes or not self._token_bytes:
+            return True
+        batch = [j.prompt_len + j.max_new_tokens for j in jobs if j.prompt_lookup_tokens <= 0]
+        solo = [j.prompt_len + j.max_new_tokens for j in jobs if j.prompt_lookup_tokens > 0]
+        tokens = len(batch) * max(batch, default=0) + sum(solo)
+        return tokens * self._token_bytes <= self.kv_budget_bytes
+
+    def _route(self, adapters: list[str | None]) -> None:
+        if self.set_batch_adapters is not None:
+            self.set_batch_adapters(adapters)
+
+    def _take_admissible(self) -> list[GenerationJob]:
+        """배치 하나는 한 adapter 만 쓴다 (set_batch_adapters 가 없을 때).
+        FIFO 순서로, 다른 adapter 요청을 만나면 배치가 빌 때까지 멈춘다."""
+        for job in [j for j in self._pending if self._stop_reason(j, None)]:
+            self._pending.remove(job)
+            self._finish(job, self._stop_reason(job, None))
+        admitted: list[GenerationJob] = []
+        active = self._active_jobs()
+        adapter = active[0].adapter if active else None
+        while self._pending and len(active) + len(admitted) < self.max_batch_size:
+            job = self._pending[0]
+            if (active or admitted) and job.adapter != adapter and self.set_batch_adapters is None:
+                break
+            # 배치가 비어 있으면 예산을 넘어도 하나는 받는다 (안 그러면 영영 못 돈다).
+            if (active or admitted) and not self._fits_budget(active + admitted + [job]):
+                if not job.metrics.get("kv_deferred"):
+                    job.metrics["kv_deferred"] = True
+                    self._kv_deferred += 1
+                break
+            adapter = job.adapter
+            admitted.append(self._pending.pop(0))
+        return admitted
+
+    def _run_step(self) -> None:
+        if self._slots:
+            try:
+                self._step()
+            except Exception as err:  # pragma: no cover - surfaced to handlers
+                print(f"[AI-WARN] Batch step failed ({err}); failing {len(self._slots)} request(s).")
+                for slot in self._slots:
+                    self._finish(slot.job, "error", err)
+                with self._cond:
+                    self._slots = []
+                self._kv, self._mask = None, None
+        finished: list[_Slot] = []
+        for slot in self._solo:
+            try:
+                if self._spec_step(slot):
+                    finished.append(slot)
+            except Exception as err:  # pragma: no cover - surfaced to handlers
+                print(f"[AI-WARN] Prompt-lookup step failed ({err}).")
+                self._finish(slot.job, "error", err)
+                finished.append(slot)
+        if finished:
+            with self._cond:
+                self._solo = [s for s in self._solo if s not in finished]
+
+    def _processors(self, job: GenerationJob) -> LogitsProcessorList:
+        procs = LogitsProcessorList(job.logits_processors)
+        if job.temperature > 0:
+            procs.append(TemperatureLogitsWarper(job.temperature))
+            if self.top_k:
+                procs.append(TopKLogitsWarper(top_k=int(self.top_k)))
+            if self.top_p is not None and self.top_p < 1.0:
+                procs.append(TopPLogitsWarper(top_p=float(self.top_p)))
+        return procs
+
+    def _scores(self, slot: _Slot, logits: torch.Tensor) -> torch.Tensor:
+        job = slot.job
+        scores = logits.float().unsqueeze(0)
+        if slot.processors:
+            ids = job.input_ids.new_tensor([job.output_ids]) if job.output_ids else None
+            seq = job.input_ids if ids is None else torch.cat([job.input_ids, ids], dim=-1)
+            scores = slot.processors(seq, scores)
+        return scores
+
+    def _sample(self, slot: _Slot, logits: torch.Tensor) -> int:
+        job = slot.job
+        scores = self._scores(slot, logits)
+        if job.temperature > 0:
+            probs = torch.softmax(scores, dim=-1)
+            return int(torch.multinomial(probs, num_samples=1, generator=slot.generator)[0, 0])
+        return int(torch.argmax(scores, dim=-1)[0])
+
+    def _stop_reason(self, job: GenerationJob, scores: torch.Tensor | None) -> str | None:
+        if not job.stopping_criteria:
+            return None
+        seq = job.input_ids
+        if job.output_ids:
+            seq = torch.cat([seq, seq.new_tensor([job.output_ids])], dim=-1)
+        for crit in job.stopping_criteria:
+            if bool(crit(seq, scores).all()):
+                return getattr(crit, "reason", None) or "stop"
+        return None
+
+    def _emit(self, slot: _Slot, token: int, scores: torch.Tensor | None = None) -> bool:
+        """토큰을 기록/스트리밍하고 시퀀스가 끝났으면 True."""
+        job = slot.job
+        if job.first_token_at is None:
+            job.first_token_at = time.perf_counter()
+        if token in job.eos_token_ids:
+            self._finish(job, "stop")
+            return True
+        job.output_ids.append(token)
+        if job.streamer is not None:
+            job.streamer.put(torch.tensor([token]))
+        if len(job.output_ids) >= job.max_new_tokens:
+            self._finish(job, "length")
+            return True
+        reason = self._stop_reason(job, scores)
+        if reason is not None:
+            self._finish(job, reason)
+            return True
+        slot.next_token = token
+        return False
+
+    def _finish(self, job: GenerationJob, reason: str, err: BaseException | None = None) -> None:
+        if job.done.is_set():
+            return
+        job.finish_reason = reason
+        job.error = err
+        job.finished_at = time.perf_counter()
+        if job.streamer is not None:
+            job.streamer.end()
+        job.done.set()
+
+    def _start_prefill(self, job: GenerationJob) -> None:
+        job.admitted_at = time.perf_counter()
+        if job.max_new_tokens <= 0:
+            self._finish(job, "length")
+            return
+        reason = self._stop_reason(job, None)
+        if reason is not None:
+            self._finish(job, reason)
+            return
+        input_ids = job.input_ids.to(self.device)
+        cached, past = 0, None
+        if self.prefix_cache is not None:
+            # 마지막 토큰의 logits 가 필요하므로 최소 1토큰은 prefill 한다.
+            cached, past = self.prefix_cache.lookup(
+                input_ids[0].tolist(), max_tokens=job.prompt_len - 1, namespace=job.adapter
+            )
+        job.metrics["cached_prompt_tokens"] = cached
+        if self.device.type == "cuda":
+            # 동시에 prefill 중인 다른 요청이 있으면 그 요청의 측정 구간도 여기서 다시 시작된다.
+            torch.cuda.reset_peak_memory_stats(self.device)
+        cache = DynamicCache.from_legacy_cache(tuple(past)) if past else DynamicCache()
+        start_mb = _memory_mb(self.device)
+        state = _Prefill(
+            job=job, input_ids=input_ids, cache=cache, done=cached, mem_start_mb=start_mb, mem_peak_mb=start_mb
+        )
+        with self._cond:
+            self._prefilling.append(state)
+
+    def _prefill(self) -> None:
+        """대기 중인 prefill 을 FIFO 로 이번 반복의 토큰 예산(prefill_chunk)만큼 진행한다."""
+        budget = self.prefill_chunk or None
+        while self._prefilling and (budget is None or budget > 0):
+            state = self._prefilling[0]
+            job = state.job
+            shared = job.shared_prefix
+            try:
+                reason = self._stop_reason(job, None)
+                if reason is not None:
+                    # 긴 프롬프트도 청크 사이에서 취소/마감을 확인한다.
+                    self._finish(job, reason)
+                    self._drop_prefill(state)
+                    continue
+                if shared is not None and job.adapter in shared.kv and state.done < shared.length:
+                    # 같은 접두사를 먼저 prefill 한 job 의 KV 에서 이어간다 (update 는 새 텐서를 만들어 공유본은 안 바뀐다).
+                    state.cache = DynamicCache.from_legacy_cache(shared.kv[job.adapter])
+                    job.metrics["shared_prefix_tokens"] = shared.length - state.done
+                    state.done = shared.length
+                n = job.prompt_len - state.done
+                if shared is not None and job.adapter not in shared.kv and state.done < shared.length:
+                    n = shared.length - state.done  # 접두사 경계에서 끊어 KV 를 떠 둔다
+                if budget is not None:
+                    n = min(n, budget)
+                    budget -= n
+                chunk = state.input_ids[:, state.done : state.done + n]
+                self._route([job.adapter])
+                # 마지막 위치의 logits 만 쓴다 ([prompt_len, vocab] fp32 를 만들지 않는다).
+                out = self.model(input_ids=chunk, past_key_values=state.cache, use_cache=True, logits_to_keep=1)
+                state.cache = out.past_key_values
+                state.done += n
+                state.chunks += 1
+                state.mem_peak_mb = max(state.mem_peak_mb, _memory_mb(self.device, peak=True))
+                if shared is not None and state.done == shared.length and job.adapter not in shared.kv:
+                    shared.kv[job.adapter] = tuple(state.cache.to_legacy_cache())
+                if state.done >= job.prompt_len:
+                    self._drop_prefill(state)
+                    self._admit(state, out.logits[0, -1])
+            except Exception as err:  # pragma: no cover - surfaced to handlers
+                print(f"[AI-WARN] Prefill failed ({err}).")
+                self._drop_prefill(state)
+                self._finish(job, "error", err)
+
+    def _drop_prefill(self, state: _Prefill) -> None:
+        with self._cond:
+            if state in self._prefilling:
+                self._prefilling.remove(state)
+
+    def _admit(self, state: _Prefill, logits: torch.Tensor) -> None:
+        """prefill 이 끝난 요청의 첫 토큰을 뽑고 디코드 배치(또는 solo slot)에 넣는다."""
+        job = state.job
+        kv = list(state.cache.to_legacy_cache())
+        job.metrics["prefill_chunks"] = state.chunks
+        # CPU 는 청크 경계마다 잰 RSS 라 forward 안의 순간 최대는 놓칠 수 있다.
+        # 다른 요청의 청크가 사이에 끼면 그 몫도 섞인다.
+        job.metrics["prefill_peak_mb"] = _prefill_peak_mb(state.mem_start_mb, state.mem_peak_mb)
+        if self.prefix_cache is not None:
+            self.prefix_cache.insert(state.input_ids[0].tolist(), kv, namespace=job.adapter)
+        if self.kv_bits:
+            # prefix cache 는 원래 정밀도로 두고, 디코드 동안 들고 있는 KV 만 양자화한다.
+            kv = QuantizedKVCache.from_legacy(kv, self.kv_bits)
+        if not self._token_bytes:
+            self._token_bytes = kv_nbytes(kv) / job.prompt_len
+        mask = torch.ones(1, job.prompt_len, dtype=torch.long, device=self.device)
+        slot = _Slot(job=job, processors=self._processors(job), next_token=-1, position=job.prompt_len)
+        if job.seed is not None:
+            slot.generator = torch.Generator(device=self.device).manual_seed(job.seed)
+        if self._emit(slot, self._sample(slot, logits), logits.unsqueeze(0)):
+            return
+
+        if job.prompt_lookup_tokens > 0:
+            slot.kv = kv
+            job.metrics.update({"spec_proposed": 0, "spec_accepted": 0})
+            with self._cond:
+                self._solo.append(slot)
+            return
+        if self._kv is None:
+            self._kv, self._mask = kv, mask
+        else:
+            width = max(self._mask.shape[-1], mask.shape[-1])
+            self._kv, self._mask = _left_pad(self._kv, self._mask, width)
+            kv, mask = _left_pad(kv, mask, width)
+            self._kv = _cat_batch(self._kv, kv)
+            self._mask = torch.cat([self._mask, mask], dim=0)
+        with self._cond:
+            self._slots.append(slot)
+
+    def _step(self) -> None:
+        slots = self._slots
+        input_ids = torch.tensor([[s.next_token] for s in slots], device=self.device)
+        position_ids = torch.tensor([[s.position] for s in slots], device=self.device)
+        mask = torch.cat([self._mask, self._mask.new_ones(len(slots), 1)], dim=1)
+        self._route([s.job.adapter for s in slots])
+        out = self.model(
+            input_ids=input_ids,
+            attention_mask=mask,
+            position_ids=position_ids,
+            past_key_values=_past(self._kv),
+            use_cache=True,
+        )
+        self._kv = _kept(out.past_key_values)
+        self._mask = mask
+
+        keep: list[int] = []
+        for i, slot in enumerate(slots):
+            slot.position += 1
+            logits = out.logits[i, -1]
+            if not self._emit(slot, self._sample(slot, logits), logits.unsqueeze(0)):
+                keep.append(i)
+        if len(keep) != len(slots):
+            self._evict(keep)
+
+    def _evict(self, keep: list[int]) -> None:
+        with self._cond:
+            self._slots = [self._slots[i] for i in keep]
+        if not keep:
+            self._kv, self._mask = None, None
+            return
+        idx = torch.tensor(keep, device=self.device)
+        mask = self._mask.index_select(0, idx)
+        # 남은 시퀀스 모두에게 패딩인 왼쪽 열은 잘라낸다.
+        live = mask.sum(dim=0).nonzero()
+        start = int(live[0]) if live.numel() else 0
+        self._mask = mask[:, start:]
+        self._kv = _select(self._kv, idx, start)
+
+    def _spec_step(self, slot: _Slot) -> bool:
+        """prompt-lookup 초안을 한 번의 forward 로 검증한다. 시퀀스가 끝났으면 True."""
+        job = slot.job
+        ids = job.input_ids[0].tolist() + job.output_ids
+        budget = job.max_new_tokens - len(job.output_ids) - 1
+        draft = propose_prompt_lookup(ids, num_tokens=min(job.prompt_lookup_tokens, budget))
+        # KV 에는 slot.next_token 직전까지 들어 있다.
+        past_len = len(ids) - 1
+        step_ids = torch.tensor([[slot.next_token] + draft], device=self.device)
+        self._route([job.adapter])
+        out = self.model(
+            input_ids=step_ids,
+            past_key_values=_past(slot.kv),
+            use_cache=True,
+        )
+        kv = _kept(out.past_key_values)
+
+        accepted = 0
+        for i in range(len(draft) + 1):
+            logits = out.logits[0, i]
+            scores = self._scores(slot, logits)
+            if job.temperature > 0:
+                probs = torch.softmax(scores, dim=-1)[0]
+                if i < len(draft):
+                    # 결정적 초안(one-hot q)에 대한 speculative sampling: p(x) 확률로 수락, 거절 시 x 를 뺀 p 에서 샘플.
+                    u = torch.rand((), device=probs.device, generator=slot.generator)
+                    if u < probs[draft[i]]:
+                        token = draft[i]
+                    else:
+                        probs[draft[i]] = 0.0
+                        token = int(torch.multinomial(probs / probs.sum(), 1, generator=slot.generator)[0])
+                else:
+                    token = int(torch.multinomial(probs, 1, generator=slot.generator)[0])
+            else:
+                token = int(torch.argmax(scores, dim=-1)[0])
+            if i < len(draft) and token == draft[i]:
+                accepted += 1
+            if self._emit(slot, token, logits.unsqueeze(0)):
+                break
+            if i < len(draft) and token != draft[i]:
+                break
+
+        job.metrics["spec_proposed"] += len(draft)
+        job.metrics["spec_accepted"] += accepted
+        if job.metrics["spec_proposed"]:
+            job.metrics["spec_accept_ratio"] = job.metrics["spec_accepted"] / job.metrics["spec_proposed"]
+        if job.done.is_set():
+            return True
+        keep = past_len + 1 + accepted
+        slot.kv = _crop(kv, keep)
+        return False
@@ -1,13 +1,46 @@
 from __future__ import annotations
-import os, json, time
+import asyncio, gc, os, json, signal, socket, time
+from dataclasses import dataclass
 from pathlib import Path
 from threading import Thread
-from typing import Any, Iterable, Tuple
+from typing import Any, Awaitable, Callable, Iterable, Tuple
 import torch
 import uvicorn
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, ValidationError
-from transformers import AutoModelForCausalLM, AutoTokenizer, TextIteratorStreamer
+from transformers import AutoModelForCausalLM, AutoTokenizer, LogitsProcessorList, StoppingCriteriaList
+
+try:
+    from .compiled_decode import CompiledDecodeScheduler, parse_buckets
+    from .context_compress import compress_contexts
+    from .cpu_planner import CpuSlot, active_slot, apply_slot
+    from .engines import ENGINES
+    from .inference_executor import AsyncTextStreamer, InferenceExecutor
+    from .metrics import ServerMetrics
+    from .multi_lora import LoraRouter, attach_multi_lora
+    from .prefix_cache import PrefixCache
+    from .rag_local import RetrieverUnavailable, last_user_text, shared_retriever, splice_contexts
+    from .response_cache import ResponseCache, request_key
+    from .scheduler import BatchScheduler, GenerationJob, SharedPrefix
+    from .stopping import CancelCriteria, RepetitionCriteria
+    from .thinking import ThinkBudgetProcessor, count_reasoning, think_token_ids
+    from .tracing import RequestTrace, Tracer
+except ImportError:  # pragma: no cover - fallback when executed as script
+    from compiled_decode import CompiledDecodeScheduler, parse_buckets
+    from context_compress import compress_contexts
+    from cpu_planner import CpuSlot, active_slot, apply_slot
+    from engines import ENGINES
+    from inference_executor import AsyncTextStreamer, InferenceExecutor
+    from metrics import ServerMetrics
+    from multi_lora import LoraRouter, attach_multi_lora
+    from prefix_cache import PrefixCache
+    from rag_local import RetrieverUnavailable, last_user_text, shared_retriever, splice_contexts
+    from response_cache import ResponseCache, request_key
+    from scheduler import BatchScheduler, GenerationJob, SharedPrefix
+    from stopping import CancelCriteria, RepetitionCriteria
+    from thinking import ThinkBudgetProcessor, count_reasoning, think_token_ids
+    from tracing import RequestTrace, Tracer
 
 try:
     from peft import PeftModel
@@ -30,8 +63,11 @@ def _detect_rbln_directory(model_id: str) -> bool:
     return d.is_dir() and all((d / n).exists() for n in _RBLN_SENTINEL_FILES)
 
 def _resolve_backend(model_id: str, requested: str | None = None) -> str:
+    """요청된 backend 이름을 실제 엔진으로 정한다: torch | rbln | engines.ENGINES (mock, tiny)."""
     if requested and requested.lower() == "torch":
         return "torch"
+    if requested and requested.lower() in ENGINES:
+        return requested.lower()
     if RBLNAutoModelForCausalLM and _detect_rbln_directory(model_id):
         return "rbln"
     return "torch"
@@ -48,12 +84,218 @@ def _load_rbln_model(model_id: str) -> Any:
         pass
     return tok, model, torch.device("cpu")
 
+def _generate_limits(model: Any) -> tuple[int | None, bool]:
+    """컴파일된 RBLN 그래프가 받는 (generate 배치 크기 상한, attention_mask 입력 여부). 제약이 없으면 (None, True)."""
+    cfg = getattr(model, "rbln_config", None)
+    if cfg is None:
+        return None, True
+    get = cfg.get if isinstance(cfg, dict) else lambda name: getattr(cfg, name, None)
+    takes_mask = bool(get("use_attention_mask"))
+    # attention_mask 없이는 왼쪽 패딩을 가릴 수 없으므로 한 건씩 돌린다.
+    return (max(1, int(get("batch_size") or 1)) if takes_mask else 1), takes_mask
+
 def register_rbln_loras(lora_map: dict[str, str]):
     """사전으로 여러 LoRA adapter 등록"""
     global _RBLN_LORA_MODULES
     _RBLN_LORA_MODULES = {k: str(Path(v).resolve()) for k, v in lora_map.items()}
     print(f"[AI] Registered {len(_RBLN_LORA_MODULES)} LoRA modules for RBLN: {list(_RBLN_LORA_MODULES.keys())}")
 
+def _common_prefix_len(sequences: list[list[int]]) -> int:
+    """모든 시퀀스가 공유하는 앞부분 토큰 수. 마지막 logits 를 위해 가장 짧은 시퀀스보다 1 작게 자른다."""
+    if not sequences:
+        return 0
+    limit = min(len(seq) for seq in sequences) - 1
+    length = 0
+    while length < limit and all(seq[length] == sequences[0][length] for seq in sequences):
+        length += 1
+    return max(length, 0)
+
+def _sse(payload: dict[str, Any], event: str | None = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+@dataclass
+class LoadedModel:
+    """한 프로세스에서 여러 역할 앱이 공유하는 모델/스케줄러 묶음."""
+
+    tokenizer: Any
+    model: Any
+    device: torch.device
+    backend: str
+    adapters: tuple[str, ...] = ()
+    scheduler: BatchScheduler | None = None
+    active_adapter: str | None = None
+    lora_router: LoraRouter | None = None  # 있으면 배치 행마다 adapter 를 고른다 (AI_MIXED_LORA)
+
+def _has_adapter_weights(path: Path) -> bool:
+    return any((path / n).exists() for n in ("adapter_model.safetensors", "adapter_model.bin"))
+
+def _attach_loras(model: Any, lora_map: dict[str, str]) -> tuple[Any, tuple[str, ...]]:
+    """베이스 가중치는 한 번만 두고 PEFT adapter 들을 이름별로 붙인다."""
+    if not lora_map:
+        return model, ()
+    if PeftModel is None:
+        print("[AI-WARN] peft is not installed; serving base model without LoRA adapters.")
+        return model, ()
+    names: list[str] = []
+    for name, path in lora_map.items():
+        lora_dir = Path(path)
+        if not _has_adapter_weights(lora_dir):
+            print(f"[AI-WARN] LoRA adapter '{name}' has no weights at {lora_dir}; skipping.")
+            continue
+        if not names:
+            model = PeftModel.from_pretrained(model, str(lora_dir), adapter_name=name)
+        else:
+            model.load_adapter(str(lora_dir), adapter_name=name)
+        names.append(name)
+        print(f"[AI] Attached LoRA adapter '{name}' ({lora_dir})")
+    model.eval()
+    return model, tuple(names)
+
+def _activate_adapter(loaded: LoadedModel, name: str | None) -> None:
+    """set_adapter 는 LoRA 모듈만 바꾸므로 베이스 가중치 복사가 없다. None 이면 베이스 모델."""
+    if loaded.lora_router is not None:
+        # 배치 전체를 한 adapter 로 라우팅한다 (스케줄러는 forward 마다 행별로 다시 정한다).
+        loaded.lora_router.set_names([name])
+        loaded.active_adapter = name
+        return
+    if not loaded.adapters or name == loaded.active_adapter:
+        return
+    lora_model = loaded.model.base_model
+    if name is None:
+        lora_model.disable_adapter_layers()
+    else:
+        lora_model.enable_adapter_layers()
+        loaded.model.set_adapter(name)
+    loaded.active_adapter = name
+
+PRECISIONS = ("fp32", "bf16", "int8-dynamic")
+
+def _apply_precision(model: Any, precision: str) -> Any:
+    """CPU 추론 정밀도. bf16 은 로드 시 dtype 으로, int8-dynamic 은 로드(+LoRA 부착) 후 Linear 를 양자화한다."""
+    if precision == "int8-dynamic":
+        # LoRA A/B 는 PEFT 가 weight.dtype 을 읽으므로 fp32 로 두고 베이스 Linear 만 양자화한다.
+        qconfig = torch.ao.quantization.default_dynamic_qconfig
+        targets = {
+            name: qconfig
+            for name, module in model.named_modules()
+            if isinstance(module, torch.nn.Linear) and "lora_" not in name
+        }
+        model = torch.ao.quantization.quantize_dynamic(model, targets, dtype=torch.qint8)
+        model.eval()
+    return model
+
+def load_model(
+    model_id: str,
+    backend: str,
+    *,
+    lora_map: dict[str, str] | None = None,
+    max_batch_size: int | None = None,
+    precision: str | None = None,
+    compiled_decode: bool | None = None,
+) -> LoadedModel:
+    precision = precision or os.environ.get("AI_PRECISION", "fp32")
+    mixed_lora = os.environ.get("AI_MIXED_LORA", "0") == "1"
+    if compiled_decode is None:
+        compiled_decode = os.environ.get("AI_COMPILED_DECODE", "0") == "1"
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}' (expected one of {', '.join(PRECISIONS)})")
+    cache_key = (
+        f"{backend}:{model_id}:{precision}:{','.join(sorted(lora_map or {}))}"
+        f":{os.environ.get('AI_KV_QUANT', '')}:{os.environ.get('AI_KV_BUDGET_MB', '')}"
+        f":{'compiled' if compiled_decode else 'eager'}:{'mixed' if mixed_lora else 'single'}"
+    )
+    if cache_key in _MODEL_CACHE:
+        return _MODEL_CACHE[cache_key]
+
+    if backend == "rbln":
+        tokenizer, model, device = _load_rbln_model(model_id)
+        loaded = LoadedModel(tokenizer, model, device, backend)
+        _MODEL_CACHE[cache_key] = loaded
+        return loaded
+
+    if backend in ENGINES:
+        # 가중치 없이 서빙 계층을 돌리는 엔진 (mock / tiny). LoRA 는 붙이지 않는다.
+        tokenizer, model, device = ENGINES[backend](model_id, precision)
+        adapters: tuple[str, ...] = ()
+        if lora_map:
+            print(f"[AI-WARN] backend={backend} ignores LoRA adapters ({', '.join(lora_map)}).")
+    elif torch.cuda.is_available():
+        tokenizer = AutoTokenizer.from_pretrained(model_id, trust_remote_code=True)
+        dtype = torch.bfloat16 if precision == "bf16" else torch.float16
+        model = AutoModelForCausalLM.from_pretrained(model_id, torch_dtype=dtype, device_map="auto")
+        device = next(model.parameters()).device
+        if precision == "int8-dynamic":
+            print("[AI-WARN] int8-dynamic is CPU-only; CUDA keeps float16.")
+            precision = "fp16"
+    else:
+        tokenizer = AutoTokenizer.from_pretrained(model_id, trust_remote_code=True)
+        dtype = torch.bfloat16 if precision == "bf16" else torch.float32
+        model = AutoModelForCausalLM.from_pretrained(model_id, torch_dtype=dtype)
+        device = torch.device("cpu")
+    lora_router = None
+    if backend not in ENGINES:
+        model, adapters = _attach_loras(model, lora_map or {})
+        if adapters and mixed_lora:
+            # adapter 별 LoRA A/B 를 쌓아 두고, 배치 행마다 다른 adapter 의 delta 를 한 forward 에서 더한다.
+            model, lora_router = attach_multi_lora(model, adapters)
+            print(f"[AI] Mixed-adapter LoRA batching enabled ({', '.join(adapters)})")
+    if device.type == "cpu":
+        model = _apply_precision(model, precision)
+    print(f"[AI] Loaded {model_id} (precision={precision}, device={device})")
+    loaded = LoadedModel(tokenizer, model, device, backend, adapters=adapters, lora_router=lora_router)
+    if adapters and lora_router is None:
+        # PeftModel 은 첫 adapter 가 켜진 채로 로드된다. active_adapter 기본값이 None 이라
+        # _activate_adapter(None) 은 건너뛰므로 여기서 직접 끈다.
+        model.base_model.disable_adapter_layers()
+
+    # torch 백엔드는 반복(iteration) 단위 연속 배칭으로 동시 요청을 한 디코드 배치에 태운다.
+    if max_batch_size is None:
+        max_batch_size = int(os.environ.get("AI_MAX_BATCH", "8"))
+    # 역할별 system prompt / 이전 대화 턴 등 공통 접두사의 KV 를 재사용한다 (0 이면 비활성).
+    prefix_cache_mb = int(os.environ.get("AI_PREFIX_CACHE_MB", "512"))
+    prefix_cache = (
+        PrefixCache(
+            block_size=int(os.environ.get("AI_PREFIX_BLOCK", "32")),
+            budget_bytes=prefix_cache_mb * 1024 * 1024,
+        )
+        if prefix_cache_mb > 0
+        else None
+    )
+    # 디코드 중인 KV 를 int8/int4 로 들고, 예산(MB)을 넘길 요청은 대기열에 남긴다 (0 이면 제한 없음).
+    kv_quant = os.environ.get("AI_KV_QUANT", "").strip().lower() or None
+    kv_budget_mb = int(os.environ.get("AI_KV_BUDGET_MB", "0"))
+    # 긴 프롬프트는 반복당 이 토큰 수만큼씩 prefill 해 다른 요청의 디코드 사이에 끼워 넣는다 (0 이면 한 번에).
+    prefill_chunk = int(os.environ.get("AI_PREFILL_CHUNK", "512"))
+    scheduler_kwargs = dict(
+        max_batch_size=max_batch_size,
+        prefix_cache=prefix_cache,
+        set_adapter=lambda name: _activate_adapter(loaded, name),
+        set_batch_adapters=lora_router.set_names if lora_router is not None else None,
+        kv_quant=kv_quant,
+        kv_budget_bytes=kv_budget_mb * 1024 * 1024,
+        prefill_chunk=prefill_chunk,
+    )
+    if compiled_decode:
+        # static cache + torch.compile 단일 토큰 forward. 요청을 하나씩 디코드하므로 동시성이 낮은 CPU 배포용.
+        buckets = parse_buckets(os.environ.get("AI_COMPILE_BUCKETS"))
+        loaded.scheduler = CompiledDecodeScheduler(
+            model,
+            device,
+            buckets=buckets,
+            compile_backend=os.environ.get("AI_COMPILE_BACKEND", "inductor"),
+            **scheduler_kwargs,
+        )
+        if os.environ.get("AI_COMPILE_WARMUP", "1") == "1":
+            print(f"[AI] Compiling decode graphs for cache buckets {list(buckets)}...")
+            print(f"[AI] Compiled decode warmup done in {loaded.scheduler.warmup():.1f}s")
+    else:
+        loaded.scheduler = BatchScheduler(model, device, **scheduler_kwargs)
+    if kv_quant or kv_budget_mb:
+        print(f"[AI] KV cache: quant={kv_quant or 'off'}, budget={kv_budget_mb or 'unlimited'} MB")
+    _MODEL_CACHE[cache_key] = loaded
+    return loaded
+
 def build_app(
     role_name: str,
     model_id: str,
@@ -62,36 +304,146 @@ def build_app(
     default_max_tokens: int,
     backend: str,
     enable_trace: bool = False,
+    max_batch_size: int | None = None,
+    lora_map: dict[str, str] | None = None,
+    prompt_lookup_tokens: int | None = None,
+    precision: str | None = None,
+    compiled_decode: bool | None = None,
 ) -> FastAPI:
-    if backend == "rbln":
-        tokenizer, model, device = _load_rbln_model(model_id)
-    else:
-        tokenizer = AutoTokenizer.from_pretrained(model_id, trust_remote_code=True)
-        if torch.cuda.is_available():
-            model = AutoModelForCausalLM.from_pretrained(model_id, torch_dtype=torch.float16, device_map="auto")
-            device = next(model.parameters()).device
-        else:
-            model = AutoModelForCausalLM.from_pretrained(model_id)
-            device = torch.device("cpu")
+    backend = _resolve_backend(model_id, backend)
+    loaded = load_model(
+        model_id,
+        backend,
+        lora_map=lora_map,
+        max_batch_size=max_batch_size,
+        precision=precision,
+        compiled_decode=compiled_decode,
+    )
+    tokenizer, model, device = loaded.tokenizer, loaded.model, loaded.device
+    scheduler = loaded.scheduler
+    # RAG 문맥을 그대로 옮겨 적는 답변용 prompt-lookup 디코딩 (0 이면 요청에서 켤 때만).
+    if prompt_lookup_tokens is None:
+        prompt_lookup_tokens = int(os.environ.get("AI_PROMPT_LOOKUP_TOKENS", "0"))
+    # Qwen3 <think> 토큰 예산 (비우면 제한 없음, 0 이면 thinking 끔). 요청의 think_budget 이 우선한다.
+    default_think_budget = int(os.environ["AI_THINK_BUDGET"]) if os.environ.get("AI_THINK_BUDGET") else None
+    think_ids = think_token_ids(tokenizer)
+    # 생성 꼬리 window 토큰이 threshold 회 이상 반복되는 주기를 가지면 멈추고 반복분을 잘라낸다 (기본 0: 끔).
+    repetition_window = int(os.environ.get("AI_REPETITION_WINDOW", "0"))
+    repetition_threshold = int(os.environ.get("AI_REPETITION_THRESHOLD", "3"))
+    # scheduler 가 없을 때 /chat/batch 가 generate 한 번에 넣는 최대 항목 수 (컴파일된 배치 크기를 넘지 않는다)
+    batch_generate_size = max(1, max_batch_size or int(os.environ.get("AI_MAX_BATCH", "8")))
+    generate_batch_limit, generate_takes_mask = _generate_limits(model)
+    if generate_batch_limit is not None:
+        batch_generate_size = min(batch_generate_size, generate_batch_limit)
+
+    # temperature == 0 또는 seed 지정 요청은 결정적이므로 응답을 그대로 재사용한다 (0 이면 비활성).
+    response_cache_size = int(os.environ.get("AI_RESPONSE_CACHE_SIZE", "256"))
+    response_cache_dir = os.environ.get("AI_RESPONSE_CACHE_DIR")
+    response_cache = (
+        ResponseCache(
+            max_entries=response_cache_size,
+            ttl_s=float(os.environ.get("AI_RESPONSE_CACHE_TTL", "600")),
+            path=Path(response_cache_dir) / f"responses_{role_name}.json" if response_cache_dir else None,
+        )
+        if response_cache_size > 0
+        else None
+    )
+    # 토크나이즈/join/blocking generate 는 전용 스레드 풀에서 돌리고 이벤트 루프는 await 만 한다.
+    executor = InferenceExecutor(
+        max_workers=int(os.environ.get("AI_INFER_WORKERS", "4")),
+        name=f"ai-{role_name}",
+    )
+    # 요청 단위 stage trace (GET /trace) 는 켤 때만, histogram (GET /metrics) 은 항상 모은다.
+    enable_trace = enable_trace or os.environ.get("AI_TRACE", "0") == "1"
+    tracer = Tracer(max_requests=int(os.environ.get("AI_TRACE_MAX_REQUESTS", "512"))) if enable_trace else None
+    server_metrics = ServerMetrics(role_name)
+    retriever = shared_retriever()
+    rag_context_tokens = int(os.environ.get("AI_RAG_CONTEXT_TOKENS", "0"))
+    if os.environ.get("AI_RAG_PRELOAD", "0") == "1":
+        try:
+            retriever.load()
+        except RetrieverUnavailable as err:
+            print(f"[AI-WARN] In-process RAG unavailable: {err}")
+
+    class RagIn(BaseModel):
+        query: str | None = None  # None 이면 마지막 user 메시지
+        roles: list[str] | None = None  # None 이면 lora_name 또는 이 서버의 역할
+        k: int = 3
+        context_tokens: int | None = None  # 근거 토큰 예산. None 이면 AI_RAG_CONTEXT_TOKENS, 0 이면 압축 안 함
 
     class ChatIn(BaseModel):
         messages: list[dict]
         max_tokens: int = default_max_tokens
         temperature: float = default_temp
         lora_name: str | None = None  # 🔧 추가
+        seed: int | None = None
+        deadline_ms: int | None = None  # 요청 도착 기준, 넘기면 부분 결과를 돌려준다
+        prompt_lookup_tokens: int | None = None  # None 이면 서버 기본값, 0 이면 끔
+        think_budget: int | None = None  # <think> 안 토큰 상한, 0 이면 thinking 끔 (None 이면 서버 기본값)
+        rag: RagIn | None = None  # 있으면 FAISS 검색을 이 프로세스에서 하고 근거를 프롬프트에 붙인다
 
     app = FastAPI(title=f"Eco-Mentos AI ({role_name})", version="0.5.0")
 
-    @app.post("/chat")
-    async def chat(req: Request):
-        body = await req.json()
-        data = ChatIn.model_validate(body)
+    @app.on_event("shutdown")
+    async def _shutdown_executor():
+        executor.shutdown()
+        if response_cache is not None:
+            response_cache.flush()
+
+    @app.get("/health")
+    async def health():
+        """이벤트 루프에서 바로 응답한다. 생성 중에도 빨라야 하므로 블로킹 호출 금지."""
+        payload: dict[str, Any] = {
+            "status": "ok",
+            "role": role_name,
+            "model": model_id,
+            "backend": backend,
+            "pid": os.getpid(),
+        }
+        slot = active_slot()
+        if slot is not None:
+            payload["cpu"] = slot.to_dict()
+        if scheduler is not None:
+            payload["scheduler"] = scheduler.stats()
+        return payload
+
+    @app.get("/metrics")
+    async def metrics_endpoint():
+        """Prometheus text format: TTFT, inter-token latency, queue wait, tokens/s histograms."""
+        return PlainTextResponse(server_metrics.render(), media_type="text/plain; version=0.0.4")
+
+    @app.get("/trace")
+    async def trace_endpoint(clear: bool = False):
+        """최근 요청들의 Chrome trace JSON (chrome://tracing, Perfetto). AI_TRACE=1 일 때만."""
+        if tracer is None:
+            raise HTTPException(status_code=404, detail="tracing is disabled (start with AI_TRACE=1 or --trace)")
+        payload = tracer.chrome_trace()
+        if clear:
+            tracer.clear()
+        return payload
+
+    def _think_budget(data: ChatIn) -> int | None:
+        return default_think_budget if data.think_budget is None else data.think_budget
+
+    def _logits_processors(data: ChatIn) -> list[Any]:
+        budget = _think_budget(data)
+        if budget is None or think_ids is None:
+            return []
+        return [ThinkBudgetProcessor(*think_ids, budget)]
+
+    def _render(data: ChatIn) -> str:
         msgs = data.messages
         add_prompt = not msgs or msgs[-1]["role"] != "assistant"
-        prompt = tokenizer.apply_chat_template(msgs, tokenize=False, add_generation_prompt=add_prompt)
-        inputs = tokenizer(prompt, return_tensors="pt").to(device)
+        template_kwargs = {"enable_thinking": False} if _think_budget(data) == 0 else {}
+        return tokenizer.apply_chat_template(msgs, tokenize=False, add_generation_prompt=add_prompt, **template_kwargs)
+
+    def _prepare(data: ChatIn) -> tuple[Any, int]:
+        inputs = tokenizer(_render(data), return_tensors="pt").to(device)
         prompt_len = int(inputs["input_ids"].shape[-1])
+        _select_lora(data)
+        return inputs, prompt_len
 
+    def _select_lora(data: ChatIn) -> None:
         # 🔧 RBLN 백엔드의 LoRA hot-swap 처리
         if backend == "rbln" and data.lora_name:
             lora_dir = _RBLN_LORA_MODULES.get(data.lora_name)
@@ -103,76 +455,515 @@ def build_app(
                     print(f"[AI-WARN] Backend lacks set_active_lora; using fused weights only ({data.lora_name}).")
             else:
                 print(f"[AI-WARN] Unknown lora_name={data.lora_name}, base model only.")
+        elif data.lora_name and data.lora_name not in loaded.adapters:
+            print(f"[AI-WARN] Unknown lora_name={data.lora_name}, base model only.")
 
-        metrics: dict[str, Any] = {"prompt_tokens": prompt_len}
-        t_start = time.perf_counter()
+    def _adapter_for(data: ChatIn) -> str | None:
+        return data.lora_name if data.lora_name in loaded.adapters else None
 
-        base_kwargs = dict(
+    def _generate_kwargs(data: ChatIn, inputs: Any, criteria: list[Any]) -> dict[str, Any]:
+        return dict(
             **inputs,
             max_new_tokens=data.max_tokens,
             temperature=data.temperature,
             do_sample=data.temperature > 0,
             eos_token_id=tokenizer.eos_token_id,
             pad_token_id=tokenizer.eos_token_id,
+            stopping_criteria=StoppingCriteriaList(criteria),
+            logits_processor=LogitsProcessorList(_logits_processors(data)),
         )
 
-        try:
-            streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
-            stream_kwargs = {**base_kwargs, "streamer": streamer}
-            pieces: list[str] = []
-            first_token_at: float | None = None
+    def _stopper(data: ChatIn, t_start: float) -> CancelCriteria:
+        deadline_at = t_start + data.deadline_ms / 1000.0 if data.deadline_ms else None
+        return CancelCriteria(deadline_at)
+
+    def _criteria(stopper: CancelCriteria, prompt_len: int) -> tuple[list[Any], RepetitionCriteria | None]:
+        if repetition_window <= 0:
+            return [stopper], None
+        repetition = RepetitionCriteria(prompt_len, window=repetition_window, threshold=repetition_threshold)
+        return [stopper, repetition], repetition
+
+    def _trim_repetition(result: dict[str, Any], repetition: RepetitionCriteria | None, token_ids: list[int]) -> None:
+        """반복 루프로 멈췄으면 첫 주기 뒤를 잘라낸 content 와 stopped_by 를 채운다."""
+        if repetition is None or not repetition.triggered:
+            return
+        keep = repetition.keep_tokens or 0
+        result["content"] = tokenizer.decode(token_ids[:keep], skip_special_tokens=True).strip()
+        result["stopped_by"] = "repetition"
+        result["metrics"]["trimmed_tokens"] = max(len(token_ids) - keep, 0)
+
+    async def _watch_disconnect(req: Request, stopper: CancelCriteria) -> None:
+        while stopper.reason is None:
+            if await req.is_disconnected():
+                stopper.cancel("client_disconnected")
+                return
+            await asyncio.sleep(0.25)
+
+    def _start_stream(
+        data: ChatIn,
+        inputs: Any,
+        criteria: list[Any],
+        shared_prefix: SharedPrefix | None = None,
+    ) -> tuple[AsyncTextStreamer, Callable[[], dict[str, Any]], GenerationJob | None]:
+        """생성을 시작하고 (streamer, join, job) 을 돌려준다. 이벤트 루프 안에서 호출한다.
+
+        streamer 는 `async for` 로 소비한다. join 은 블로킹이므로 executor 에서 돌리며,
+        생성 오류를 다시 던지고 엔진 측 metrics 를 돌려준다.
+        criteria 중 하나가 발동하면 그때까지의 부분 결과로 끝난다. job 은 scheduler 경로에서만 있다.
+        """
+        loop = asyncio.get_running_loop()
+        if scheduler is not None:
+            job = scheduler.submit(
+                GenerationJob(
+                    input_ids=inputs["input_ids"],
+                    max_new_tokens=data.max_tokens,
+                    temperature=data.temperature,
+                    eos_token_ids={tokenizer.eos_token_id},
+                    streamer=AsyncTextStreamer(tokenizer, loop=loop, skip_prompt=False, skip_special_tokens=True),
+                    seed=data.seed,
+                    adapter=_adapter_for(data),
+                    stopping_criteria=criteria,
+                    logits_processors=_logits_processors(data),
+                    prompt_lookup_tokens=(
+                        prompt_lookup_tokens if data.prompt_lookup_tokens is None else data.prompt_lookup_tokens
+                    ),
+                    shared_prefix=shared_prefix,
+                )
+            )
+
+            def _join_job():
+                job.wait()
+                if job.error is not None:
+                    raise job.error
+                return job.metrics
+
+            return job.streamer, _join_job, job
 
-            def _run_generate():
+        streamer = AsyncTextStreamer(tokenizer, loop=loop, skip_prompt=True, skip_special_tokens=True)
+        stream_kwargs = {**_generate_kwargs(data, inputs, criteria), "streamer": streamer}
+        failure: list[BaseException] = []
+
+        def _run_generate():
+            try:
+                if data.seed is not None:
+                    torch.manual_seed(data.seed)
                 with torch.no_grad():
                     model.generate(**stream_kwargs)
+            except BaseException as err:
+                # streamer 를 닫지 않으면 소비하는 쪽이 영원히 기다린다.
+                failure.append(err)
+                streamer.end()
+
+        worker = Thread(target=_run_generate, daemon=True)
+        worker.start()
 
-            worker = Thread(target=_run_generate)
-            worker.start()
+        def _join_worker():
+            worker.join()
+            if failure:
+                raise failure[0]
+            return {}
+
+        return streamer, _join_worker, None
+
+    def _reasoning_metrics(metrics: dict[str, Any], token_ids: list[int]) -> None:
+        if think_ids is not None:
+            metrics["reasoning_tokens"], metrics["answer_tokens"] = count_reasoning(token_ids, *think_ids)
+
+    def _finish_metrics(
+        metrics: dict[str, Any],
+        t_start: float,
+        started_at: float,
+        streamer: AsyncTextStreamer,
+        job: GenerationJob | None,
+        trace: RequestTrace | None,
+    ) -> dict[str, Any]:
+        """토큰 수/시각은 streamer 가 본 실제 출력 토큰에서 가져온다 (재토크나이즈 없음)."""
+        t_end = time.perf_counter()
+        token_times = streamer.token_times
+        first_token_at = token_times[0] if token_times else None
+
+        total_ms = (t_end - t_start) * 1000.0
+        ttft_ms = ((first_token_at - t_start) * 1000.0) if first_token_at else total_ms
+        decode_ms = ((t_end - first_token_at) * 1000.0) if first_token_at else total_ms
+
+        gen_tokens = streamer.token_count
+        metrics.update(
+            {
+                "ttft_ms": ttft_ms,
+                "decode_ms": decode_ms,
+                "total_ms": total_ms,
+                "tokens": gen_tokens,
+            }
+        )
+        _reasoning_metrics(metrics, streamer.token_ids)
+        decode_sec = (decode_ms / 1000.0) if decode_ms else (total_ms / 1000.0)
+        if decode_sec and decode_sec > 0:
+            metrics["tps"] = gen_tokens / decode_sec
+        queue_wait = None
+        if job is not None and job.admitted_at is not None:
+            queue_wait = job.admitted_at - job.submitted_at
+            metrics["queue_ms"] = queue_wait * 1000.0
+
+        server_metrics.observe_request(
+            ttft_s=ttft_ms / 1000.0 if first_token_at else None,
+            total_s=total_ms / 1000.0,
+            token_times=token_times,
+            queue_wait_s=queue_wait,
+            tps=metrics.get("tps"),
+        )
+        if trace is not None:
+            prefill_start = started_at
+            if job is not None:
+                trace.add("queue", job.submitted_at, job.admitted_at)
+                prefill_start = job.admitted_at or started_at
+            trace.add(
+                "prefill",
+                prefill_start,
+                first_token_at,
+                prompt_tokens=metrics.get("prompt_tokens"),
+                cached_prompt_tokens=metrics.get("cached_prompt_tokens", 0),
+                chunks=metrics.get("prefill_chunks"),
+            )
+            for i, (prev, cur) in enumerate(zip(token_times, token_times[1:]), start=1):
+                trace.add("decode", prev, cur, token=i)
+            # 증분 detokenize 는 토큰마다 조금씩 일어나므로 합계를 요청 끝에 한 span 으로 둔다.
+            trace.add("detokenize", t_end - streamer.detokenize_s, t_end, incremental=True)
+            trace.spans.sort(key=lambda span: span.start)
+            tracer.finish(trace)
+        return metrics
+
+    async def _retrieve(data: ChatIn) -> tuple[ChatIn, dict[str, Any] | None]:
+        """rag 블록이 있으면 검색(+토큰 예산이 있으면 문장 압축)해 근거를 붙인 요청과
+        {hits, query_time_ms, rag_ms, compression} 을 돌려준다."""
+        if data.rag is None:
+            return data, None
+        t0 = time.perf_counter()
+        query = data.rag.query or last_user_text(data.messages)
+        if data.rag.roles:
+            roles = data.rag.roles
+        elif data.lora_name:
+            roles = [data.lora_name]
+        else:
+            roles = role_name.split("+")
+        try:
+            found = await executor.run(retriever.search, query, roles, data.rag.k)
+        except RetrieverUnavailable as err:
+            raise HTTPException(status_code=503, detail=str(err))
+        except ValueError as err:
+            raise HTTPException(status_code=400, detail=str(err))
+        budget = rag_context_tokens if data.rag.context_tokens is None else data.rag.context_tokens
+        if budget > 0 and found["hits"]:
+            packed = await executor.run(
+                compress_contexts,
+                query,
+                found["hits"],
+                retriever.encode,
+                token_budget=budget,
+                count_tokens=lambda text: len(tokenizer.encode(text, add_special_tokens=False)),
+            )
+            found["hits"] = packed.contexts
+            found["compression"] = packed.stats()
+        messages = splice_contexts(data.messages, found["hits"])
+        found["rag_ms"] = (time.perf_counter() - t0) * 1000.0
+        return data.model_copy(update={"messages": messages, "rag": None}), found
+
+    def _with_rag(result: dict[str, Any], rag: dict[str, Any] | None) -> dict[str, Any]:
+        if rag is None:
+            return result
+        metrics = {**result["metrics"], "rag_ms": rag["rag_ms"]}
+        payload = {key: rag[key] for key in ("hits", "query_time_ms", "compression") if key in rag}
+        return {**result, "metrics": metrics, "rag": payload}
+
+    @app.post("/chat")
+    async def chat(req: Request):
+        arrived_at = time.perf_counter()
+        body = await req.json()
+        return await _chat_item(ChatIn.model_validate(body), req, arrived_at)
+
+    async def _chat_item(data: ChatIn, req: Request | None = None, arrived_at: float | None = None) -> dict[str, Any]:
+        """/chat 한 건: rag 검색, 응답 캐시, 생성. deadline 은 arrived_at (요청 도착) 부터 잰다."""
+        if arrived_at is None:
+            arrived_at = time.perf_counter()
+        data, rag = await _retrieve(data)
+        # deadline 이 있는 요청은 잘린 결과를 낼 수 있어 캐시도, 같은 요청과의 합류도 하지 않는다.
+        if response_cache is None or (data.temperature > 0 and data.seed is None) or data.deadline_ms:
+            return _with_rag(await _chat_once(data, req, arrived_at=arrived_at), rag)
+
+        t_start = time.perf_counter()
+        key = request_key(
+            {
+                "model": model_id,
+                "role": role_name,
+                "messages": data.messages,
+                "max_tokens": data.max_tokens,
+                "temperature": data.temperature,
+                "lora_name": data.lora_name,
+                "seed": data.seed,
+                "prompt_lookup_tokens": data.prompt_lookup_tokens,
+                "think_budget": _think_budget(data),
+            }
+        )
+        # 공유되는 생성이므로 한 클라이언트의 연결 종료로 취소하지 않고, 잘린 결과는 저장하지도 넘기지도 않는다.
+        result, status = await response_cache.get_or_compute(
+            key,
+            lambda: _chat_once(data),
+            store=lambda value: "truncated_reason" not in value,
+        )
+        metrics = dict(result["metrics"])
+        if status != "miss":
+            metrics["total_ms"] = (time.perf_counter() - t_start) * 1000.0
+        metrics["response_cache"] = status
+        metrics.update(response_cache.stats())
+        return _with_rag({**result, "metrics": metrics}, rag)
+
+    class ChatBatchIn(BaseModel):
+        items: list[ChatIn]
+
+    @app.post("/chat/batch")
+    async def chat_batch(req: Request):
+        """여러 대화를 한 요청으로. results 는 items 순서대로 /chat 과 같은 {content, metrics},
+        실패한 항목은 {error, status} 이고 나머지 항목은 그대로 돌려준다.
+
+        scheduler 가 있으면 모든 항목을 한꺼번에 넣어 연속 배칭이 한 디코드 배치로 묶는다.
+        없으면 (rbln) 생성 설정이 같은 항목끼리 왼쪽 패딩해 batched generate 로 돌린다.
+        """
+        t_start = time.perf_counter()
+        body = await req.json()
+        batch = ChatBatchIn.model_validate({"items": body} if isinstance(body, list) else body)
+        if scheduler is not None:
+            pending = [_chat_item(item, req, t_start) for item in batch.items]
+            results = list(await asyncio.gather(*(_item_or_error(p) for p in pending)))
+        else:
+            results = await _generate_batch(batch.items, t_start)
+        total_s = time.perf_counter() - t_start
+        tokens = sum(int(r["metrics"].get("tokens", 0)) for r in results if "metrics" in r)
+        return {
+            "results": results,
+            "metrics": {
+                "items": len(results),
+                "errors": sum(1 for r in results if "error" in r),
+                "tokens": tokens,
+                "total_ms": total_s * 1000.0,
+                "tps": tokens / total_s if total_s > 0 else 0.0,
+            },
+        }
+
+    async def _item_or_error(pending: Awaitable[dict[str, Any]]) -> dict[str, Any]:
+        """/chat/batch, /chat/fanout 의 한 항목. 실패해도 다른 항목은 계속되도록 오류를 결과로 바꾼다."""
+        try:
+            return await pending
+        except HTTPException as err:
+            return {"error": err.detail, "status": err.status_code}
+        except Exception as err:
+            print(f"[AI-WARN] Batch item failed ({err}).")
+            return {"error": str(err), "status": 500}
+
+    async def _generate_batch(items: list[ChatIn], arrived_at: float) -> list[dict[str, Any]]:
+        results: list[dict[str, Any] | None] = [None] * len(items)
+        groups: dict[tuple, list[tuple[int, ChatIn, dict[str, Any] | None]]] = {}
+        for i, item in enumerate(items):
             try:
-                for piece in streamer:
-                    if not piece:
-                        continue
-                    now = time.perf_counter()
-                    if first_token_at is None:
-                        first_token_at = now
-                    pieces.append(piece)
-            finally:
-                worker.join()
+                data, rag = await _retrieve(item)
+            except HTTPException as err:
+                results[i] = {"error": err.detail, "status": err.status_code}
+                continue
+            key = (data.max_tokens, data.temperature, data.lora_name, data.seed, data.deadline_ms, _think_budget(data))
+            groups.setdefault(key, []).append((i, data, rag))
+        for members in groups.values():
+            for start in range(0, len(members), batch_generate_size):
+                chunk = members[start : start + batch_generate_size]
+                try:
+                    outputs = await executor.run(_generate_group, [data for _, data, _ in chunk], arrived_at)
+                except Exception as err:
+                    print(f"[AI-WARN] Batched generate failed ({err}).")
+                    outputs = [{"error": str(err), "status": 500}] * len(chunk)
+                for (i, _, rag), out in zip(chunk, outputs):
+                    results[i] = out if "error" in out else _with_rag(out, rag)
+        return results
 
-            generated_text = "".join(pieces).strip()
-            t_end = time.perf_counter()
+    def _generate_group(datas: list[ChatIn], arrived_at: float) -> list[dict[str, Any]]:
+        """생성 설정이 같은 대화들을 왼쪽 패딩해 model.generate 한 번으로 돌린다 (블로킹)."""
+        t_start = time.perf_counter()
+        data = datas[0]
+        _select_lora(data)
+        encoded = [tokenizer(_render(d), return_tensors="pt")["input_ids"][0] for d in datas]
+        width = max(int(ids.shape[-1]) for ids in encoded)
+        pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+        input_ids = torch.full((len(encoded), width), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(encoded), width), dtype=torch.long)
+        for row, ids in enumerate(encoded):
+            input_ids[row, width - ids.shape[-1] :] = ids
+            attention_mask[row, width - ids.shape[-1] :] = 1
+        inputs = {"input_ids": input_ids.to(device)}
+        if generate_takes_mask:
+            inputs["attention_mask"] = attention_mask.to(device)
+        stopper = _stopper(data, arrived_at)
+        if data.seed is not None:
+            torch.manual_seed(data.seed)
+        with torch.no_grad():
+            out = model.generate(**_generate_kwargs(data, inputs, [stopper]))
+        total_s = time.perf_counter() - t_start
+        results = []
+        for row, ids in enumerate(encoded):
+            generated = out[row, width:].tolist()
+            if tokenizer.eos_token_id in generated:
+                generated = generated[: generated.index(tokenizer.eos_token_id)]
+            metrics: dict[str, Any] = {
+                "prompt_tokens": int(ids.shape[-1]),
+                "tokens": len(generated),
+                "total_ms": total_s * 1000.0,
+                "batch_size": len(datas),
+            }
+            _reasoning_metrics(metrics, generated)
+            result = {"content": tokenizer.decode(generated, skip_special_tokens=True).strip(), "metrics": metrics}
+            if stopper.reason is not None:
+                result["truncated_reason"] = stopper.reason
+            results.append(result)
+        return results
 
-            total_ms = (t_end - t_start) * 1000.0
-            ttft_ms = ((first_token_at - t_start) * 1000.0) if first_token_at else total_ms
-            decode_ms = ((t_end - first_token_at) * 1000.0) if first_token_at else total_ms
+    async def _chat_once(
+        data: ChatIn,
+        req: Request | None = None,
+        prepared: tuple[Any, int] | None = None,
+        shared_prefix: SharedPrefix | None = None,
+        arrived_at: float | None = None,
+    ) -> dict[str, Any]:
+        t_start = time.perf_counter()
+        stopper = _stopper(data, t_start if arrived_at is None else arrived_at)
+        watcher = asyncio.create_task(_watch_disconnect(req, stopper)) if req is not None else None
+        try:
+            result = await _generate_once(data, stopper, t_start, prepared, shared_prefix)
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+        if stopper.reason is not None:
+            result["truncated_reason"] = stopper.reason
+        return result
 
-            metrics.update(
-                {
-                    "ttft_ms": ttft_ms,
-                    "decode_ms": decode_ms,
-                    "total_ms": total_ms,
-                }
+    class BranchIn(BaseModel):
+        messages: list[dict] = []  # 공유 messages 뒤에 붙는 이 branch 만의 메시지 (역할 지시 등)
+        lora_name: str | None = None
+        max_tokens: int | None = None  # None 이면 FanoutIn 값
+        temperature: float | None = None
+        seed: int | None = None
+        think_budget: int | None = None
+
+    class FanoutIn(BaseModel):
+        messages: list[dict]  # 모든 branch 가 공유하는 앞부분 (질문 + 근거)
+        branches: list[BranchIn]
+        max_tokens: int = default_max_tokens
+        temperature: float = default_temp
+        deadline_ms: int | None = None
+        rag: RagIn | None = None  # 공유 messages 에 한 번만 검색해 붙인다 (roles 가 없으면 branch 의 lora_name 들)
+
+    @app.post("/chat/fanout")
+    async def chat_fanout(req: Request):
+        """한 질문을 여러 역할(branch)로 나눠 답한다. results 는 branches 순서의 /chat 응답 모양.
+
+        branch 의 대화는 messages + branch.messages 이고, 모든 branch 프롬프트의 토큰 공통 접두사를
+        adapter 마다 한 번만 prefill 해 그 KV 를 나눠 쓴다. LoRA 가 q/k/v 에도 걸려 있어 adapter 가
+        다르면 접두사 KV 도 달라지므로, 공유는 같은 adapter 의 branch 끼리만 된다.
+        scheduler 가 없는 백엔드(rbln)에서는 branch 를 하나씩 생성한다.
+        """
+        t_start = time.perf_counter()
+        body = await req.json()
+        fan = FanoutIn.model_validate(body)
+        if not fan.branches:
+            raise HTTPException(status_code=400, detail="branches must not be empty")
+        rag_in = fan.rag
+        if rag_in is not None and not rag_in.roles:
+            roles = list(dict.fromkeys(b.lora_name for b in fan.branches if b.lora_name))
+            rag_in = rag_in.model_copy(update={"roles": roles or None})
+        shared, rag = await _retrieve(ChatIn(messages=fan.messages, rag=rag_in))
+        datas = [
+            ChatIn(
+                messages=shared.messages + branch.messages,
+                max_tokens=fan.max_tokens if branch.max_tokens is None else branch.max_tokens,
+                temperature=fan.temperature if branch.temperature is None else branch.temperature,
+                lora_name=branch.lora_name,
+                seed=branch.seed,
+                deadline_ms=fan.deadline_ms,
+                think_budget=branch.think_budget,
             )
+            for branch in fan.branches
+        ]
 
-            if generated_text:
-                gen_ids = tokenizer(
-                    generated_text,
-                    add_special_tokens=False,
-                    return_tensors="pt",
-                )["input_ids"][0]
-                gen_tokens = int(gen_ids.shape[-1])
-            else:
-                gen_tokens = 0
-            metrics["tokens"] = gen_tokens
-            decode_sec = (decode_ms / 1000.0) if decode_ms else (total_ms / 1000.0)
-            if decode_sec and decode_sec > 0:
-                metrics["tps"] = gen_tokens / decode_sec
+        shared_tokens = 0
+        if scheduler is not None:
+            prepared = await asyncio.gather(*(executor.run(_prepare, data) for data in datas))
+            shared_tokens = _common_prefix_len([inputs["input_ids"][0].tolist() for inputs, _ in prepared])
+            prefix = SharedPrefix(shared_tokens) if shared_tokens > 0 else None
+            pending = [_chat_once(data, None, prep, prefix, t_start) for data, prep in zip(datas, prepared)]
+            results = list(await asyncio.gather(*(_item_or_error(p) for p in pending)))
+        else:
+            results = [await _item_or_error(_chat_once(data, arrived_at=t_start)) for data in datas]
+        for branch, result in zip(fan.branches, results):
+            result["lora_name"] = branch.lora_name
+
+        total_s = time.perf_counter() - t_start
+        tokens = sum(int(r["metrics"].get("tokens", 0)) for r in results if "metrics" in r)
+        metrics = {
+            "branches": len(results),
+            "errors": sum(1 for r in results if "error" in r),
+            "shared_prefix_tokens": shared_tokens,
+            "adapters": len({branch.lora_name for branch in fan.branches}),
+            "prefill_tokens_saved": sum(
+                int(r["metrics"].get("shared_prefix_tokens", 0)) for r in results if "metrics" in r
+            ),
+            "tokens": tokens,
+            "total_ms": total_s * 1000.0,
+            "tps": tokens / total_s if total_s > 0 else 0.0,
+        }
+        return _with_rag({"results": results, "metrics": metrics}, rag)
+
+    def _generate_blocking(data: ChatIn, inputs: Any, criteria: list[Any]) -> Any:
+        with torch.no_grad():
+            return model.generate(**_generate_kwargs(data, inputs, criteria))
+
+    async def _tokenize(data: ChatIn, trace: RequestTrace | None) -> tuple[Any, int]:
+        t0 = time.perf_counter()
+        inputs, prompt_len = await executor.run(_prepare, data)
+        if trace is not None:
+            trace.add("tokenize", t0, time.perf_counter(), prompt_tokens=prompt_len)
+        return inputs, prompt_len
+
+    async def _generate_once(
+        data: ChatIn,
+        stopper: CancelCriteria,
+        t_start: float,
+        prepared: tuple[Any, int] | None = None,
+        shared_prefix: SharedPrefix | None = None,
+    ) -> dict[str, Any]:
+        """prepared 는 이미 토크나이즈한 (inputs, prompt_len), shared_prefix 는 /chat/fanout 의 공유 접두사."""
+        trace = tracer.start(f"{role_name} /chat") if tracer is not None else None
+        inputs, prompt_len = prepared if prepared is not None else await _tokenize(data, trace)
+        criteria, repetition = _criteria(stopper, prompt_len)
+
+        metrics: dict[str, Any] = {"prompt_tokens": prompt_len}
+
+        try:
+            started_at = time.perf_counter()
+            streamer, join, job = _start_stream(data, inputs, criteria, shared_prefix)
+            pieces: list[str] = []
 
-            return {"content": generated_text, "metrics": metrics}
+            try:
+                async for piece in streamer:
+                    pieces.append(piece)
+            finally:
+                metrics.update(await executor.run(join))
+
+            generated_text = "".join(pieces).strip()
+            _finish_metrics(metrics, t_start, started_at, streamer, job, trace)
+            result = {"content": generated_text, "metrics": metrics}
+            _trim_repetition(result, repetition, streamer.token_ids)
+            return result
         except Exception as err:
+            if scheduler is not None:
+                # scheduler 스레드가 같은 모델로 디코드 중이고 adapter 상태도 그쪽 것이라 generate 로 돌리지 않는다.
+                print(f"[AI-WARN] Scheduled generation failed ({err}).")
+                raise HTTPException(status_code=500, detail=str(err))
             print(f"[AI-WARN] Streaming generation failed ({err}); reverting to blocking mode.")
-            with torch.no_grad():
-                out = model.generate(**base_kwargs)
+            out = await executor.run(_generate_blocking, data, inputs, criteria)
             generated = out[0]
             generated_text = tokenizer.decode(
                 generated[prompt_len:], skip_special_tokens=True
@@ -188,14 +979,285 @@ def build_app(
                     "tokens": max(gen_tokens, 0),
                 }
             )
+            _reasoning_metrics(metrics, generated[prompt_len:].tolist())
             duration = t_end - t_start
             if duration > 0:
                 metrics["tps"] = metrics["tokens"] / duration
-            return {"content": generated_text, "metrics": metrics}
+            server_metrics.observe_request(ttft_s=None, total_s=duration, token_times=[], tps=metrics.get("tps"))
+            result = {"content": generated_text, "metrics": metrics}
+            _trim_repetition(result, repetition, generated[prompt_len:].tolist())
+            return result
+
+    @app.post("/chat/stream")
+    async def chat_stream(req: Request):
+        """Server-Sent Events: 조각마다 `data: {"delta": ...}`, 마지막에 `event: done` 으로 content/metrics.
+
+        반복 루프로 멈추면 이미 보낸 delta 는 되돌릴 수 없으므로 done 의 content 가 잘라낸 최종본이다.
+        """
+        arrived_at = time.perf_counter()
+        body = await req.json()
+        data = ChatIn.model_validate(body)
+        data, rag = await _retrieve(data)
+        t_start = time.perf_counter()
+        stopper = _stopper(data, arrived_at)
+        trace = tracer.start(f"{role_name} /chat/stream") if tracer is not None else None
+        inputs, prompt_len = await _tokenize(data, trace)
+        criteria, repetition = _criteria(stopper, prompt_len)
+
+        metrics: dict[str, Any] = {"prompt_tokens": prompt_len}
+        started_at = time.perf_counter()
+        streamer, join, job = _start_stream(data, inputs, criteria)
+
+        async def _events():
+            pieces: list[str] = []
+            completed = False
+            try:
+                async for piece in streamer:
+                    pieces.append(piece)
+                    yield _sse({"delta": piece})
+                metrics.update(await executor.run(join))
+                completed = True
+            except Exception as err:
+                print(f"[AI-WARN] Streaming generation failed ({err}).")
+                yield _sse({"error": str(err)}, event="error")
+                return
+            finally:
+                # 클라이언트가 스트림을 끊으면 Starlette 가 제너레이터를 닫으므로 여기서 생성을 멈춘다.
+                if not completed:
+                    stopper.cancel("client_disconnected")
+            generated_text = "".join(pieces).strip()
+            _finish_metrics(metrics, t_start, started_at, streamer, job, trace)
+            done: dict[str, Any] = {"content": generated_text, "metrics": metrics}
+            _trim_repetition(done, repetition, streamer.token_ids)
+            done = _with_rag(done, rag)
+            if stopper.reason is not None:
+                done["truncated_reason"] = stopper.reason
+            yield _sse(done, event="done")
+
+        return StreamingResponse(
+            _events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
     return app
 
-def run_server(role: str, port: int, model_id: str, *, temperature: float, max_tokens: int, backend: str):
-    app = build_app(role, model_id, default_temp=temperature, default_max_tokens=max_tokens, backend=backend)
+def _bind_socket(port: int, host: str = "0.0.0.0", backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def _replicas_supported(backend: str, replicas: int) -> int:
+    if replicas <= 1:
+        return 1
+    if backend == "rbln" or torch.cuda.is_available():
+        # NPU/CUDA 컨텍스트는 fork 이후 자식에서 쓸 수 없다.
+        print(f"[AI-WARN] --replicas needs the torch CPU backend (backend={backend}); serving with 1 replica")
+        return 1
+    return replicas
+
+def _fork_unsafe_reason(precision: str | None) -> str | None:
+    """로드 중에 부모가 torch intra-op(OpenMP) 스레드 풀을 쓰게 되는 설정이면 그 이유.
+
+    풀을 한 번이라도 쓴 프로세스에서 fork 한 자식은 첫 병렬 연산에서 멈출 수 있다.
+    """
+    if (precision or os.environ.get("AI_PRECISION", "fp32")) == "int8-dynamic":
+        return "int8-dynamic quantization"
+    if os.environ.get("AI_COMPILED_DECODE", "0") == "1" and os.environ.get("AI_COMPILE_WARMUP", "1") == "1":
+        return "compiled decode warmup"
+    if os.environ.get("AI_RAG_PRELOAD", "0") == "1":
+        return "RAG preload"
+    return None
+
+def _apply_cpu_plan(cpu_slots: list[CpuSlot] | None) -> None:
+    """모델 로드 전에 호출한다. replica 가 여럿이면 로드하는 부모는 모든 slot 의 합집합을 쓴다."""
+    if not cpu_slots:
+        return
+    if len(cpu_slots) == 1:
+        apply_slot(cpu_slots[0])
+        return
+    cpus = tuple(sorted({cpu for slot in cpu_slots for cpu in slot.cpus}))
+    apply_slot(
+        CpuSlot(
+            role=cpu_slots[0].role,
+            replica=-1,
+            cpus=cpus,
+            intra_threads=(
+                max(slot.intra_threads for slot in cpu_slots)
+                if cpu_slots[0].shared
+                else sum(slot.intra_threads for slot in cpu_slots)
+            ),
+            shared=cpu_slots[0].shared,
+        )
+    )
+
+def _serve_forked(
+    build_apps: Callable[[], list[tuple[str, int, FastAPI]]],
+    ports: list[int],
+    replicas: int,
+    cpu_slots: list[CpuSlot] | None = None,
+    host: str = "0.0.0.0",
+    precision: str | None = None,
+) -> None:
+    """부모가 포트를 미리 bind 하고 replicas 개의 uvicorn 워커를 fork 한다.
+
+    자식들은 같은 listen 소켓에서 accept 하므로 커널이 연결을 나눠 준다. 보통은 부모가
+    build_apps 로 모델을 올린 뒤 fork 해 가중치 텐서를 copy-on-write 로 공유한다.
+    scheduler 스레드와 executor 스레드는 첫 요청 때 시작되므로 fork 시점의 부모에는 아직 없다.
+    로드 중에 부모가 intra-op 스레드 풀을 쓰는 설정(_fork_unsafe_reason)이면 fork 를 먼저 하고
+    자식마다 따로 모델을 올린다 (공유는 포기한다).
+    """
+    sockets = [_bind_socket(port, host) for port in ports]
+    unsafe = _fork_unsafe_reason(precision)
+    if unsafe is None:
+        apps = build_apps()
+        # 부모 힙의 객체를 영구 세대로 옮겨 자식의 GC 가 refcount/헤더 페이지를 건드려 복사되는 것을 줄인다.
+        gc.collect()
+        gc.freeze()
+    else:
+        print(f"[AI-WARN] {unsafe} uses torch's thread pool before fork; each replica loads its own model.")
+
+    children: dict[int, int] = {}
+    for index in range(replicas):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                if cpu_slots:
+                    apply_slot(cpu_slots[index % len(cpu_slots)])
+                if unsafe is not None:
+                    apps = build_apps()
+                servers = [
+                    uvicorn.Server(uvicorn.Config(app, host=host, port=port)) for _, port, app in apps
+                ]
+
+                async def _serve_all():
+                    await asyncio.gather(
+                        *(server.serve(sockets=[sock]) for server, sock in zip(servers, sockets))
+                    )
+
+                asyncio.run(_serve_all())
+            except BaseException as err:  # noqa: BLE001 - 자식은 어떤 경우에도 부모 코드로 돌아가면 안 된다
+                print(f"[AI-WARN] Replica {index} (pid={os.getpid()}) exited with error: {err}")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = index
+        print(f"[AI] Forked replica {index} (pid={pid}) serving ports {', '.join(map(str, ports))}")
+
+    for sock in sockets:
+        sock.close()
+
+    def _forward(sig, _frm=None):
+        for pid in list(children):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _forward)
+    signal.signal(signal.SIGTERM, _forward)
+    while children:
+        try:
+            pid, status = os.waitpid(-1, 0)
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is not None and status != 0:
+            print(f"[AI-WARN] Replica {index} (pid={pid}) exited with status {status}")
+
+def run_server(
+    role: str,
+    port: int,
+    model_id: str,
+    *,
+    temperature: float,
+    max_tokens: int,
+    backend: str,
+    max_batch_size: int | None = None,
+    lora_map: dict[str, str] | None = None,
+    precision: str | None = None,
+    replicas: int = 1,
+    cpu_slots: list[CpuSlot] | None = None,
+    host: str = "0.0.0.0",
+    enable_trace: bool = False,
+):
+    _apply_cpu_plan(cpu_slots)
+
+    def _build() -> list[tuple[str, int, FastAPI]]:
+        app = build_app(
+            role,
+            model_id,
+            default_temp=temperature,
+            default_max_tokens=max_tokens,
+            backend=backend,
+            enable_trace=enable_trace,
+            max_batch_size=max_batch_size,
+            lora_map=lora_map,
+            precision=precision,
+        )
+        return [(role, port, app)]
+
+    replicas = _replicas_supported(backend, replicas)
+    if replicas > 1:
+        print(f"[AI] Starting {role} on port {port} (backend={backend}, replicas={replicas})")
+        _serve_forked(_build, [port], replicas, cpu_slots, host, precision)
+        return
+    ((_, _, app),) = _build()
     print(f"[AI] Starting {role} on port {port} (backend={backend})")
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    uvicorn.run(app, host=host, port=port)
+
+def run_multi_role_server(
+    role_ports: dict[str, int],
+    model_id: str,
+    *,
+    temperature: float,
+    max_tokens: int,
+    backend: str,
+    max_batch_size: int | None = None,
+    lora_map: dict[str, str] | None = None,
+    precision: str | None = None,
+    replicas: int = 1,
+    cpu_slots: list[CpuSlot] | None = None,
+    enable_trace: bool = False,
+):
+    """베이스 모델 1개 + 역할별 LoRA 를 한 프로세스에 올리고 역할 포트를 모두 서빙한다.
+
+    replicas > 1 이면 이 프로세스를 통째로 fork 해 워커마다 모든 역할 포트를 서빙한다.
+    """
+    _apply_cpu_plan(cpu_slots)
+
+    def _build() -> list[tuple[str, int, FastAPI]]:
+        apps = []
+        for role, port in role_ports.items():
+            app = build_app(
+                role,
+                model_id,
+                default_temp=temperature,
+                default_max_tokens=max_tokens,
+                backend=backend,
+                enable_trace=enable_trace,
+                max_batch_size=max_batch_size,
+                lora_map=lora_map,
+                precision=precision,
+            )
+            apps.append((role, port, app))
+            print(f"[AI] Starting {role} on port {port} (backend={backend}, shared model)")
+        return apps
+
+    replicas = _replicas_supported(backend, replicas)
+    if replicas > 1:
+        _serve_forked(_build, list(role_ports.values()), replicas, cpu_slots, precision=precision)
+        return
+
+    apps = _build()
+
+    servers = [uvicorn.Server(uvicorn.Config(app, host="0.0.0.0", port=port)) for _, port, app in apps]
+
+    async def _serve_all():
+        await asyncio.gather(*(server.serve() for server in servers))
+
+    asyncio.run(_serve_all())
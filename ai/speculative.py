@@ -0,0 +1,23 @@
+"""Prompt-lookup (n-gram) draft proposals for assisted decoding.
+
+RAG answers copy long spans from the contexts pasted into the prompt, so the
+tokens that followed the most recent earlier occurrence of the current n-gram
+suffix are a cheap, model-free draft. The batch scheduler verifies a draft in
+one forward pass and keeps the longest prefix the model agrees with.
+"""
+
+from __future__ import annotations
+
+
+def propose_prompt_lookup(ids: list[int], *, max_ngram: int = 3, num_tokens: int = 10) -> list[int]:
+    """ids 의 마지막 n-gram 이 앞에서 다시 나오면 그 뒤 토큰들을 초안으로 돌려준다."""
+    n = len(ids)
+    if num_tokens <= 0:
+        return []
+    for size in range(min(max_ngram, n - 1), 0, -1):
+        tail = ids[n - size:]
+        # 가장 최근 등장 위치부터 찾는다 (대화 뒤쪽 문맥일수록 이어질 확률이 높다).
+        for start in range(n - size - 1, -1, -1):
+            if ids[start:start + size] == tail:
+                return ids[start + size:start + size + num_tokens]
+    return []
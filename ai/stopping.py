@@ -0,0 +1,70 @@
+"""Stopping criteria shared by `model.generate` and the batch scheduler.
+
+Each criterion follows the HF `StoppingCriteria` call signature and exposes a
+`reason` string: cancellations end up as the response's `truncated_reason`,
+`RepetitionCriteria` as `stopped_by`.
+"""
+
+from __future__ import annotations
+
+import time
+
+import torch
+from transformers import StoppingCriteria
+
+
+class CancelCriteria(StoppingCriteria):
+    """클라이언트 연결 종료나 deadline 초과 시 생성을 멈춘다."""
+
+    def __init__(self, deadline_at: float | None = None):
+        self.deadline_at = deadline_at  # time.perf_counter() 기준
+        self.reason: str | None = None
+
+    def cancel(self, reason: str) -> None:
+        if self.reason is None:
+            self.reason = reason
+
+    def __call__(self, input_ids: torch.Tensor, scores: torch.Tensor | None = None, **kwargs) -> torch.BoolTensor:
+        if self.reason is None and self.deadline_at is not None and time.perf_counter() >= self.deadline_at:
+            self.reason = "deadline"
+        stop = self.reason is not None
+        return torch.full((input_ids.shape[0],), stop, dtype=torch.bool, device=input_ids.device)
+
+
+class RepetitionCriteria(StoppingCriteria):
+    """생성 꼬리가 짧은 주기로 반복되면 (반복 루프) 멈춘다.
+
+    생성된 마지막 `window` 토큰 전체가 주기 p (p <= window / threshold, 즉 최소 threshold 회 반복)
+    를 가지면 발동한다. 멈춘 뒤 `keep_tokens` 는 반복 구간의 첫 주기까지의 생성 토큰 수로,
+    응답에서는 그 뒤를 잘라낸다.
+    """
+
+    reason = "repetition"
+
+    def __init__(self, prompt_len: int, *, window: int = 64, threshold: int = 3):
+        self.prompt_len = prompt_len
+        self.window = max(2, window)
+        self.max_period = max(1, self.window // max(2, threshold))
+        self.triggered = False
+        self.period: int | None = None
+        self.keep_tokens: int | None = None
+
+    def check(self, generated: list[int]) -> bool:
+        """생성 토큰 전체를 받아 반복 루프인지 본다 (발동하면 period/keep_tokens 를 채운다)."""
+        if len(generated) < self.window:
+            return False
+        tail = generated[-self.window:]
+        for p in range(1, self.max_period + 1):
+            if tail[p:] == tail[:-p]:
+                # 주기 p 가 어디서부터 이어지는지 앞으로 넓혀 첫 주기만 남긴다.
+                start = len(generated) - self.window
+                while start > 0 and generated[start - 1] == generated[start - 1 + p]:
+                    start -= 1
+                self.triggered, self.period, self.keep_tokens = True, p, start + p
+                return True
+        return False
+
+    def __call__(self, input_ids: torch.Tensor, scores: torch.Tensor | None = None, **kwargs) -> torch.BoolTensor:
+        if not self.triggered and input_ids.shape[-1] - self.prompt_len >= self.window:
+            self.check(input_ids[0, self.prompt_len:].tolist())
+        return torch.full((input_ids.shape[0],), self.triggered, dtype=torch.bool, device=input_ids.device)
@@ -0,0 +1,69 @@
+"""Chunked prefill: same outputs as one-shot prefill, interleaved with decode."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+AI_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(AI_DIR))
+
+
+def _job(tok, text: str, max_new_tokens: int = 12):
+    from scheduler import GenerationJob
+
+    return GenerationJob(tok(text, return_tensors="pt").input_ids, max_new_tokens, 0.0, set())
+
+
+def test_chunked_prefill_matches_one_shot_and_interleaves():
+    from engines import load_tiny
+    from prefix_cache import PrefixCache
+    from scheduler import BatchScheduler
+
+    tok, model, device = load_tiny("tiny-model", "fp32")
+    long_prompt = "chunked prefill keeps the batch moving. " * 12
+    prompts = ["short one", long_prompt, "another short prompt"]
+
+    one_shot = BatchScheduler(model, device, max_batch_size=4)
+    expected = []
+    for text in prompts:
+        job = one_shot.submit(_job(tok, text))
+        assert job.wait(60) and job.error is None
+        expected.append(job.output_ids)
+
+    chunked = BatchScheduler(model, device, max_batch_size=4, prefill_chunk=32, prefix_cache=PrefixCache(block_size=16))
+    running = chunked.submit(_job(tok, prompts[0], max_new_tokens=200))
+    while not running.output_ids:
+        running.wait(0.01)
+    jobs = [chunked.submit(_job(tok, text)) for text in prompts]
+    for job in jobs:
+        assert job.wait(60) and job.error is None
+    running.wait(60)
+
+    assert [job.output_ids for job in jobs] == expected
+    long_job = jobs[1]
+    # 앞선 짧은 프롬프트와 반복당 예산을 나눠 쓰므로 청크 경계가 한 칸 밀릴 수 있다.
+    assert long_job.metrics["prefill_chunks"] in (-(-long_job.prompt_len // 32), -(-long_job.prompt_len // 32) + 1)
+    assert 0 <= long_job.metrics["prefill_peak_mb"] < 512  # 프로세스 RSS 가 아니라 이 prefill 동안 늘어난 양
+    # 긴 프롬프트를 prefill 하는 동안에도 이미 돌던 요청은 계속 토큰을 낸다.
+    assert running.first_token_at < long_job.first_token_at
+    assert len(running.output_ids) > long_job.metrics["prefill_chunks"]
+    assert jobs[0].metrics["cached_prompt_tokens"] == 0
+
+
+@pytest.mark.parametrize("prefill_chunk", [0, 16])
+def test_prefill_keeps_only_last_position_logits(prefill_chunk):
+    from engines import load_tiny
+    from scheduler import BatchScheduler
+
+    tok, model, device = load_tiny("tiny-model", "fp32")
+    shapes: list[tuple[int, ...]] = []
+    model.register_forward_hook(lambda _module, _args, out: shapes.append(tuple(out.logits.shape)))
+
+    scheduler = BatchScheduler(model, device, max_batch_size=2, prefill_chunk=prefill_chunk)
+    job = scheduler.submit(_job(tok, "only the last prompt position needs logits " * 4, max_new_tokens=4))
+    assert job.wait(60) and job.error is None
+    assert job.metrics["prefill_chunks"] == (-(-job.prompt_len // prefill_chunk) if prefill_chunk else 1)
+    assert shapes and all(shape[1] == 1 for shape in shapes)  # 프롬프트 길이만큼의 logits 를 만들지 않는다
@@ -0,0 +1,38 @@
+"""Static cache + compiled decode path matches the dynamic-cache scheduler."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+AI_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(AI_DIR))
+
+
+def test_compiled_decode_matches_eager_and_falls_back_past_buckets():
+    from compiled_decode import CompiledDecodeScheduler
+    from engines import load_tiny
+    from scheduler import BatchScheduler, GenerationJob
+
+    tok, model, device = load_tiny("tiny-model", "fp32")
+    prompts = ["static cache", "a slightly longer prompt for the second bucket", "x" * 100]
+
+    def job(text: str) -> GenerationJob:
+        return GenerationJob(tok(text, return_tensors="pt").input_ids, 16, 0.0, set())
+
+    def run(scheduler) -> list:
+        jobs = [scheduler.submit(job(text)) for text in prompts]
+        for j in jobs:
+            assert j.wait(120) and j.error is None
+        return jobs
+
+    eager = run(BatchScheduler(model, device, max_batch_size=1))
+    # eager 백엔드: dynamo 추적/가드/버킷 재컴파일은 그대로 거치고 inductor 코드 생성만 건너뛴다.
+    compiled = CompiledDecodeScheduler(model, device, buckets=(48, 96), compile_backend="eager", prefill_chunk=16)
+    assert compiled.warmup() > 0
+    jobs = run(compiled)
+
+    assert [j.output_ids for j in jobs] == [j.output_ids for j in eager]
+    assert [j.metrics.get("cache_bucket") for j in jobs] == [48, 96, None]  # 마지막은 96 을 넘어 동적 경로
+    assert jobs[1].metrics["decode_mode"] == "compiled"
+    assert jobs[1].metrics["prefill_chunks"] == -(-jobs[1].prompt_len // 16)
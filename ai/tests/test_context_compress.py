@@ -0,0 +1,48 @@
+"""context_compress: keeps the most query-like sentences within the budget, in order."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from context_compress import approx_tokens, compress_contexts, split_sentences  # noqa: E402
+
+
+def _encode(texts: list[str]) -> np.ndarray:
+    # 키워드 개수 벡터: "금리" 가 많은 문장일수록 질의와 비슷하다.
+    return np.array([[t.count("금리"), t.count("소비"), 0.1] for t in texts], dtype=np.float32)
+
+
+CONTEXTS = [
+    {"text": "날씨가 맑다. 금리가 2.5%로 올랐다. 주가는 보합.", "source": "a"},
+    {"text": "점심은 국수였다. 금리 부담이 커졌다.", "source": "b"},
+    {"text": "축구 경기 결과.", "source": "c"},
+]
+
+
+def test_split_keeps_decimals():
+    assert split_sentences("금리가 2.5%로 올랐다. 소비가 줄었다!\n끝") == ["금리가 2.5%로 올랐다.", "소비가 줄었다!", "끝"]
+
+
+def test_budget_keeps_best_sentences_in_order_with_sources():
+    budget = approx_tokens("금리가 2.5%로 올랐다.") + approx_tokens("금리 부담이 커졌다.")
+    result = compress_contexts("금리", CONTEXTS, _encode, token_budget=budget)
+
+    assert [c["source"] for c in result.contexts] == ["a", "b"]
+    assert result.contexts[0]["text"] == "금리가 2.5%로 올랐다."
+    assert result.contexts[1]["text"] == "금리 부담이 커졌다."
+    assert result.compressed_tokens <= budget < result.original_tokens
+    assert result.stats()["kept_sentences"] == 2
+
+
+def test_within_budget_is_untouched_and_skips_encoding():
+    def _fail(_texts):
+        raise AssertionError("encode should not be called")
+
+    result = compress_contexts("금리", CONTEXTS, _fail, token_budget=10_000)
+    assert [c["text"] for c in result.contexts] == [c["text"] for c in CONTEXTS]
+    assert result.compressed_tokens == result.original_tokens
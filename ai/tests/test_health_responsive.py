@@ -0,0 +1,81 @@
+"""/health must answer from the event loop while a long generation runs.
+
+A tiny randomly initialised Qwen3 model (real tokenizer from ai/Qwen3-0.6B)
+keeps this on CPU in a few seconds.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+import torch
+
+AI_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(AI_DIR))
+
+TOKENIZER_DIR = AI_DIR / "Qwen3-0.6B"
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory) -> str:
+    if not (TOKENIZER_DIR / "tokenizer_config.json").exists():
+        pytest.skip("ai/Qwen3-0.6B tokenizer not available")
+    from transformers import AutoTokenizer, Qwen3Config, Qwen3ForCausalLM
+
+    torch.manual_seed(0)
+    tok = AutoTokenizer.from_pretrained(TOKENIZER_DIR)
+    cfg = Qwen3Config(
+        vocab_size=len(tok),
+        hidden_size=64,
+        intermediate_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        head_dim=16,
+        max_position_embeddings=4096,
+        eos_token_id=tok.eos_token_id,
+        tie_word_embeddings=True,
+    )
+    out = tmp_path_factory.mktemp("tiny_qwen3")
+    Qwen3ForCausalLM(cfg).eval().save_pretrained(out)
+    tok.save_pretrained(out)
+    return str(out)
+
+
+def test_health_stays_fast_during_generation(tiny_model, monkeypatch):
+    monkeypatch.setenv("AI_RESPONSE_CACHE_SIZE", "0")
+    monkeypatch.setenv("AI_REPETITION_WINDOW", "0")  # 반복 감지로 일찍 끝나면 /health 와 겹치지 않는다
+    from server_base import build_app
+
+    app = build_app("eco", tiny_model, default_temp=0.0, default_max_tokens=1024, backend="torch")
+
+    async def scenario() -> tuple[list[float], bool]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=120) as client:
+            chat = asyncio.create_task(
+                client.post("/chat", json={"messages": [{"role": "user", "content": "hello"}], "deadline_ms": 20000})
+            )
+            await asyncio.sleep(0.3)  # 생성이 시작되도록
+            latencies = []
+            for _ in range(20):
+                t0 = time.perf_counter()
+                resp = await client.get("/health")
+                latencies.append(time.perf_counter() - t0)
+                assert resp.status_code == 200
+                assert resp.json()["status"] == "ok"
+                await asyncio.sleep(0.01)
+            overlapped = not chat.done()
+            result = await chat
+            assert result.status_code == 200
+            return latencies, overlapped
+
+    latencies, overlapped = asyncio.run(scenario())
+    assert overlapped, "generation finished before /health was probed"
+    assert statistics.median(latencies) < 0.01
+    assert max(latencies) < 0.05
@@ -0,0 +1,79 @@
+"""Quantized KV cache: round-trip error, batch surgery, scheduler integration."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+import torch
+
+AI_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(AI_DIR))
+
+from kv_quant import QuantizedKVCache, kv_nbytes  # noqa: E402
+
+
+def _legacy(batch: int = 2, length: int = 12, layers: int = 2) -> list:
+    gen = torch.Generator().manual_seed(0)
+    shape = (batch, 2, length, 16)
+    return [(torch.randn(shape, generator=gen), torch.randn(shape, generator=gen)) for _ in range(layers)]
+
+
+@pytest.mark.parametrize("bits,tol", [(8, 0.03), (4, 0.5)])
+def test_round_trip_and_append(bits, tol):
+    kv = _legacy()
+    cache = QuantizedKVCache.from_legacy(kv, bits)
+    new = _legacy(length=3)
+    for layer, (k, v) in zip(cache.layers, new):
+        layer.update(k * 3, v)  # 보정 범위를 넘는 키 -> scale 확장
+    for (k, v), (nk, nv), (qk, qv) in zip(kv, new, cache.to_legacy()):
+        assert qk.shape == (2, 2, 15, 16)
+        assert torch.allclose(qk, torch.cat([k, nk * 3], dim=2), atol=tol * 3)
+        assert torch.allclose(qv, torch.cat([v, nv], dim=2), atol=tol)
+    fp_bytes = kv_nbytes([(torch.cat([k, nk], 2), torch.cat([v, nv], 2)) for (k, v), (nk, nv) in zip(kv, new)])
+    assert cache.nbytes < fp_bytes * (0.35 if bits == 8 else 0.25)
+
+
+def test_surgery_matches_legacy_ops():
+    kv = _legacy()
+    cache = QuantizedKVCache.from_legacy(kv, 8).left_pad(3)
+    cache.cat_batch(QuantizedKVCache.from_legacy(_legacy(batch=1, length=15), 8))
+    cache.select(torch.tensor([0, 2]), start=3).crop(10)
+    ref = [(k[:, :, :10], v[:, :, :10]) for k, v in kv]
+    for (qk, qv), (k, v) in zip(cache.to_legacy(), ref):
+        assert qk.shape == (2, 2, 10, 16)
+        assert torch.allclose(qk[:1], k[:1], atol=0.03) and torch.allclose(qv[:1], v[:1], atol=0.03)
+
+
+def test_scheduler_int8_matches_fp_and_budget_defers():
+    from engines import load_tiny
+    from scheduler import BatchScheduler, GenerationJob
+
+    tok, model, device = load_tiny("tiny-model", "fp32")
+    prompts = ["short", "a somewhat longer prompt", "the longest prompt of all three here"]
+
+    def run(**kwargs) -> tuple[list, dict]:
+        scheduler = BatchScheduler(model, device, max_batch_size=4, **kwargs)
+        with scheduler._cond:  # 콜드 스타트 burst: 첫 반복이 세 요청을 한꺼번에 본다
+            jobs = [
+                scheduler.submit(
+                    GenerationJob(tok(p, return_tensors="pt").input_ids, 16, 0.0, set(), prompt_lookup_tokens=n)
+                )
+                for p, n in zip(prompts, (0, 0, 3))
+            ]
+        for job in jobs:
+            assert job.wait(60) and job.error is None
+        return [job.output_ids for job in jobs], scheduler.stats()
+
+    fp, fp_stats = run()
+    int8, int8_stats = run(kv_quant="int8")
+    assert int8 == fp
+    assert int8_stats["kv_peak_bytes"] < fp_stats["kv_peak_bytes"] * 0.5
+    assert int8_stats["kv_token_bytes"] < fp_stats["kv_token_bytes"] * 0.5
+
+    budget = fp_stats["kv_token_bytes"] * 60  # 한 번에 한두 요청만 들어간다
+    limited, limited_stats = run(kv_budget_bytes=budget)
+    assert limited == fp
+    assert limited_stats["kv_deferred"] >= 1
+    assert limited_stats["kv_peak_bytes"] <= budget
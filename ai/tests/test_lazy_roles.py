@@ -0,0 +1,56 @@
+"""Lazy front: /metrics and /trace must not load a role or keep it warm."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+
+AI_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(AI_DIR))
+
+
+class _AliveProcess:
+    def is_alive(self) -> bool:
+        return True
+
+
+def test_metrics_and_trace_do_not_acquire_the_role():
+    from lazy_roles import LazyRolePool, build_front_app
+
+    pool = LazyRolePool(idle_s=60.0, warm_min=0)
+    pool.add("eco", 19999, target=print, args=(), kwargs={})
+
+    async def no_start(worker):
+        raise AssertionError("role must not be loaded by /metrics or /trace")
+
+    pool._start = no_start
+    upstream_paths: list[str] = []
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        upstream_paths.append(request.url.path)
+        return httpx.Response(200, text='ai_requests_total{role="eco"} 3\n')
+
+    pool._client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+    app = build_front_app(pool, "eco")
+
+    async def get(path: str) -> httpx.Response:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(path)
+
+    cold_metrics = asyncio.run(get("/metrics"))
+    cold_trace = asyncio.run(get("/trace"))
+    assert cold_metrics.status_code == 200 and 'ai_role_loaded{role="eco"} 0' in cold_metrics.text
+    assert cold_trace.status_code == 404
+    assert upstream_paths == []
+
+    worker = pool.workers["eco"]
+    worker.process, worker.last_used = _AliveProcess(), 123.0
+    warm_metrics = asyncio.run(get("/metrics"))
+    assert 'ai_requests_total{role="eco"} 3' in warm_metrics.text
+    assert 'ai_role_loaded{role="eco"} 1' in warm_metrics.text
+    assert asyncio.run(get("/trace")).status_code == 200
+    assert upstream_paths == ["/metrics", "/trace"]
+    assert worker.last_used == 123.0 and worker.inflight == 0  # scrape 는 idle 시계를 건드리지 않는다
@@ -0,0 +1,202 @@
+"""Serving-layer regression tests on the mock engine (no model weights needed)."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+AI_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(AI_DIR))
+
+
+@pytest.fixture
+def mock_app(monkeypatch):
+    monkeypatch.setenv("AI_MOCK_DECODE_TPS", "500")
+    monkeypatch.setenv("AI_MOCK_PREFILL_TPS", "100000")
+    monkeypatch.setenv("AI_RESPONSE_CACHE_SIZE", "0")
+    from server_base import build_app
+
+    return build_app("eco", "mock-model", default_temp=0.0, default_max_tokens=24, backend="mock")
+
+
+def _post_all(app, payloads: list[dict], path: str = "/chat") -> list[httpx.Response]:
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+            return await asyncio.gather(*(client.post(path, json=p) for p in payloads))
+
+    return asyncio.run(scenario())
+
+
+def _msg(text: str) -> dict:
+    return {"messages": [{"role": "user", "content": text}]}
+
+
+def test_batched_outputs_match_solo_and_differ_per_prompt(mock_app):
+    prompts = [f"question {i}" for i in range(6)]
+    (solo,) = _post_all(mock_app, [_msg(prompts[0])])
+    batched = _post_all(mock_app, [_msg(p) for p in prompts])
+
+    assert all(r.status_code == 200 for r in batched)
+    assert batched[0].json()["content"] == solo.json()["content"]
+    assert len({r.json()["content"] for r in batched}) > 1
+    assert all(r.json()["metrics"]["tokens"] == 24 for r in batched)
+
+
+def test_prompt_lookup_and_stream_match_plain_decode(mock_app):
+    plain, spec = _post_all(mock_app, [_msg("same prompt"), {**_msg("same prompt"), "prompt_lookup_tokens": 4}])
+    (stream,) = _post_all(mock_app, [_msg("same prompt")], path="/chat/stream")
+
+    assert spec.json()["content"] == plain.json()["content"]
+    assert "event: done" in stream.text
+    assert plain.json()["content"] in stream.text
+
+
+def test_chat_batch_returns_items_in_order_with_per_item_errors(mock_app):
+    prompts = [f"batch item {i}" for i in range(4)]
+    singles = _post_all(mock_app, [_msg(p) for p in prompts])
+    items = [_msg(p) for p in prompts] + [{**_msg("needs rag"), "rag": {"roles": ["nope"]}}]
+    (batch,) = _post_all(mock_app, [{"items": items}], path="/chat/batch")
+
+    body = batch.json()
+    assert batch.status_code == 200
+    assert [r["content"] for r in body["results"][:4]] == [r.json()["content"] for r in singles]
+    assert body["results"][4]["status"] in (400, 503)  # faiss 가 없으면 503, 있으면 모르는 role 이라 400
+    assert body["metrics"]["items"] == 5 and body["metrics"]["errors"] == 1
+
+
+def test_chat_fanout_prefills_shared_prefix_once(mock_app):
+    shared = [{"role": "user", "content": "shared question with a long context. " * 20}]
+    branches = [{"messages": [{"role": "user", "content": f"answer as role {i}"}]} for i in range(3)]
+    # prefix cache 가 비어 있을 때 먼저 보내야 접두사 공유만의 효과가 보인다.
+    (fan,) = _post_all(mock_app, [{"messages": shared, "branches": branches}], path="/chat/fanout")
+    singles = _post_all(mock_app, [{"messages": shared + b["messages"]} for b in branches])
+
+    body = fan.json()
+    assert [r["content"] for r in body["results"]] == [r.json()["content"] for r in singles]
+    shared_tokens = body["metrics"]["shared_prefix_tokens"]
+    assert shared_tokens > 700
+    # 첫 branch 만 접두사를 prefill 하고 나머지 둘은 그 KV 에서 시작한다.
+    assert body["metrics"]["prefill_tokens_saved"] == 2 * shared_tokens
+
+
+def test_deadline_request_is_not_cached_or_shared(monkeypatch):
+    monkeypatch.setenv("AI_MOCK_DECODE_TPS", "500")
+    monkeypatch.setenv("AI_MOCK_PREFILL_TPS", "100000")
+    monkeypatch.setenv("AI_RESPONSE_CACHE_SIZE", "16")
+    monkeypatch.delenv("AI_RESPONSE_CACHE_DIR", raising=False)
+    from server_base import build_app
+
+    # 200 토큰은 500 tok/s 로 0.4초라 150ms deadline 에 잘린다.
+    app = build_app("eco", "mock-model", default_temp=0.0, default_max_tokens=200, backend="mock")
+    limited, full = _post_all(app, [{**_msg("same"), "deadline_ms": 150}, _msg("same")])
+    (again,) = _post_all(app, [_msg("same")])
+
+    assert limited.json()["truncated_reason"] == "deadline"
+    assert "truncated_reason" not in full.json()
+    assert full.json()["metrics"]["tokens"] > limited.json()["metrics"]["tokens"]
+    assert again.json()["metrics"]["response_cache"] == "hit"
+    assert again.json()["content"] == full.json()["content"]
+
+
+def test_single_flight_does_not_share_rejected_results():
+    from response_cache import ResponseCache
+
+    cache = ResponseCache(max_entries=4)
+    calls: list[int] = []
+
+    async def compute() -> dict:
+        calls.append(len(calls))
+        await asyncio.sleep(0.05)
+        return {"content": "partial" if len(calls) == 1 else "full"}
+
+    async def scenario():
+        store = lambda value: value["content"] == "full"  # noqa: E731
+        return await asyncio.gather(cache.get_or_compute("k", compute, store), cache.get_or_compute("k", compute, store))
+
+    (first, first_status), (second, second_status) = asyncio.run(scenario())
+    assert (first["content"], first_status) == ("partial", "miss")
+    assert (second["content"], second_status) == ("full", "miss")  # 거절된 결과 대신 다시 생성했다
+    assert cache.get("k") == {"content": "full"} and cache.coalesced == 0
+
+
+def test_chat_batch_on_rbln_respects_compiled_batch_size(monkeypatch):
+    import json
+
+    import server_base
+    from engines import load_tiny
+
+    tok, tiny, device = load_tiny("tiny-model", "fp32")
+    rbln_config = json.loads((AI_DIR / "Qwen3-0.6B" / "rbln_config.json").read_text())
+
+    class FakeRBLN:
+        """batch_size=1, attention_mask 없이 컴파일된 RBLN 모델처럼 입력 모양을 검사한다."""
+
+        def __init__(self):
+            self.rbln_config = rbln_config
+            self.generation_config = tiny.generation_config
+            self.calls = 0
+
+        def generate(self, **kwargs):
+            assert kwargs["input_ids"].shape[0] <= rbln_config["batch_size"]
+            assert "attention_mask" not in kwargs
+            self.calls += 1
+            return tiny.generate(**kwargs)
+
+    fake = FakeRBLN()
+    monkeypatch.setenv("AI_RESPONSE_CACHE_SIZE", "0")
+    monkeypatch.setattr(server_base, "_resolve_backend", lambda model_id, backend=None: "rbln")
+    monkeypatch.setattr(server_base, "_load_rbln_model", lambda model_id: (tok, fake, device))
+    monkeypatch.setattr(server_base, "_MODEL_CACHE", {})
+    app = server_base.build_app("eco", "rbln-model", default_temp=0.0, default_max_tokens=4, backend="rbln")
+
+    (resp,) = _post_all(app, [{"items": [_msg(f"rbln item {i}") for i in range(3)]}], path="/chat/batch")
+    body = resp.json()
+    assert body["metrics"]["errors"] == 0
+    assert [r["metrics"]["batch_size"] for r in body["results"]] == [1, 1, 1]
+    assert fake.calls == 3
+
+
+def test_scheduler_error_is_not_retried_with_generate(monkeypatch):
+    import server_base
+
+    monkeypatch.setenv("AI_RESPONSE_CACHE_SIZE", "0")
+    monkeypatch.setattr(server_base, "_MODEL_CACHE", {})
+    app = server_base.build_app("eco", "mock-model", default_temp=0.0, default_max_tokens=8, backend="mock")
+    (loaded,) = server_base._MODEL_CACHE.values()
+    generate_calls: list[dict] = []
+
+    def broken_forward(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    # scheduler 가 디코드 중인 모델을 다른 스레드의 generate 로 다시 돌리면 안 된다.
+    monkeypatch.setattr(loaded.model, "forward", broken_forward)
+    monkeypatch.setattr(loaded.model, "generate", lambda **kwargs: generate_calls.append(kwargs), raising=False)
+    (resp,) = _post_all(app, [_msg("fails in the scheduler")])
+
+    assert resp.status_code == 500
+    assert "boom" in resp.json()["detail"]
+    assert generate_calls == []
+
+
+def test_response_cache_saves_off_the_event_loop_and_flushes(tmp_path):
+    from response_cache import ResponseCache
+
+    path = tmp_path / "responses.json"
+    cache = ResponseCache(path=path, save_interval_s=0.05)
+
+    async def scenario():
+        for i in range(3):
+            cache.put(f"k{i}", {"content": str(i)})
+        assert not path.exists()  # miss 마다 동기로 쓰지 않는다
+        await asyncio.sleep(0.3)
+        assert len(ResponseCache(path=path)._entries) == 3  # 모아서 한 번 썼다
+        cache.put("k3", {"content": "3"})
+        cache.flush()
+
+    asyncio.run(scenario())
+    assert ResponseCache(path=path).get("k3") == {"content": "3"}
@@ -0,0 +1,136 @@
+"""Mixed-adapter LoRA batch matches per-adapter PeftModel outputs."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+import torch
+
+AI_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(AI_DIR))
+
+pytest.importorskip("peft")
+
+ALL_MODULES = ["q_proj", "k_proj", "v_proj", "o_proj", "gate_proj", "up_proj", "down_proj"]
+
+
+def _adapters(tmp_path: Path) -> dict[str, str]:
+    """랜덤 LoRA 두 개를 저장한다. rank 와 타깃 모듈을 다르게 해 0 패딩 경로도 탄다."""
+    from engines import load_tiny
+    from peft import LoraConfig, get_peft_model
+
+    lora_map = {}
+    for seed, (name, r, targets) in enumerate([("eco", 8, ALL_MODULES), ("firm", 4, ["q_proj", "v_proj", "up_proj"])]):
+        _, base, _ = load_tiny("tiny-model", "fp32")
+        torch.manual_seed(seed)
+        config = LoraConfig(r=r, lora_alpha=2 * r, target_modules=targets, init_lora_weights=False)
+        get_peft_model(base, config).save_pretrained(str(tmp_path / name))
+        lora_map[name] = str(tmp_path / name)
+    return lora_map
+
+
+def _load(lora_map: dict[str, str], mixed: bool):
+    from engines import load_tiny
+    from multi_lora import attach_multi_lora
+    from server_base import _attach_loras
+
+    tok, base, device = load_tiny("tiny-model", "fp32")
+    model, names = _attach_loras(base, lora_map)
+    if mixed:
+        model, router = attach_multi_lora(model, names)
+        return tok, model, router
+    return tok, model, None
+
+
+def _reference_logits(model, input_ids: torch.Tensor, adapter: str | None) -> torch.Tensor:
+    if adapter is None:
+        with model.disable_adapter():
+            return model(input_ids=input_ids).logits
+    model.set_adapter(adapter)
+    return model(input_ids=input_ids).logits
+
+
+def test_mixed_batch_logits_match_peft(tmp_path):
+    lora_map = _adapters(tmp_path)
+    _, peft_model, _ = _load(lora_map, mixed=False)
+    _, model, router = _load(lora_map, mixed=True)
+
+    adapters = [None, "eco", "firm", "eco"]
+    input_ids = torch.randint(3, 200, (len(adapters), 12), generator=torch.Generator().manual_seed(0))
+    with torch.no_grad():
+        ref = torch.cat([_reference_logits(peft_model, input_ids[i : i + 1], a) for i, a in enumerate(adapters)])
+        router.set_names(adapters)
+        mixed = model(input_ids=input_ids).logits
+        router.set_names([None] * len(adapters))
+        base = model(input_ids=input_ids).logits
+        ref_base = _reference_logits(peft_model, input_ids, None)
+
+    assert torch.allclose(mixed, ref, atol=1e-5)
+    assert not torch.allclose(ref[1], ref[0], atol=1e-3)  # adapter 가 실제로 출력을 바꾼다
+    assert torch.allclose(base, ref_base, atol=1e-5)
+
+
+def test_scheduler_batches_different_adapters_together(tmp_path):
+    from scheduler import BatchScheduler, GenerationJob
+
+    lora_map = _adapters(tmp_path)
+    tok, peft_model, _ = _load(lora_map, mixed=False)
+    _, model, router = _load(lora_map, mixed=True)
+    prompts = [("base prompt", None), ("eco prompt", "eco"), ("a firm prompt", "firm"), ("eco again", "eco")]
+
+    def run(scheduler) -> list:
+        jobs = [
+            scheduler.submit(GenerationJob(tok(text, return_tensors="pt").input_ids, 12, 0.0, set(), adapter=adapter))
+            for text, adapter in prompts
+        ]
+        for job in jobs:
+            assert job.wait(60) and job.error is None
+        return [job.output_ids for job in jobs]
+
+    def activate(name: str | None) -> None:
+        if name is None:
+            peft_model.base_model.disable_adapter_layers()
+        else:
+            peft_model.base_model.enable_adapter_layers()
+            peft_model.set_adapter(name)
+
+    # 기준: adapter 하나씩 도는 기존 경로 (한 배치에 한 adapter).
+    expected = run(BatchScheduler(peft_model, torch.device("cpu"), max_batch_size=4, set_adapter=activate))
+
+    routed: list[list] = []
+
+    def route(names: list) -> None:
+        routed.append(list(names))
+        router.set_names(names)
+
+    mixed = run(BatchScheduler(model, torch.device("cpu"), max_batch_size=4, set_batch_adapters=route))
+    assert mixed == expected
+    assert any(len(set(names)) > 1 for names in routed)  # 서로 다른 adapter 가 한 디코드 스텝을 공유했다
+
+
+def test_load_model_starts_on_base_model(tmp_path, monkeypatch):
+    import shutil
+
+    from engines import load_tiny
+    from server_base import _activate_adapter, load_model
+
+    monkeypatch.setenv("AI_COMPILED_DECODE", "0")
+    monkeypatch.delenv("AI_MIXED_LORA", raising=False)
+    lora_map = _adapters(tmp_path)
+    _, base, _ = load_tiny("tiny-model", "fp32")
+    model_dir = tmp_path / "model"
+    base.save_pretrained(str(model_dir))
+    for name in ("vocab.json", "merges.txt", "tokenizer_config.json", "special_tokens_map.json", "added_tokens.json"):
+        shutil.copy(AI_DIR / "Qwen3-0.6B" / name, model_dir / name)
+
+    loaded = load_model(str(model_dir), "torch", lora_map=lora_map, max_batch_size=1, precision="fp32")
+    input_ids = torch.randint(3, 200, (1, 12), generator=torch.Generator().manual_seed(0))
+    with torch.no_grad():
+        expected = base(input_ids=input_ids).logits
+        assert torch.allclose(loaded.model(input_ids=input_ids).logits, expected, atol=1e-5)  # 로드 직후는 베이스
+        _activate_adapter(loaded, "eco")
+        assert not torch.allclose(loaded.model(input_ids=input_ids).logits, expected, atol=1e-3)
+        _activate_adapter(loaded, None)
+        assert torch.allclose(loaded.model(input_ids=input_ids).logits, expected, atol=1e-5)
@@ -0,0 +1,56 @@
+"""Prefix KV cache: a prompt that reuses a cached prefix decodes like a cold prefill."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import torch
+
+AI_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(AI_DIR))
+
+SYSTEM = "You are the eco role. Answer briefly and cite the retrieved context. "
+
+
+def _run(scheduler, tok, texts: list[str]) -> list:
+    from scheduler import GenerationJob
+
+    jobs = []
+    for text in texts:  # 하나씩 돌려 앞 요청의 prefill 이 캐시에 들어간 뒤 다음 요청을 넣는다
+        job = scheduler.submit(GenerationJob(tok(text, return_tensors="pt").input_ids, 16, 0.0, set()))
+        assert job.wait(60) and job.error is None
+        jobs.append(job)
+    return jobs
+
+
+def test_cached_prefix_matches_cold_prefill():
+    from engines import load_tiny
+    from prefix_cache import PrefixCache
+    from scheduler import BatchScheduler
+    from transformers import DynamicCache
+
+    tok, model, device = load_tiny("tiny-model", "fp32")
+    texts = [SYSTEM + "What is inflation?", SYSTEM + "How do interest rates move?", SYSTEM + "What is inflation?"]
+
+    cold = _run(BatchScheduler(model, device, max_batch_size=2), tok, texts)
+    cache = PrefixCache(block_size=16)
+    warm = _run(BatchScheduler(model, device, max_batch_size=2, prefix_cache=cache), tok, texts)
+
+    assert warm[0].metrics["cached_prompt_tokens"] == 0
+    shared = len(tok.encode(SYSTEM)) // 16 * 16
+    assert shared > 0
+    # 두 번째는 공유 접두사 블록만, 세 번째(같은 프롬프트)는 마지막 토큰을 뺀 블록까지 재사용한다.
+    assert warm[1].metrics["cached_prompt_tokens"] >= shared
+    assert warm[2].metrics["cached_prompt_tokens"] >= warm[1].metrics["cached_prompt_tokens"]
+    assert cache.stats()["hits"] == 2
+    assert [job.output_ids for job in warm] == [job.output_ids for job in cold]
+
+    # 랜덤 tiny 모델의 greedy 토큰은 둔감하므로 캐시된 KV 에서 이어 간 logits 도 콜드 prefill 과 비교한다.
+    ids = tok(texts[1], return_tensors="pt").input_ids
+    cached, past = cache.lookup(ids[0].tolist(), max_tokens=ids.shape[-1] - 1)
+    assert cached >= shared
+    with torch.no_grad():
+        cold_logits = model(input_ids=ids).logits[0, -1]
+        resumed = model(input_ids=ids[:, cached:], past_key_values=DynamicCache.from_legacy_cache(tuple(past)))
+    assert torch.allclose(resumed.logits[0, -1], cold_logits, atol=1e-5)
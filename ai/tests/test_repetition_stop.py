@@ -0,0 +1,89 @@
+"""Repetition-loop stopping: synthetic looping outputs are cut short and trimmed."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+import torch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from stopping import RepetitionCriteria  # noqa: E402
+
+
+def _run(criteria: RepetitionCriteria, prompt: list[int], generated: list[int]) -> int | None:
+    """토큰을 하나씩 흘려 보내며 처음 멈춘 시점의 생성 토큰 수를 돌려준다."""
+    for n in range(1, len(generated) + 1):
+        ids = torch.tensor([prompt + generated[:n]])
+        if bool(criteria(ids, None).all()):
+            return n
+    return None
+
+
+def test_period_three_loop_stops_and_keeps_first_cycle():
+    prompt = [1, 2, 3, 4]
+    intro = [10, 11, 12, 13, 14]
+    generated = intro + [7, 8, 9] * 40
+    crit = RepetitionCriteria(len(prompt), window=24, threshold=3)
+
+    stopped_at = _run(crit, prompt, generated)
+
+    assert stopped_at == len(intro) + 24
+    assert crit.period == 3
+    assert generated[: crit.keep_tokens] == intro + [7, 8, 9]
+
+
+def test_non_repeating_output_is_left_alone():
+    crit = RepetitionCriteria(2, window=16, threshold=3)
+    assert _run(crit, [0, 0], list(range(100, 200))) is None
+    assert not crit.triggered
+
+
+def test_long_period_below_threshold_does_not_trigger():
+    # 주기 10 은 window 16 안에서 두 번도 다 반복되지 않으므로 (threshold 3) 정상 출력으로 본다.
+    crit = RepetitionCriteria(0, window=16, threshold=3)
+    assert _run(crit, [], list(range(10)) * 3) is None
+
+
+@pytest.fixture
+def looping_app(monkeypatch):
+    monkeypatch.setenv("AI_RESPONSE_CACHE_SIZE", "0")
+    monkeypatch.setenv("AI_REPETITION_WINDOW", "16")
+    monkeypatch.setenv("AI_REPETITION_THRESHOLD", "3")
+    from engines import ByteTokenizer, MockCausalLM, register_engine
+    from server_base import build_app
+
+    @register_engine("loop")
+    def _load_loop(model_id, precision):
+        tokenizer = ByteTokenizer()
+        # 패턴이 한 토큰뿐이라 같은 글자만 끝없이 나온다.
+        model = MockCausalLM(len(tokenizer), [ord("a")], prefill_tps=0, decode_tps=0).eval()
+        return tokenizer, model, torch.device("cpu")
+
+    return build_app("eco", "loop-model", default_temp=0.0, default_max_tokens=200, backend="loop")
+
+
+def _post(app, path: str, payload: dict) -> httpx.Response:
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+            return await client.post(path, json=payload)
+
+    return asyncio.run(scenario())
+
+
+def test_chat_stops_looping_generation_early(looping_app):
+    payload = {"messages": [{"role": "user", "content": "loop please"}]}
+    body = _post(looping_app, "/chat", payload).json()
+
+    assert body["stopped_by"] == "repetition"
+    assert body["content"] == "a"
+    assert body["metrics"]["tokens"] == 16
+    assert body["metrics"]["trimmed_tokens"] == 15
+
+    stream = _post(looping_app, "/chat/stream", payload).text
+    assert '"stopped_by": "repetition"' in stream
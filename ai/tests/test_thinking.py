@@ -0,0 +1,58 @@
+"""Thinking budget: </think> is forced at the budget and reasoning tokens are counted."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+import torch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from thinking import ThinkBudgetProcessor, count_reasoning  # noqa: E402
+
+START, END, WORD, VOCAB = 5, 6, 9, 16
+
+
+def _generate(processor: ThinkBudgetProcessor, prompt: list[int], steps: int) -> list[int]:
+    """항상 WORD 를 고르는 모델로 greedy 생성한다. 프로세서가 강제한 토큰만 달라진다."""
+    ids = list(prompt)
+    for _ in range(steps):
+        scores = torch.zeros(1, VOCAB)
+        scores[0, WORD] = 1.0
+        scores = processor(torch.tensor([ids]), scores)
+        ids.append(int(scores[0].argmax()))
+    return ids[len(prompt) :]
+
+
+@pytest.mark.parametrize("budget", [1, 3, 8])
+def test_end_is_forced_exactly_at_budget(budget):
+    generated = _generate(ThinkBudgetProcessor(START, END, budget), [1, 2, START], budget + 4)
+
+    assert generated[:budget] == [WORD] * budget
+    assert generated[budget] == END
+    assert generated[budget + 1 :] == [WORD] * 3  # 닫힌 뒤에는 더 간섭하지 않는다
+
+
+def test_zero_budget_closes_think_immediately():
+    processor = ThinkBudgetProcessor(START, END, 0)
+
+    assert _generate(processor, [1, START], 3) == [END, WORD, WORD]
+    assert _generate(processor, [1, 2], 3) == [WORD] * 3  # <think> 가 없으면 그대로
+
+
+def test_batch_rows_are_budgeted_independently():
+    processor = ThinkBudgetProcessor(START, END, 2)
+    ids = torch.tensor([[START, WORD, WORD], [START, WORD, END], [1, START, WORD]])
+    scores = torch.zeros(3, VOCAB)
+    scores[:, WORD] = 1.0
+
+    assert processor(ids, scores).argmax(dim=-1).tolist() == [END, WORD, WORD]
+
+
+def test_count_reasoning_with_and_without_closing_tag():
+    assert count_reasoning([START, WORD, WORD, END, WORD, WORD, WORD], START, END) == (4, 3)
+    assert count_reasoning([START, WORD, WORD, WORD], START, END) == (4, 0)  # </think> 전에 생성이 끝난 경우
+    assert count_reasoning([WORD, WORD], START, END) == (0, 2)
+    assert count_reasoning([], START, END) == (0, 0)
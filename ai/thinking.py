@@ -0,0 +1,73 @@
+"""Thinking-token budget for Qwen3-style `<think>...</think>` generations.
+
+`ThinkBudgetProcessor` is a logits processor: once a sequence has produced
+`budget` tokens inside an open `<think>` block, it forces `</think>` so the
+model moves on to the answer. It only looks at the token ids it is given, so
+the same instance works for `model.generate`, the batch scheduler and
+prompt-lookup verification. `think_budget=0` additionally renders the prompt
+with `enable_thinking=False` (see server_base `_prepare`).
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import torch
+from transformers import LogitsProcessor
+
+THINK_START = "<think>"
+THINK_END = "</think>"
+
+
+def think_token_ids(tokenizer: Any) -> tuple[int, int] | None:
+    """토크나이저에 <think>/</think> 가 단일 토큰으로 있으면 (start, end) id."""
+    convert = getattr(tokenizer, "convert_tokens_to_ids", None)
+    if convert is None:
+        return None
+    start, end = convert(THINK_START), convert(THINK_END)
+    unk = getattr(tokenizer, "unk_token_id", None)
+    if not isinstance(start, int) or not isinstance(end, int) or unk in (start, end):
+        return None
+    return start, end
+
+
+def _open_think_length(row: torch.Tensor, start_id: int, end_id: int) -> int | None:
+    """열려 있는 <think> 뒤 토큰 수. 닫혀 있거나 없으면 None."""
+    starts = (row == start_id).nonzero()
+    if starts.numel() == 0:
+        return None
+    last_start = int(starts[-1])
+    ends = (row == end_id).nonzero()
+    if ends.numel() and int(ends[-1]) > last_start:
+        return None
+    return row.shape[-1] - last_start - 1
+
+
+class ThinkBudgetProcessor(LogitsProcessor):
+    def __init__(self, start_id: int, end_id: int, budget: int):
+        self.start_id = start_id
+        self.end_id = end_id
+        self.budget = max(0, budget)
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        for i in range(input_ids.shape[0]):
+            used = _open_think_length(input_ids[i], self.start_id, self.end_id)
+            if used is not None and used >= self.budget:
+                forced = torch.full_like(scores[i], float("-inf"))
+                forced[self.end_id] = 0.0
+                scores[i] = forced
+        return scores
+
+
+def count_reasoning(token_ids: list[int], start_id: int, end_id: int) -> tuple[int, int]:
+    """생성 토큰을 (reasoning, answer) 수로 나눈다. <think>, </think> 태그 자신은 reasoning 에 센다."""
+    reasoning = 0
+    inside = False
+    for token in token_ids:
+        if token == start_id:
+            inside = True
+        if inside:
+            reasoning += 1
+        if token == end_id:
+            inside = False
+    return reasoning, len(token_ids) - reasoning
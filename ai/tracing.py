@@ -0,0 +1,86 @@
+"""Per-request stage tracing exported as Chrome trace JSON.
+
+With tracing on, every /chat and /chat/stream request records spans for
+tokenize, queue wait, prefill, each decode interval and detokenize. The most
+recent requests are kept in a ring buffer and `GET /trace` returns them in the
+Chrome trace event format (open in chrome://tracing or https://ui.perfetto.dev),
+one row per request.
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any
+
+
+@dataclass
+class Span:
+    name: str
+    start: float  # time.perf_counter()
+    end: float
+    args: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class RequestTrace:
+    request_id: int
+    name: str
+    spans: list[Span] = field(default_factory=list)
+
+    def add(self, name: str, start: float | None, end: float | None, **args: Any) -> None:
+        if start is None or end is None:
+            return
+        self.spans.append(Span(name, start, max(start, end), args))
+
+
+class Tracer:
+    def __init__(self, *, max_requests: int = 512):
+        self._traces: deque[RequestTrace] = deque(maxlen=max(1, max_requests))
+        self._ids = itertools.count(1)
+        self._lock = Lock()
+
+    def start(self, name: str) -> RequestTrace:
+        return RequestTrace(request_id=next(self._ids), name=name)
+
+    def finish(self, trace: RequestTrace) -> None:
+        with self._lock:
+            self._traces.append(trace)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._traces.clear()
+
+    def chrome_trace(self) -> dict[str, Any]:
+        """Chrome trace event format ("X" complete events, µs 단위)."""
+        pid = os.getpid()
+        with self._lock:
+            traces = list(self._traces)
+        events: list[dict[str, Any]] = []
+        for trace in traces:
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": trace.request_id,
+                    "args": {"name": f"{trace.name} #{trace.request_id}"},
+                }
+            )
+            for span in trace.spans:
+                events.append(
+                    {
+                        "name": span.name,
+                        "cat": "ai",
+                        "ph": "X",
+                        "ts": span.start * 1e6,
+                        "dur": (span.end - span.start) * 1e6,
+                        "pid": pid,
+                        "tid": trace.request_id,
+                        "args": span.args,
+                    }
+                )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
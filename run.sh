@@ -23,6 +23,10 @@ FRONTEND_PORT="${FRONTEND_PORT:-3000}"
 # AI main.py launches multiple role-specific workers.
 AI_CHAT_URL="${AI_CHAT_URL:-http://127.0.0.1:8001/chat}"
 AI_VERIFY_PAYLOAD='{"messages":[{"role":"user","content":"ping"}]}'
+# AI_LAZY=1: role models load on their first request (see ai/main.py --lazy),
+# so startup verification only checks the front's /health instead of forcing a load.
+AI_LAZY="${AI_LAZY:-0}"
+export AI_LAZY
 
 VERIFY_STARTUP="${VERIFY_STARTUP:-1}"
 
@@ -120,6 +124,18 @@ verify_backend() {
 }
 
 verify_ai_core() {
+  if [[ "$AI_LAZY" == "1" ]]; then
+    local url="${AI_CHAT_URL%/chat}/health"
+    for attempt in {1..30}; do
+      if curl -fsS "$url" >/dev/null; then
+        log "INFO" "AI core front is up (${url}); role models load on first request"
+        return 0
+      fi
+      sleep 1
+    done
+    log "WARN" "AI core front did not respond (${url}). Check ${NAME_TO_LOG[ai-core]}"
+    return 1
+  fi
   for attempt in {1..45}; do
     if curl -fsS -H 'Content-Type: application/json' \
       -d "$AI_VERIFY_PAYLOAD" \